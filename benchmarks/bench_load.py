@@ -0,0 +1,126 @@
+"""Benchmark: load_export vs. the original json.load + list[PlayRecord] loader.
+
+Loads the same seeded synthetic export (see :mod:`spotify_synth`) twice, each
+in its own child process:
+
+- ``legacy``: the loader as it was before the columnar store -- ``json.load``
+  per file, then one :class:`PlayRecord` dataclass per kept play;
+- ``table``: :func:`load_export` (``json.load`` or the streaming reader by file
+  size, rows interned into one :class:`PlayTable` a batch at a time).
+
+Reports load time and each child's peak RSS, and checks both keep the same
+plays.  On the 1m export (894,524 kept plays) the last run measured 9.0 s /
+576 MB for ``legacy`` against 9.4 s / 195 MB for ``table``: about 5% slower,
+for a third of the memory.  Timings on a shared machine vary by 10-20%
+between runs; compare best-of-N runs.
+
+Usage:
+    python benchmarks/bench_load.py [--size 10k|1m|20m] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+
+sys.path.insert(0, BENCH_DIR)
+
+from bench_spotify import ensure_export  # noqa: E402
+from spotify_synth import DEFAULT_SEED, SIZES  # noqa: E402
+
+CHILD = """
+import glob, hashlib, json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+from schlange.spotify.parser import PlayRecord, load_export
+
+
+def legacy_load(path):
+    plays = []
+    for f in sorted(glob.glob(os.path.join(path, "*.json"))):
+        with open(f, encoding="utf-8") as fh:
+            data = json.load(fh)
+        if not isinstance(data, list) or not data:
+            continue
+        if "master_metadata_track_name" in data[0] or "ts" in data[0]:
+            for rec in data:
+                track = rec.get("master_metadata_track_name") or ""
+                artist = rec.get("master_metadata_album_artist_name") or ""
+                ms = rec.get("ms_played", 0) or 0
+                played_at = rec.get("ts") or ""
+                uri = rec.get("spotify_track_uri") or ""
+                album = rec.get("master_metadata_album_album_name") or ""
+                if track and artist and ms >= 30000:
+                    plays.append(PlayRecord(played_at=played_at, track_name=track, artist_name=artist,
+                                            ms_played=ms, spotify_uri=uri, album_name=album))
+        elif "trackName" in data[0] or "artistName" in data[0]:
+            for rec in data:
+                track = rec.get("trackName") or rec.get("master_metadata_track_name") or ""
+                artist = rec.get("artistName") or rec.get("master_metadata_album_artist_name") or ""
+                ms = rec.get("msPlayed", 0) or rec.get("ms_played", 0)
+                played_at = rec.get("endTime") or rec.get("ts") or ""
+                if track and artist:
+                    plays.append(PlayRecord(played_at=played_at, track_name=track, artist_name=artist, ms_played=ms))
+    return plays
+
+
+load = legacy_load if {mode!r} == "legacy" else load_export
+best = None
+for _ in range({repeat}):
+    plays = None
+    start = time.perf_counter()
+    plays = load({data!r})
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+
+digest = hashlib.sha1()
+for p in plays:
+    digest.update(repr((p.played_at, p.track_name, p.artist_name, p.ms_played, p.spotify_uri, p.album_name)).encode())
+print(json.dumps({{
+    "seconds": best,
+    "plays": len(plays),
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "digest": digest.hexdigest(),
+}}))
+"""
+
+
+def run_child(mode: str, data: str, repeat: int) -> dict:
+    code = CHILD.format(root=ROOT, mode=mode, data=data, repeat=repeat)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="1m")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--data-dir", help="default: out/bench/<size>-<seed>")
+    parser.add_argument("--repeat", type=int, default=3, help="loads per child; the best time counts")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or os.path.join(ROOT, "out", "bench", f"{args.size}-{args.seed}")
+    ensure_export(data_dir, SIZES[args.size], args.seed)
+
+    results = {mode: run_child(mode, data_dir, args.repeat) for mode in ("legacy", "table")}
+    print(f"Loading {results['table']['plays']:,} plays ({args.size}, seed {args.seed}), best of {args.repeat}")
+    for mode, res in results.items():
+        print(f"  {mode:<7} {res['seconds']:7.2f} s  peak RSS {res['rss_kb'] / 1024:8.1f} MB")
+
+    legacy, table = results["legacy"], results["table"]
+    print(f"  time: {table['seconds'] / legacy['seconds'] - 1:+.0%}, "
+          f"memory: {legacy['rss_kb'] / table['rss_kb']:.1f}x smaller")
+    if legacy["digest"] != table["digest"]:
+        print("FAIL: loaded plays differ")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Benchmark: rank_tracks on integer keys vs. the string-tuple implementation.
+
+Generates ``--plays`` synthetic plays (default 10M) over a Zipf-ish catalogue
+and ranks them twice, each in its own child process:
+
+- ``legacy``: ``list[PlayRecord]`` ranked by the previous implementation
+  (a Counter and three dicts keyed by ``(track_name, artist_name)``);
+- ``table``: a :class:`PlayTable` ranked by :func:`rank_tracks` (one packed
+  accumulator indexed by interned key id).
+
+Both children store the same parsed rows (fresh strings, as the parser
+yields them), so the table's interning is timed alongside the records'
+construction.  Reports store and ranking time, throughput over both, and
+each child's peak RSS, and checks both produce the same Top N.
+
+Interning makes storing slower than building records.  On 2M plays over
+200k tracks the last run measured 4.0 s store + 3.0 s rank for ``legacy`` at
+985 MB, against 7.4 s + 1.6 s for ``table`` at 216 MB.  A single ranking does
+not pay back the interning (0.8x end to end).  The gain is memory, plus every
+later pass over the parsed (or cached) table.
+
+Usage:
+    python benchmarks/bench_rank.py [--plays 10000000] [--tracks 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = """
+import json, random, resource, sys, time
+from collections import Counter
+sys.path.insert(0, {root!r})
+from schlange.spotify.parser import PlayRecord, PlayTable, RankedTrack, rank_tracks
+
+
+def legacy_rank(plays, top_n):
+    play_counts = Counter()
+    total_ms = {{}}
+    track_uris = {{}}
+    track_albums = {{}}
+    for p in plays:
+        key = (p.track_name, p.artist_name)
+        play_counts[key] += 1
+        total_ms[key] = total_ms.get(key, 0) + p.ms_played
+        if p.spotify_uri:
+            track_uris[key] = p.spotify_uri
+        if p.album_name:
+            track_albums[key] = p.album_name
+    sorted_tracks = sorted(play_counts.keys(), key=lambda k: (play_counts[k], total_ms.get(k, 0)), reverse=True)
+    return [
+        RankedTrack(i, k[0], k[1], play_counts[k], total_ms.get(k, 0), track_uris.get(k, ""), track_albums.get(k, ""))
+        for i, k in enumerate(sorted_tracks[:top_n], start=1)
+    ]
+
+
+def rows(rng, count):
+    for i in range(count):
+        t = int(rng.paretovariate(1.2)) % {tracks}
+        # Fresh string objects per play, as the JSON decoder produces them
+        yield ("2020-01-01T10:00:00Z", "Track %d" % t, "Artist %d" % (t % 5000), 150_000 + t % 90_000,
+               "spotify:track:%022d" % t, "Album %d" % (t % 20000), False)
+
+
+rng = random.Random(2000)
+plays = [] if {mode!r} == "legacy" else PlayTable()
+build = 0.0
+remaining = {plays}
+while remaining:
+    # Rows are generated untimed, a chunk at a time, then stored timed
+    chunk = list(rows(rng, min(remaining, 100_000)))
+    remaining -= len(chunk)
+    start = time.perf_counter()
+    if {mode!r} == "legacy":
+        plays.extend([PlayRecord(*row[:6]) for row in chunk])
+    else:
+        plays.add_rows(chunk)
+    build += time.perf_counter() - start
+del chunk
+
+start = time.perf_counter()
+ranked = legacy_rank(plays, 2000) if {mode!r} == "legacy" else rank_tracks(plays, 2000)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "build": build,
+    "seconds": elapsed,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "top": [(r.track_name, r.artist_name, r.play_count, r.total_ms, r.spotify_uri, r.album_name) for r in ranked],
+}}))
+"""
+
+
+def run_child(mode: str, plays: int, tracks: int) -> dict:
+    code = CHILD.format(root=ROOT, mode=mode, plays=plays, tracks=tracks)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plays", type=int, default=10_000_000)
+    parser.add_argument("--tracks", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"Ranking {args.plays:,} plays over {args.tracks:,} tracks")
+    results = {mode: run_child(mode, args.plays, args.tracks) for mode in ("legacy", "table")}
+    for mode, res in results.items():
+        total = res["build"] + res["seconds"]
+        print(f"  {mode:<7} store {res['build']:7.2f} s  rank {res['seconds']:7.2f} s  "
+              f"{args.plays / total / 1e6:6.2f} M plays/s  peak RSS {res['rss_kb'] / 1024:8.1f} MB")
+
+    legacy, table = results["legacy"], results["table"]
+    print(f"  ranking speedup: {legacy['seconds'] / table['seconds']:.1f}x, "
+          f"store + rank: {(legacy['build'] + legacy['seconds']) / (table['build'] + table['seconds']):.1f}x, "
+          f"memory: {legacy['rss_kb'] / table['rss_kb']:.1f}x smaller")
+    if legacy["top"] != table["top"]:
+        print("FAIL: rankings differ")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Benchmark: Spotify parser, ranking, stats and exporters on synthetic exports.
+
+Generates (once, under ``--data-dir``) a seeded synthetic export with
+:mod:`spotify_synth`, then runs every stage in its own child process so each
+peak RSS is measured in isolation:
+
+- ``load_export``: cold JSON parse of the whole export;
+- ``rank_tracks``: rank the full catalogue;
+- ``print_stats``: the summary printed by ``tom2000``;
+- ``export_csv`` / ``export_jsonl``: write the full-catalogue ranking;
+- ``export_parquet``: write every play as Parquet (skipped without pyarrow).
+
+Stages after ``load_export`` load the table from a binary parse cache filled
+by an untimed warm-up, so they time only themselves; their RSS includes the
+loaded table.  Throughput is in rows per second: plays, or ranked tracks for
+the ranking exporters.
+
+Results are compared with ``benchmarks/baseline_spotify.json`` (per size):
+the run fails when a stage is more than ``--tolerance`` slower or larger
+than its baseline.  Sizes without a recorded baseline (such as ``20m``) are
+measured but not compared.  Baselines are machine-specific; refresh them on
+the machine you compare on with ``--update-baseline``.
+
+Usage:
+    python benchmarks/bench_spotify.py [--size 10k|1m|20m] [--tolerance 0.25] [--update-baseline]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+BASELINE = os.path.join(BENCH_DIR, "baseline_spotify.json")
+
+sys.path.insert(0, BENCH_DIR)
+
+from spotify_synth import DEFAULT_SEED, SIZES, write_export  # noqa: E402
+
+STAGES = ("load_export", "rank_tracks", "print_stats", "export_csv", "export_jsonl", "export_parquet")
+
+CHILD = """
+import contextlib, io, json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+from schlange.spotify import export, optional
+from schlange.spotify.parser import load_export, print_stats, rank_tracks
+
+stage, data, cache, out = {stage!r}, {data!r}, {cache!r}, {out!r}
+if stage == "export_parquet" and optional.pyarrow() is None:
+    print(json.dumps(None))
+    sys.exit(0)
+
+if stage == "load_export":
+    start = time.perf_counter()
+    plays = load_export(data)
+    elapsed, rows = time.perf_counter() - start, len(plays)
+else:
+    plays = load_export(data, cache_dir=cache)
+    ranked = rank_tracks(plays, top_n=len(plays.keys)) if stage != "export_parquet" else None
+    start = time.perf_counter()
+    if stage == "rank_tracks":
+        rank_tracks(plays, top_n=len(plays.keys))
+        rows = len(plays)
+    elif stage == "print_stats":
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_stats(plays, ranked[:2000])
+        rows = len(plays)
+    elif stage == "export_parquet":
+        export.export_plays(plays, os.path.join(out, "plays.parquet"))
+        rows = len(plays)
+    else:
+        fmt = stage.split("_")[1]
+        export.export_rankings(ranked, os.path.join(out, "ranking." + fmt))
+        rows = len(ranked)
+    elapsed = time.perf_counter() - start
+
+print(json.dumps({{"seconds": elapsed, "rows": rows, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def ensure_export(data_dir: str, plays: int, seed: int) -> None:
+    """Generate the synthetic export unless a complete one is already there."""
+    marker = os.path.join(data_dir, ".complete")
+    if os.path.exists(marker):
+        return
+    print(f"Generating {plays:,} plays in {data_dir} ...")
+    write_export(data_dir, plays, seed)
+    with open(marker, "w", encoding="utf-8") as fh:
+        fh.write(f"{plays} {seed}\n")
+
+
+def run_stage(stage: str, data: str, cache: str, out: str) -> dict | None:
+    code = CHILD.format(root=ROOT, stage=stage, data=data, cache=cache, out=out)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    res = json.loads(result.stdout)
+    if res is None:
+        return None
+    return {
+        "rows": res["rows"],
+        "rows_per_s": round(res["rows"] / res["seconds"]),
+        "rss_mb": round(res["rss_kb"] / 1024, 1),
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a message for every stage slower or larger than *baseline* allows."""
+    found = []
+    for stage, res in results.items():
+        base = baseline.get(stage)
+        if res is None or base is None:
+            continue
+        if res["rows_per_s"] < base["rows_per_s"] * (1 - tolerance):
+            found.append(f"{stage}: {res['rows_per_s']:,.0f} rows/s vs baseline {base['rows_per_s']:,.0f}")
+        if res["rss_mb"] > base["rss_mb"] * (1 + tolerance):
+            found.append(f"{stage}: peak RSS {res['rss_mb']:,.1f} MB vs baseline {base['rss_mb']:,.1f}")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--data-dir", help="default: out/bench/<size>-<seed>")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    plays = SIZES[args.size]
+    data_dir = args.data_dir or os.path.join(ROOT, "out", "bench", f"{args.size}-{args.seed}")
+    ensure_export(data_dir, plays, args.seed)
+
+    results: dict[str, dict | None] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "cache")
+        # Untimed warm-up: fill the parse cache the later stages load from
+        run_stage("rank_tracks", data_dir, cache, tmp)
+        print(f"Spotify pipeline on {plays:,} synthetic plays ({args.size}, seed {args.seed})")
+        for stage in args.stages:
+            res = results[stage] = run_stage(stage, data_dir, cache, tmp)
+            if res is None:
+                print(f"  {stage:<15} skipped (pyarrow not installed)")
+                continue
+            print(f"  {stage:<15} {res['rows_per_s']:>14,.0f} rows/s  peak RSS {res['rss_mb']:8.1f} MB")
+
+    all_baselines: dict = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding="utf-8") as fh:
+            all_baselines = json.load(fh)
+
+    if args.update_baseline:
+        measured = {stage: res for stage, res in results.items() if res is not None}
+        all_baselines.setdefault(args.size, {}).update(measured)
+        with open(BASELINE, "w", encoding="utf-8") as fh:
+            json.dump(all_baselines, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"Baseline updated: {BASELINE}")
+        return 0
+
+    baseline = all_baselines.get(args.size)
+    if baseline is None:
+        print(f"No {args.size} baseline recorded; skipping the regression comparison")
+        return 0
+    found = regressions(results, baseline, args.tolerance)
+    for message in found:
+        print(f"FAIL: {message}")
+    if found:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
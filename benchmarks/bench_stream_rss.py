@@ -0,0 +1,99 @@
+"""Benchmark: peak RSS of streaming transpilation on a huge input.
+
+Writes a synthetic Schlange file of ``--size-mb`` megabytes (default 500),
+streams it through ``transpile_file_stream`` into a scratch file in a child
+process, and compares the child's peak RSS with an idle interpreter that only
+imports Schlange.  Exits non-zero when streaming grows RSS by more than
+``--budget-mb``: memory must be bounded by the longest logical line, not the
+file size.
+
+Usage:
+    python benchmarks/bench_stream_rss.py [--size-mb 500] [--budget-mb 64]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# One block of realistic code; repeated until the target size is reached.
+BLOCK = """defn verdoppeln_{i}(x):
+    sofern x ist Nichts:
+        gibzurueck 0
+    gibzurueck x * 2
+
+werte_{i} = [verdoppeln_{i}(z) fuerwahr z inwendig bereich(10) sofern z % 2 == 0]
+text_{i} = anfuehrungszeichen Hallo Welt anfuehrungszeichen
+doku_{i} = \"\"\"
+mehrzeilig, defn bleibt stehen
+\"\"\"
+"""
+
+CHILD = """
+import resource, sys
+sys.path.insert(0, {root!r})
+from schlange.transpile import transpile_file_stream
+if {stream}:
+    with open({out!r}, "w", encoding="utf-8") as fh:
+        fh.writelines(transpile_file_stream({src!r}))
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_synthetic(path: str, size_mb: int) -> int:
+    """Write roughly *size_mb* MB of Schlange code; return the byte count."""
+    target = size_mb * 1024 * 1024
+    written = 0
+    i = 0
+    with open(path, "w", encoding="utf-8") as fh:
+        while written < target:
+            chunk = "".join(BLOCK.format(i=i + k) for k in range(1000))
+            fh.write(chunk)
+            written += len(chunk.encode("utf-8"))
+            i += 1000
+    return written
+
+
+def child_peak_rss_kb(src: str, out: str, stream: bool) -> int:
+    code = CHILD.format(root=ROOT, src=src, out=out, stream=stream)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=500)
+    parser.add_argument("--budget-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "gross.schl.py")
+        out = os.path.join(tmp, "gross.py")
+        size = write_synthetic(src, args.size_mb)
+        print(f"Input: {size / 2**20:,.0f} MB")
+
+        idle_kb = child_peak_rss_kb(src, out, stream=False)
+        start = time.perf_counter()
+        peak_kb = child_peak_rss_kb(src, out, stream=True)
+        elapsed = time.perf_counter() - start
+
+    growth_mb = (peak_kb - idle_kb) / 1024
+    print(f"  idle RSS:      {idle_kb / 1024:8.1f} MB")
+    print(f"  streaming RSS: {peak_kb / 1024:8.1f} MB  (+{growth_mb:.1f} MB)")
+    print(f"  throughput:    {size / 2**20 / elapsed:8.1f} MB/s")
+
+    if growth_mb > args.budget_mb:
+        print(f"FAIL: streaming grew RSS by more than {args.budget_mb} MB")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Seeded generator of synthetic Spotify exports for the parser benchmarks.
+
+Writes ``endsong_*.json`` files (extended history) and, for the most recent
+plays, ``StreamingHistory*.json`` files (basic history), shaped like a real
+multi-year export:
+
+- tracks and artists are Zipf-distributed (a few are played constantly, most
+  once or twice), and some tracks also appear under variant titles
+  (``" - Remastered 2011"``, ``" (feat. ...)"``);
+- plays come in listening sessions, so timestamps advance by track lengths
+  with occasional long gaps, scaled so any export spans :data:`SPAN`
+  (2014-2024); exports too large for one listener's real time, such as
+  multi-user archives, have their sessions compressed to fit;
+- about a fifth of plays are skipped early (``reason_end="fwdbtn"``), some are
+  shorter than the 30 s ``min_ms`` cutoff, and a few records are podcast
+  episodes without track metadata;
+- plays are spread over several platforms, with shuffle and offline flags.
+
+The same ``--seed`` and ``--plays`` always produce byte-identical files.
+Records are written file by file, so ``--plays 20000000`` needs no more
+memory than 10k.
+
+Usage:
+    python benchmarks/spotify_synth.py out/bench/1m --size 1m
+    python benchmarks/spotify_synth.py out/bench/custom --plays 250000 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import datetime as dt
+import itertools
+import json
+import os
+import random
+import sys
+
+# Named sizes used by the benchmarks; bench_spotify.py compares only those
+# with a recorded baseline (20m has none: recording it takes ~10 GB of JSON)
+SIZES = {"10k": 10_000, "1m": 1_000_000, "20m": 20_000_000}
+
+DEFAULT_SEED = 2000
+
+# Real exports split the extended history into files of roughly this many plays
+PLAYS_PER_FILE = 20_000
+
+# Share of the (most recent) plays written as basic StreamingHistory files
+BASIC_SHARE = 0.1
+
+# Below 1 so the top track holds a few percent of plays, as in real histories
+ZIPF_EXPONENT = 0.8
+
+# First and last timestamp of every export, whatever its size
+SPAN = (dt.datetime(2014, 1, 1, 8, 0, 0), dt.datetime(2024, 12, 31, 23, 0, 0))
+# Share of SPAN the expected history fills, leaving room for random overshoot
+SPAN_FILL = 0.97
+
+# Chance that a play starts a new listening session
+SESSION_CHANCE = 0.03
+
+PLATFORMS = [
+    ("Android OS 13 API 33 (Google, Pixel 7)", 40),
+    ("iOS 16.5 (iPhone14,2)", 25),
+    ("OS X 13.4.1 [x86 8]", 15),
+    ("Windows 10 (10.0.19045; x64)", 10),
+    ("web_player windows 10;chrome 114.0.5735.199;desktop", 6),
+    ("Partner sonos_speaker Sonos One", 4),
+]
+REASONS_START = [("trackdone", 60), ("clickrow", 15), ("fwdbtn", 15), ("playbtn", 6), ("appload", 4)]
+COUNTRIES = [("NL", 80), ("DE", 12), ("BE", 5), ("US", 3)]
+VARIANTS = [" - Remastered 2011", " - Radio Edit", " (feat. MC Schlange)", " - Single Version"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "to", "vu", "ber", "ga", "lin", "ost", "schl", "an", "ge", "dor", "fi"]
+
+
+def _weighted(pairs: list[tuple[str, int]]) -> tuple[list[str], list[int]]:
+    values = [value for value, _ in pairs]
+    return values, list(itertools.accumulate(weight for _, weight in pairs))
+
+
+_COUNTRIES = _weighted(COUNTRIES)
+
+
+def _zipf_cumulative(n: int, exponent: float = ZIPF_EXPONENT) -> list[float]:
+    return list(itertools.accumulate(1.0 / (rank**exponent) for rank in range(1, n + 1)))
+
+
+def _name(rng: random.Random, words: int) -> str:
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize() for _ in range(words)
+    )
+
+
+class Catalogue:
+    """Synthetic tracks with Zipf popularity, each owned by a Zipf-popular artist."""
+
+    def __init__(self, rng: random.Random, tracks: int) -> None:
+        artists = max(tracks // 12, 10)
+        self.artists = [_name(rng, rng.randint(1, 2)) for _ in range(artists)]
+        artist_weights = _zipf_cumulative(artists)
+        self.albums = [_name(rng, rng.randint(1, 3)) for _ in range(max(tracks // 10, 1))]
+        self.titles = []
+        self.track_artist = []
+        self.track_album = []
+        self.lengths = []
+        for _ in range(tracks):
+            self.titles.append(_name(rng, rng.randint(1, 4)))
+            self.track_artist.append(bisect.bisect_left(artist_weights, rng.random() * artist_weights[-1]))
+            self.track_album.append(rng.randrange(len(self.albums)))
+            self.lengths.append(rng.randint(120_000, 360_000))
+        self.weights = _zipf_cumulative(tracks)
+        # Shuffle popularity so track ids say nothing about rank
+        self.order = list(range(tracks))
+        rng.shuffle(self.order)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def pick(self, rng: random.Random, k: int) -> list[int]:
+        ranks = rng.choices(range(len(self.order)), cum_weights=self.weights, k=k)
+        return [self.order[rank] for rank in ranks]
+
+
+def _plays(rng: random.Random, catalogue: Catalogue, total: int):
+    """Yield ``(ts, track, ms_played, platform, reason_start, reason_end, shuffle, skipped, offline)``.
+
+    Timestamps stay within :data:`SPAN`: session gaps are scaled to *total*,
+    and when the listening time alone would overflow the span the clock
+    advances by only a fraction of each play.
+    """
+    platforms, platform_weights = _weighted(PLATFORMS)
+    reasons, reason_weights = _weighted(REASONS_START)
+    start, end = SPAN
+    span_s = (end - start).total_seconds() * SPAN_FILL
+    # Expected ms_played, following the skip / partial / complete split below
+    mean_length = sum(catalogue.lengths) / len(catalogue)
+    listening_s = total * (0.2 * 30_250 + 0.05 * mean_length * 2 / 3 + 0.75 * mean_length) / 1000
+    pace = min(1.0, span_s / listening_s)
+    mean_gap_s = max(span_s - listening_s * pace, 0.0) / max(total * SESSION_CHANCE, 1.0)
+    clock = start
+    platform = platforms[0]
+    shuffle = False
+    produced = 0
+    while produced < total:
+        batch = catalogue.pick(rng, min(4096, total - produced))
+        for track in batch:
+            if rng.random() < SESSION_CHANCE:
+                # A new session: hours or days later, maybe on another device
+                clock += dt.timedelta(seconds=rng.uniform(0.0, 2 * mean_gap_s))
+                platform = rng.choices(platforms, cum_weights=platform_weights)[0]
+                shuffle = rng.random() < 0.5
+            length = catalogue.lengths[track]
+            roll = rng.random()
+            if roll < 0.2:
+                ms, reason_end, skipped = rng.randint(500, 60_000), "fwdbtn", rng.random() < 0.8
+            elif roll < 0.25:
+                ms, reason_end, skipped = rng.randint(length // 3, length), "endplay", False
+            else:
+                ms, reason_end, skipped = length, "trackdone", False
+            clock = min(clock + dt.timedelta(milliseconds=ms * pace), end)
+            reason_start = rng.choices(reasons, cum_weights=reason_weights)[0]
+            offline = platform.startswith(("Android", "iOS")) and rng.random() < 0.05
+            yield clock, track, ms, platform, reason_start, reason_end, shuffle, skipped, offline
+        produced += len(batch)
+
+
+def _extended_record(rng: random.Random, catalogue: Catalogue, play: tuple) -> dict:
+    clock, track, ms, platform, reason_start, reason_end, shuffle, skipped, offline = play
+    countries, country_weights = _COUNTRIES
+    if rng.random() < 0.02:
+        return {
+            "ts": clock.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "platform": platform,
+            "ms_played": ms,
+            "conn_country": "NL",
+            "master_metadata_track_name": None,
+            "master_metadata_album_artist_name": None,
+            "master_metadata_album_album_name": None,
+            "spotify_track_uri": None,
+            "episode_name": f"Folge {track}",
+            "episode_show_name": "Der Schlange-Podcast",
+            "spotify_episode_uri": f"spotify:episode:{track:022d}",
+            "reason_start": reason_start,
+            "reason_end": reason_end,
+            "shuffle": False,
+            "skipped": skipped,
+            "offline": offline,
+            "incognito_mode": False,
+        }
+    title = catalogue.titles[track]
+    if track % 17 == 0 and rng.random() < 0.3:
+        title += VARIANTS[track % len(VARIANTS)]
+    return {
+        "ts": clock.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "platform": platform,
+        "ms_played": ms,
+        "conn_country": rng.choices(countries, cum_weights=country_weights)[0],
+        "master_metadata_track_name": title,
+        "master_metadata_album_artist_name": catalogue.artists[catalogue.track_artist[track]],
+        "master_metadata_album_album_name": catalogue.albums[catalogue.track_album[track]],
+        "spotify_track_uri": f"spotify:track:{track:022d}",
+        "episode_name": None,
+        "episode_show_name": None,
+        "spotify_episode_uri": None,
+        "reason_start": reason_start,
+        "reason_end": reason_end,
+        "shuffle": shuffle,
+        "skipped": skipped,
+        "offline": offline,
+        "incognito_mode": False,
+    }
+
+
+def _basic_record(catalogue: Catalogue, play: tuple) -> dict:
+    clock, track, ms = play[:3]
+    return {
+        "endTime": clock.strftime("%Y-%m-%d %H:%M"),
+        "artistName": catalogue.artists[catalogue.track_artist[track]],
+        "trackName": catalogue.titles[track],
+        "msPlayed": ms,
+    }
+
+
+def write_export(
+    out_dir: str, plays: int, seed: int = DEFAULT_SEED, tracks: int | None = None, basic_share: float = BASIC_SHARE
+) -> list[str]:
+    """Write a synthetic export of *plays* records to *out_dir*; return the file paths.
+
+    *tracks* defaults to one distinct track per 25 plays (at least 1000,
+    at most 500k), about the ratio of a real long-term history.
+    """
+    rng = random.Random(seed)
+    tracks = tracks or min(max(plays // 25, 1000), 500_000)
+    catalogue = Catalogue(rng, tracks)
+    os.makedirs(out_dir, exist_ok=True)
+    basic = int(plays * basic_share)
+    extended = plays - basic
+
+    paths = []
+    stream = _plays(rng, catalogue, plays)
+    for index, first in enumerate(range(0, extended, PLAYS_PER_FILE)):
+        chunk = itertools.islice(stream, min(PLAYS_PER_FILE, extended - first))
+        records = [_extended_record(rng, catalogue, play) for play in chunk]
+        paths.append(_dump(os.path.join(out_dir, f"endsong_{index}.json"), records))
+    for index, first in enumerate(range(0, basic, PLAYS_PER_FILE)):
+        chunk = itertools.islice(stream, min(PLAYS_PER_FILE, basic - first))
+        records = [_basic_record(catalogue, play) for play in chunk]
+        paths.append(_dump(os.path.join(out_dir, f"StreamingHistory{index}.json"), records))
+    return paths
+
+
+def _dump(path: str, records: list[dict]) -> str:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(records, fh, ensure_ascii=False)
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--plays", type=int, help="overrides --size")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    plays = args.plays or SIZES[args.size]
+    paths = write_export(args.out_dir, plays, args.seed)
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f"Wrote {plays:,} plays in {len(paths)} files ({size / 2**20:,.1f} MB) to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Bulk syntax/compile validation for Schlange scripts.
+
+Transpiles and ``compile()``s every ``.schl.py`` file, in parallel across a
+process pool, and reports problems at *Schlange* line numbers.  Files whose
+content hash is already recorded in the verified-cache are skipped, so
+re-checking a large tree only costs one read + hash per unchanged file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import tokenize
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable
+
+from schlange import __version__
+from schlange.transpile import transpile
+
+DEFAULT_CACHE_PATH = ".schlange_check_cache.json"
+SCHLANGE_GLOB = "*.schl.py"
+
+# Files per worker task -- small enough to balance, large enough to amortise IPC
+_CHUNK_SIZE = 32
+
+# Cache keys must change whenever transpile output or compile rules may change
+_KEY_SALT = f"schlange {__version__} / python {sys.version_info[0]}.{sys.version_info[1]}\n".encode()
+
+
+@dataclass
+class Diagnostic:
+    """A single problem found in a Schlange file."""
+
+    path: str
+    line: int
+    col: int
+    kind: str
+    message: str
+
+    def to_text(self) -> str:
+        return f"{self.path}:{self.line}:{self.col}: {self.kind}: {self.message}"
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+@dataclass
+class CheckReport:
+    """Outcome of a bulk check."""
+
+    checked: int
+    cached: int
+    diagnostics: list[Diagnostic]
+
+    @property
+    def passed(self) -> bool:
+        return not self.diagnostics
+
+
+def source_key(data: bytes) -> str:
+    """Return the verified-cache key for raw file contents."""
+    return hashlib.sha256(_KEY_SALT + data).hexdigest()
+
+
+def collect_paths(paths: Iterable[str]) -> list[str]:
+    """Expand directories to the ``.schl.py`` files below them (sorted)."""
+    files: list[str] = []
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            files.extend(str(f) for f in sorted(p.rglob(SCHLANGE_GLOB)))
+        else:
+            files.append(str(p))
+    return files
+
+
+def check_source(source: str, path: str) -> Diagnostic | None:
+    """Transpile and compile *source*, returning the first problem (if any).
+
+    Transpiler errors already carry source rows; compile errors are mapped
+    back through a source map, built only for files that fail.
+    """
+    try:
+        python_source = transpile(source)
+    except tokenize.TokenError as exc:
+        message, (line, col) = exc.args
+        return Diagnostic(path, line, col, "TokenError", message)
+    except SyntaxError as exc:
+        return Diagnostic(path, exc.lineno or 0, max((exc.offset or 1) - 1, 0), type(exc).__name__, exc.msg)
+
+    try:
+        compile(python_source, path, "exec", dont_inherit=True)
+    except SyntaxError as exc:
+        line, col = exc.lineno or 0, max((exc.offset or 1) - 1, 0)
+        mapped = transpile(source, source_map=True)[1].lookup(line, col) if line else None
+        if mapped is not None:
+            line, col = mapped
+        return Diagnostic(path, line, col, type(exc).__name__, exc.msg)
+    return None
+
+
+def _check_chunk(paths: list[str]) -> list[tuple[str, str, Diagnostic | None]]:
+    """Worker: check a chunk of files, returning ``(path, key, diagnostic)``."""
+    results = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        try:
+            source = data.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            results.append((path, "", Diagnostic(path, 1, exc.start, "UnicodeDecodeError", exc.reason)))
+            continue
+        results.append((path, source_key(data), check_source(source, path)))
+    return results
+
+
+def load_cache(cache_path: str) -> set[str]:
+    """Load the set of verified source keys."""
+    if not os.path.exists(cache_path):
+        return set()
+    with open(cache_path, encoding="utf-8") as fh:
+        try:
+            return set(json.load(fh))
+        except ValueError:
+            return set()
+
+
+def save_cache(cache_path: str, keys: set[str]) -> None:
+    """Persist the set of verified source keys."""
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as fh:
+        json.dump(sorted(keys), fh)
+
+
+def check_paths(
+    paths: Iterable[str],
+    workers: int | None = None,
+    cache_path: str | None = DEFAULT_CACHE_PATH,
+) -> CheckReport:
+    """Check every ``.schl.py`` file under *paths*.
+
+    Args:
+        paths: Files and/or directories (searched recursively).
+        workers: Worker processes (default: CPU count).  ``1`` checks inline.
+        cache_path: Verified-cache location, or ``None`` to disable caching.
+
+    Returns:
+        A :class:`CheckReport` with diagnostics sorted by path.
+    """
+    files = collect_paths(paths)
+    verified = load_cache(cache_path) if cache_path else set()
+
+    pending: list[str] = []
+    for path in files:
+        if verified:
+            with open(path, "rb") as fh:
+                if source_key(fh.read()) in verified:
+                    continue
+        pending.append(path)
+
+    chunks = [pending[i : i + _CHUNK_SIZE] for i in range(0, len(pending), _CHUNK_SIZE)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks)) or 1
+    if workers == 1:
+        results = [r for chunk in chunks for r in _check_chunk(chunk)]
+    else:
+        # Imported here: multiprocessing is costly to load on every CLI start.
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [r for chunk_results in pool.map(_check_chunk, chunks) for r in chunk_results]
+
+    diagnostics = []
+    for _, key, diagnostic in results:
+        if diagnostic is None:
+            verified.add(key)
+        else:
+            diagnostics.append(diagnostic)
+
+    if cache_path and len(pending) > len(diagnostics):
+        save_cache(cache_path, verified)
+
+    return CheckReport(checked=len(files), cached=len(files) - len(pending), diagnostics=diagnostics)
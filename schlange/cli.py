@@ -3,6 +3,7 @@
 Usage:
     schlange run   examples/hello.schl.py
     schlange emit  examples/hello.schl.py
+    schlange check tools/ examples/
     schlange repl
 """
 
@@ -17,7 +18,9 @@ import traceback
 import click
 
 from schlange import __version__
-from schlange.transpile import transpile, transpile_file
+from schlange.check import DEFAULT_CACHE_PATH, check_paths
+from schlange.sourcemap import map_path_for
+from schlange.transpile import transpile, transpile_file, transpile_file_stream
 
 
 @click.group()
@@ -62,15 +65,47 @@ def run(script: str, args: tuple[str, ...]) -> None:
 @main.command()
 @click.argument("script", type=click.Path(exists=True))
 @click.option("-o", "--output", type=click.Path(), default=None, help="Write transpiled Python to file instead of stdout.")
-def emit(script: str, output: str | None) -> None:
+@click.option("--source-map", is_flag=True, help="Also write a source map next to the output (OUTPUT.schlmap).")
+def emit(script: str, output: str | None, source_map: bool) -> None:
     """Output the transpiled Python source (for debugging)."""
-    python_source = transpile_file(script)
-    if output:
+    if source_map and not output:
+        raise click.UsageError("--source-map requires --output")
+    if source_map:
+        python_source, smap = transpile_file(script, source_map=True)
         with open(output, "w", encoding="utf-8") as fh:
             fh.write(python_source)
+        smap.save(map_path_for(output))
+        click.echo(f"Transpiled output written to {output}")
+        click.echo(f"Source map written to {map_path_for(output)}")
+    elif output:
+        # Stream chunk by chunk so huge sources never sit in memory whole
+        with open(output, "w", encoding="utf-8") as fh:
+            fh.writelines(transpile_file_stream(script))
         click.echo(f"Transpiled output written to {output}")
     else:
-        click.echo(python_source)
+        for chunk in transpile_file_stream(script):
+            click.echo(chunk, nl=False)
+        click.echo()
+
+
+@main.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+@click.option("--format", "fmt", type=click.Choice(["text", "json"]), default="text", help="Diagnostic output format.")
+@click.option("--cache", "cache_path", type=click.Path(), default=DEFAULT_CACHE_PATH, help="Verified-cache file.")
+@click.option("--no-cache", is_flag=True, help="Re-check every file, ignoring the verified-cache.")
+def check(paths: tuple[str, ...], workers: int | None, fmt: str, cache_path: str, no_cache: bool) -> None:
+    """Transpile and compile every .schl.py file under PATHS."""
+    report = check_paths(paths, workers=workers, cache_path=None if no_cache else cache_path)
+    for diagnostic in report.diagnostics:
+        click.echo(diagnostic.to_json() if fmt == "json" else diagnostic.to_text())
+    if fmt == "text":
+        click.echo(
+            f"{report.checked} files checked, {report.cached} cached, {len(report.diagnostics)} with errors",
+            err=True,
+        )
+    if not report.passed:
+        sys.exit(1)
 
 
 @main.command()
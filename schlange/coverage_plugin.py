@@ -0,0 +1,101 @@
+"""coverage.py plugin -- report coverage against ``.schl.py`` sources.
+
+``schlange run`` compiles transpiled code under the original ``.schl.py``
+filename, so coverage.py sees the right file but *generated* line numbers.
+This plugin claims those files and maps every executed line back to the
+Schlange source through the source map's line table
+(:meth:`schlange.sourcemap.SourceMap.line_table`), computed once per file.
+The tracer hot path is a single array lookup per line event.
+
+Enable it in ``pyproject.toml``::
+
+    [tool.coverage.run]
+    plugins = ["schlange.coverage_plugin"]
+
+then run e.g. ``coverage run -m schlange.cli run tools/tom2000.schl.py``.
+"""
+
+from __future__ import annotations
+
+import os
+from array import array
+from types import CodeType, FrameType
+from typing import Any
+
+import coverage
+
+from schlange.transpile import transpile
+
+SCHLANGE_SUFFIX = ".schl.py"
+
+# filename -> (mtime_ns, python_source, line_table)
+_TABLES: dict[str, tuple[int, str, array]] = {}
+
+
+def _transpiled(filename: str) -> tuple[str, array]:
+    """Return the transpiled source and generated->source line table for *filename*."""
+    mtime = os.stat(filename).st_mtime_ns
+    cached = _TABLES.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(filename, encoding="utf-8") as fh:
+            python_source, smap = transpile(fh.read(), source_map=True)
+        cached = _TABLES[filename] = (mtime, python_source, smap.line_table())
+    return cached[1], cached[2]
+
+
+def _code_lines(code: CodeType) -> set[int]:
+    """Collect the line numbers of every instruction in *code* and nested code."""
+    lines = {line for _, _, line in code.co_lines() if line is not None}
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            lines |= _code_lines(const)
+    return lines
+
+
+class SchlangeFileTracer(coverage.FileTracer):
+    """Maps generated line events of one ``.schl.py`` file to source lines."""
+
+    def __init__(self, filename: str) -> None:
+        self._filename = filename
+        _, self._table = _transpiled(filename)
+        self._size = len(self._table)
+
+    def source_filename(self) -> str:
+        return self._filename
+
+    def line_number_range(self, frame: FrameType) -> tuple[int, int]:
+        lineno = frame.f_lineno
+        if lineno >= self._size:
+            return -1, -1
+        line = self._table[lineno]
+        return line, line
+
+
+class SchlangeFileReporter(coverage.FileReporter):
+    """Reports statements and source text of a ``.schl.py`` file."""
+
+    def lines(self) -> set[int]:
+        python_source, table = _transpiled(self.filename)
+        code = compile(python_source, self.filename, "exec")
+        return {table[line] for line in _code_lines(code) if 0 < line < len(table)}
+
+    def source(self) -> str:
+        with open(self.filename, encoding="utf-8") as fh:
+            return fh.read()
+
+
+class SchlangeCoveragePlugin(coverage.CoveragePlugin):
+    """File-tracer plugin for Schlange scripts."""
+
+    def file_tracer(self, filename: str) -> SchlangeFileTracer | None:
+        if filename.endswith(SCHLANGE_SUFFIX) and os.path.isfile(filename):
+            return SchlangeFileTracer(filename)
+        return None
+
+    def file_reporter(self, filename: str) -> SchlangeFileReporter:
+        return SchlangeFileReporter(filename)
+
+
+def coverage_init(reg: Any, options: dict[str, str]) -> None:
+    """Entry point called by coverage.py for ``plugins = [...]``."""
+    reg.add_file_tracer(SchlangeCoveragePlugin())
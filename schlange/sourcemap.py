@@ -0,0 +1,231 @@
+"""Source maps from transpiled Python back to Schlange source positions.
+
+Tracebacks, profilers, coverage and linters all report positions in the
+*generated* Python.  A :class:`SourceMap` translates those coordinates back to
+the ``.schl.py`` file the user actually wrote.
+
+Storage is deliberately compact: one flat delta-encoded ``array('i')`` of
+int pairs for the whole file, written by the transpiler as it goes and
+zlib-compressed once it is done (:meth:`SourceMap.pack`):
+
+- ``(-line_delta, src_line_delta)`` starts the generated line *line_delta*
+  below the previous start, at column 0 of the source line *src_line_delta*
+  below the previous one;
+- ``(col_delta, src_col_delta)`` adds a segment on the current line, that
+  many columns right of the previous segment.
+
+Generated lines without a start (most blank lines) hold no segments.
+Segments are only recorded where the column offset between generated and
+source text changes (line starts, rewritten keywords, quote words), so most
+lines hold a single pair.  The deltas repeat heavily, so a packed map
+retains a few percent of the generated text's size.  Queries unpack and
+decode the pairs sequentially; they are rare (one lookup per error, one
+:meth:`SourceMap.line_table` per file).
+
+Lines are 1-based and columns 0-based, matching ``tokenize`` and tracebacks.
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_right
+from typing import BinaryIO, Iterator
+
+_MAGIC = b"SCHLMAP3"
+_HEADER = struct.Struct("<8sII")
+
+
+class SourceMap:
+    """Maps generated Python ``(line, col)`` positions to Schlange positions.
+
+    Attributes:
+        gen_lines: Number of generated lines the map covers.
+    """
+
+    __slots__ = ("_pairs", "_packed", "gen_lines")
+
+    def __init__(self, pairs: array | None = None, gen_lines: int = 0) -> None:
+        self._pairs = pairs if pairs is not None else array("i")
+        # zlib-compressed little-endian pairs once packed; _pairs is then None
+        self._packed: bytes | None = None
+        self.gen_lines = gen_lines
+
+    @property
+    def pairs(self) -> array:
+        """The delta-encoded segment pairs described above.
+
+        While the map is being built this is the live array the transpiler
+        appends to; after :meth:`pack` each access unpacks a fresh copy.
+        """
+        if self._pairs is not None:
+            return self._pairs
+        assert self._packed is not None
+        pairs = array("i")
+        pairs.frombytes(zlib.decompress(self._packed))
+        if sys.byteorder == "big":
+            pairs.byteswap()
+        return pairs
+
+    def pack(self) -> None:
+        """Compress the finished pairs; further segments can't be added."""
+        self._packed = self._packed_pairs()
+        self._pairs = None
+
+    def _packed_pairs(self) -> bytes:
+        if self._packed is not None:
+            return self._packed
+        assert self._pairs is not None
+        pairs = self._pairs
+        if sys.byteorder == "big":
+            pairs = array("i", pairs)
+            pairs.byteswap()
+        # A 4 KiB window already catches the repeats; zlib's default state
+        # (about 300 KiB) would dwarf the map itself on small files
+        packer = zlib.compressobj(6, zlib.DEFLATED, 12, 4)
+        return packer.compress(pairs.tobytes()) + packer.flush()
+
+    def __len__(self) -> int:
+        return self.gen_lines
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SourceMap):
+            return NotImplemented
+        return self.gen_lines == other.gen_lines and self.pairs == other.pairs
+
+    # -- querying -----------------------------------------------------------
+
+    def _rows(self) -> Iterator[tuple[int, list[tuple[int, int, int]]]]:
+        """Yield ``(gen_line, segments)`` for every line with segments, in order."""
+        pairs = self.pairs
+        line = src_line = 0
+        segs: list[tuple[int, int, int]] = []
+        col = src_col = 0
+        for i in range(0, len(pairs), 2):
+            a, b = pairs[i], pairs[i + 1]
+            if a < 0:
+                if segs:
+                    yield line, segs
+                line -= a
+                src_line += b
+                col = src_col = 0
+                segs = [(0, src_line, 0)]
+            else:
+                col += a
+                src_col += b
+                segs.append((col, src_line, src_col))
+        if segs:
+            yield line, segs
+
+    def segments(self, gen_line: int) -> list[tuple[int, int, int]]:
+        """Return the decoded ``(gen_col, src_line, src_col)`` segments of a line."""
+        for line, segs in self._rows():
+            if line >= gen_line:
+                return segs if line == gen_line else []
+        return []
+
+    def lookup(self, gen_line: int, gen_col: int = 0) -> tuple[int, int] | None:
+        """Map a generated position to ``(src_line, src_col)``.
+
+        Lines without segments (blank lines emitted between statements) map to
+        the nearest preceding mapped line.  Returns ``None`` when nothing
+        precedes the position.
+        """
+        found = None
+        for line, segs in self._rows():
+            if line > gen_line:
+                break
+            found = line, segs
+        if found is None:
+            return None
+        line, decoded = found
+        if line != gen_line:
+            return decoded[-1][1], decoded[-1][2]
+        idx = max(bisect_right([seg[0] for seg in decoded], gen_col) - 1, 0)
+        seg_col, src_line, src_col = decoded[idx]
+        return src_line, max(src_col + (gen_col - seg_col), 0)
+
+    def line_table(self) -> array:
+        """Return a flat ``array('i')`` mapping generated line -> source line.
+
+        Index 0 is unused so ``table[frame.f_lineno]`` works directly.  Lines
+        without segments inherit the previous mapped line (0 before the first).
+        """
+        table = array("i", bytes(4 * (self.gen_lines + 1)))
+        pairs = self.pairs
+        line = src_line = 0
+        for i in range(0, len(pairs), 2):
+            if pairs[i] < 0:
+                table[line + 1 : line - pairs[i]] = array("i", [src_line]) * (-pairs[i] - 1)
+                line -= pairs[i]
+                src_line += pairs[i + 1]
+                table[line] = src_line
+        table[line + 1 :] = array("i", [src_line]) * (self.gen_lines - line)
+        return table
+
+    # -- persistence --------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a binary blob (header plus the packed pairs)."""
+        packed = self._packed_pairs()
+        return _HEADER.pack(_MAGIC, self.gen_lines, len(packed)) + packed
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> SourceMap:
+        """Inverse of :meth:`to_bytes`; the pairs stay packed until queried."""
+        if len(data) < _HEADER.size or data[:8] != _MAGIC:
+            raise ValueError("Not a Schlange source map")
+        _, gen_lines, size = _HEADER.unpack_from(data, 0)
+        smap = cls(gen_lines=gen_lines)
+        smap._pairs = None
+        smap._packed = bytes(data[_HEADER.size : _HEADER.size + size])
+        return smap
+
+    def save(self, path: str) -> None:
+        """Write the map to *path*."""
+        with open(path, "wb") as fh:
+            self._write(fh)
+
+    def _write(self, fh: BinaryIO) -> None:
+        fh.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> SourceMap:
+        """Read a map written by :meth:`save`."""
+        with open(path, "rb") as fh:
+            return cls.from_bytes(fh.read())
+
+
+def map_path_for(path: str) -> str:
+    """Return the sidecar path a source map for *path* is stored at."""
+    return path + ".schlmap"
+
+
+class ColumnShifts:
+    """Per-line column breakpoints left behind by the quote pre-pass.
+
+    The pre-pass replaces quote words with quote characters, shifting every
+    column after the replacement.  For each touched line, ``lines`` holds
+    parallel sorted ``(prepass_cols, source_cols)`` breakpoint lists; untouched
+    lines are absent and map columns 1:1.
+    """
+
+    __slots__ = ("lines",)
+
+    def __init__(self) -> None:
+        self.lines: dict[int, tuple[list[int], list[int]]] = {}
+
+    def add(self, line: int, out_col: int, src_col: int) -> None:
+        cols = self.lines.get(line)
+        if cols is None:
+            cols = self.lines[line] = ([0], [0])
+        cols[0].append(out_col)
+        cols[1].append(src_col)
+
+
+def shifted_col(cols: tuple[list[int], list[int]], col: int) -> int:
+    """Translate *col* through one line's ``(prepass_cols, source_cols)`` breakpoints."""
+    idx = bisect_right(cols[0], col) - 1
+    return cols[1][idx] + (col - cols[0][idx])
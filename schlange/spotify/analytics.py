@@ -0,0 +1,178 @@
+"""Skip, completion and platform analytics over :class:`PlayTable` columns.
+
+Everything here is a group-by over small-int columns: skip rates group the
+``skipped`` flags by key or artist id, completion ratios divide ``ms`` by
+each track's longest play, and breakdowns count plays per
+:class:`~schlange.spotify.table.CategoryColumn` code.  Labels are looked up
+only for the final rows.  Each function runs in pure Python or with NumPy
+(``engine="numpy"``), with identical results.
+
+The category breakdowns need the extended-history fields, which the parser
+keeps only on request::
+
+    table = load_export(path, extras=True)
+    platform_breakdown(table)  # -> [Breakdown("android", 41230, ...), ...]
+    skip_rates(table, by="artist", min_plays=20)[:10]
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import NamedTuple, Sequence
+
+from schlange.spotify import optional
+from schlange.spotify.parser import PlayRecord
+from schlange.spotify.table import CATEGORY_FIELDS, PlayTable
+
+SKIP_GROUPS = ("track", "artist")
+
+DEFAULT_BINS = 10
+
+
+class SkipRate(NamedTuple):
+    """Skips of one track (or artist: ``track_name`` is then empty)."""
+
+    track_name: str
+    artist_name: str
+    plays: int
+    skips: int
+
+    @property
+    def rate(self) -> float:
+        return self.skips / self.plays
+
+
+class Breakdown(NamedTuple):
+    """Plays sharing one category label."""
+
+    label: str
+    plays: int
+    total_ms: int
+    skips: int
+
+
+def _as_table(plays: Sequence[PlayRecord]) -> PlayTable:
+    return plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
+
+
+def _group_sums(
+    groups: array, size: int, ms: array, skipped: array, engine: str
+) -> tuple[Sequence[int], Sequence[int], Sequence[int]]:
+    """Return plays, total ms and skips per group id in ``range(size)``."""
+    np = optional.numpy() if engine == "numpy" else None
+    if np is not None:
+        ids = np.frombuffer(groups, dtype=np.dtype(groups.typecode))
+        counts = np.bincount(ids, minlength=size)
+        totals = np.bincount(ids, weights=np.frombuffer(ms, dtype=np.int64), minlength=size)
+        skips = np.bincount(ids, weights=np.frombuffer(skipped, dtype=np.int8), minlength=size)
+        return counts.tolist(), totals.astype(np.int64).tolist(), skips.astype(np.int64).tolist()
+    counts = array("q", bytes(8 * size))
+    totals = array("q", bytes(8 * size))
+    skips = array("q", bytes(8 * size))
+    for group, played, skip in zip(groups, ms, skipped):
+        counts[group] += 1
+        totals[group] += played
+        skips[group] += skip
+    return counts, totals, skips
+
+
+def skip_rates(
+    plays: Sequence[PlayRecord], by: str = "track", min_plays: int = 1, engine: str = "python"
+) -> list[SkipRate]:
+    """Return the skip rate of every track (or artist) with at least *min_plays* plays.
+
+    Sorted by rate, then plays, highest first; ties keep first-appearance
+    order.  Only extended histories record skips.
+    """
+    if by not in SKIP_GROUPS:
+        raise ValueError(f"Unknown skip grouping: {by!r} (expected one of {', '.join(SKIP_GROUPS)})")
+    table = _as_table(plays)
+    tracks, artists = table.tracks.values, table.artists.values
+    if by == "track":
+        groups, size = table.key, len(table.keys)
+    else:
+        groups, size = table.artist, len(table.artists)
+    counts, _totals, skips = _group_sums(groups, size, table.ms, table.skipped, engine)
+
+    rows = []
+    for group in range(size):
+        count = counts[group]
+        if count and count >= min_plays:
+            if by == "track":
+                name = (tracks[table.keys.track[group]], artists[table.keys.artist[group]])
+            else:
+                name = ("", artists[group])
+            rows.append(SkipRate(*name, count, skips[group]))
+    # Stable sort: equal rates and counts stay in group-id (first-seen) order
+    rows.sort(key=lambda r: (r.skips / r.plays, r.plays), reverse=True)
+    return rows
+
+
+def completion_ratios(plays: Sequence[PlayRecord], engine: str = "python") -> list[float]:
+    """Return ``ms_played`` of every play over its track's longest play.
+
+    Spotify exports carry no track durations, so the longest play stands in
+    for the length (as in :mod:`schlange.spotify.scoring`).
+    """
+    table = _as_table(plays)
+    np = optional.numpy() if engine == "numpy" else None
+    if np is not None:
+        key = np.frombuffer(table.key, dtype=np.int32)
+        ms = np.frombuffer(table.ms, dtype=np.int64)
+        longest = np.zeros(len(table.keys), dtype=np.int64)
+        np.maximum.at(longest, key, ms)
+        full = longest[key]
+        return np.where(full > 0, ms / np.maximum(full, 1), 0.0).tolist()
+    longest = array("q", bytes(8 * len(table.keys)))
+    for key, ms in zip(table.key, table.ms):
+        if ms > longest[key]:
+            longest[key] = ms
+    return [ms / longest[key] if longest[key] else 0.0 for key, ms in zip(table.key, table.ms)]
+
+
+def completion_histogram(plays: Sequence[PlayRecord], bins: int = DEFAULT_BINS, engine: str = "python") -> list[int]:
+    """Return play counts per completion-ratio bin.
+
+    Bin ``i`` covers ratios in ``[i / bins, (i + 1) / bins)``; the last bin
+    also holds complete plays (ratio 1).
+    """
+    if bins < 1:
+        raise ValueError("bins must be at least 1")
+    ratios = completion_ratios(plays, engine)
+    np = optional.numpy() if engine == "numpy" else None
+    if np is not None:
+        index = np.minimum((np.asarray(ratios) * bins).astype(np.int64), bins - 1)
+        return np.bincount(index, minlength=bins).tolist()
+    counts = [0] * bins
+    last = bins - 1
+    for ratio in ratios:
+        counts[min(int(ratio * bins), last)] += 1
+    return counts
+
+
+def category_breakdown(plays: Sequence[PlayRecord], field: str, engine: str = "python") -> list[Breakdown]:
+    """Return plays, time and skips per label of a category column, most played first.
+
+    Raises:
+        ValueError: If *field* is not a :data:`CATEGORY_FIELDS` entry, or the
+            table was loaded without ``extras=True``.
+    """
+    if field not in CATEGORY_FIELDS:
+        raise ValueError(f"Unknown category field: {field!r} (expected one of {', '.join(CATEGORY_FIELDS)})")
+    table = _as_table(plays)
+    if table.categories is None:
+        raise ValueError("No category columns: load the export with extras=True")
+    column = table.categories[field]
+    counts, totals, skips = _group_sums(column.codes, len(column.labels), table.ms, table.skipped, engine)
+    rows = [
+        Breakdown(label, counts[code], totals[code], skips[code])
+        for code, label in enumerate(column.labels.values)
+        if counts[code]
+    ]
+    rows.sort(key=lambda r: r.plays, reverse=True)
+    return rows
+
+
+def platform_breakdown(plays: Sequence[PlayRecord], engine: str = "python") -> list[Breakdown]:
+    """:func:`category_breakdown` of the ``platform`` field."""
+    return category_breakdown(plays, "platform", engine)
@@ -0,0 +1,89 @@
+"""Binary parse cache for Spotify export files.
+
+Decoding JSON dominates every Tom 2000 run, yet downloaded exports never
+change.  The first parse of a file stores its filtered :class:`PlayTable`
+columns in the compact binary format of :meth:`PlayTable.to_bytes`; later
+runs map that file and copy the arrays out instead of decoding JSON.
+
+Entries are keyed by absolute path (archive members included), size, mtime
+the :class:`~schlange.spotify.filters.PlayFilter` fingerprint and whether
+category columns were kept, so editing, replacing or re-filtering a file
+simply misses the cache.  Entry names start with a hash of the path and of
+its size and mtime, so storing an entry for a changed file removes the
+entries of its earlier versions; entries for other filters of the current
+version are kept.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+
+from schlange import __version__
+from schlange.spotify.filters import PlayFilter
+from schlange.spotify.sources import export_file_identity
+from schlange.spotify.table import PlayTable
+
+DEFAULT_CACHE_DIR = "out/.parse_cache"
+CACHE_SUFFIX = ".playtab"
+
+
+def cache_key(path: str, where: PlayFilter, extras: bool = False) -> str:
+    """Return the cache key of *path* as currently on disk, parsed with *where*.
+
+    The key is ``<path>-<version>-<query>``: hashes of the absolute path, of
+    the schlange version with the file's size and mtime, and of the filter.
+    """
+    abspath, size, mtime_ns = export_file_identity(path)
+    query = where.fingerprint()
+    if extras:
+        query += "\nextras"
+    return "-".join(
+        (_digest(abspath), _digest(f"schlange {__version__}\n{size}\n{mtime_ns}"), _digest(query))
+    )
+
+
+def cache_file(cache_dir: str, path: str, where: PlayFilter, extras: bool = False) -> str:
+    """Return where the cache entry for *path* lives."""
+    return os.path.join(cache_dir, cache_key(path, where, extras) + CACHE_SUFFIX)
+
+
+def load_cached(cache_dir: str, path: str, where: PlayFilter, extras: bool = False) -> PlayTable | None:
+    """Map and load the cached table of *path*, or ``None`` on a miss."""
+    entry = cache_file(cache_dir, path, where, extras)
+    try:
+        with open(entry, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return PlayTable.from_buffer(mm)
+    except (OSError, ValueError, struct.error):
+        # Missing, empty, truncated or foreign entries are all misses
+        return None
+
+
+def store_cached(cache_dir: str, path: str, where: PlayFilter, table: PlayTable, extras: bool = False) -> None:
+    """Write the cache entry for *path* atomically."""
+    entry = cache_file(cache_dir, path, where, extras)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(table.to_bytes())
+    os.replace(tmp, entry)
+    _prune(cache_dir, os.path.basename(entry))
+
+
+def _prune(cache_dir: str, name: str) -> None:
+    """Remove the entries of earlier versions of *name*'s source file."""
+    path_hash, version_hash, _ = name[: -len(CACHE_SUFFIX)].split("-")
+    for other in os.listdir(cache_dir):
+        if other.startswith(path_hash + "-") and other.endswith(CACHE_SUFFIX):
+            if other.split("-")[1] != version_hash:
+                try:
+                    os.remove(os.path.join(cache_dir, other))
+                except OSError:
+                    # Already pruned by a concurrent writer
+                    pass
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
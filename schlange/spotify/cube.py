@@ -0,0 +1,157 @@
+"""Tom-N rankings per year, month, weekday, hour, artist and album in one pass.
+
+Ranking each bucket separately means one ``rank_tracks`` call -- and one
+re-filtered play list -- per year, month, artist, ...  :func:`rank_cube`
+instead scans the :class:`~schlange.spotify.table.PlayTable` columns once,
+accumulating every requested dimension at the same time, and then picks each
+bucket's top N with a heap rather than sorting all of its tracks.
+
+Usage:
+    cube = rank_cube(load_export(path), dimensions=("year", "artist"), top_n=100)
+    cube["year"]["2023"]  # -> list[RankedTrack], as rank_tracks would rank 2023
+
+Time buckets use the export's timestamps as given (UTC); plays whose
+timestamp could not be parsed only appear under ``artist`` and ``album``.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import heapq
+from array import array
+from typing import Hashable, Iterable, Sequence
+
+from schlange.spotify.parser import PlayRecord, RankedTrack
+from schlange.spotify.table import TS_ISO, TS_MINUTE, PlayTable
+
+# Bucket labels: year "2023", month "2023-07", weekday 0 (Monday) .. 6,
+# hour 0 .. 23, artist and album names
+DIMENSIONS = ("year", "month", "weekday", "hour", "artist", "album")
+
+_TIME_DIMENSIONS = frozenset({"year", "month", "weekday", "hour"})
+_EPOCH = dt.date(1970, 1, 1)
+_CELL = array("q", bytes(8 * 4))
+
+
+class _Cells:
+    """Packed ``[count, ms, uri id, album id]`` per (bucket, key), in first-seen order."""
+
+    __slots__ = ("slots", "acc", "buckets", "keys")
+
+    def __init__(self) -> None:
+        self.slots: dict[tuple[Hashable, int], int] = {}
+        self.acc = array("q")
+        self.buckets: list[Hashable] = []
+        self.keys = array("q")
+
+    def add(self, bucket: Hashable, key: int, ms: int, uri: int, album: int) -> None:
+        cell = (bucket, key)
+        slot = self.slots.get(cell)
+        if slot is None:
+            slot = self.slots[cell] = len(self.buckets)
+            self.buckets.append(bucket)
+            self.keys.append(key)
+            self.acc.extend(_CELL)
+        base = slot << 2
+        acc = self.acc
+        acc[base] += 1
+        acc[base + 1] += ms
+        if uri:
+            acc[base + 2] = uri
+        if album:
+            acc[base + 3] = album
+
+    def top(self, top_n: int) -> dict[Hashable, list[int]]:
+        """Return each bucket's top *top_n* slots, ranked like ``rank_tracks``."""
+        by_bucket: dict[Hashable, list[int]] = {}
+        for slot, bucket in enumerate(self.buckets):
+            by_bucket.setdefault(bucket, []).append(slot)
+        acc = self.acc
+        # Slots are numbered by first appearance, so -slot breaks ties
+        # towards the earlier track, like rank_tracks' stable sort
+        return {
+            bucket: heapq.nlargest(top_n, slots, key=lambda s: (acc[s << 2], acc[(s << 2) + 1], -s))
+            for bucket, slots in by_bucket.items()
+        }
+
+
+def rank_cube(
+    plays: Sequence[PlayRecord],
+    dimensions: Iterable[str] = DIMENSIONS,
+    top_n: int = 2000,
+) -> dict[str, dict[Hashable, list[RankedTrack]]]:
+    """Rank tracks within every bucket of every requested dimension.
+
+    Args:
+        plays: A :class:`PlayTable` (or any sequence of play records).
+        dimensions: Any of :data:`DIMENSIONS`.
+        top_n: Number of top tracks per bucket.
+
+    Returns:
+        ``{dimension: {bucket label: ranking}}`` with labels in sorted order.
+        Each ranking equals ``rank_tracks`` on just that bucket's plays.
+    """
+    dimensions = tuple(dict.fromkeys(dimensions))
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s): {', '.join(unknown)} (expected any of {', '.join(DIMENSIONS)})")
+    table = plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
+
+    cells = {dim: _Cells() for dim in dimensions}
+    year = cells.get("year")
+    month = cells.get("month")
+    weekday = cells.get("weekday")
+    hour = cells.get("hour")
+    by_artist = cells.get("artist")
+    by_album = cells.get("album")
+    timed = not _TIME_DIMENSIONS.isdisjoint(dimensions)
+    days: dict[int, tuple[str, str, int]] = {}
+
+    for ts, fmt, key, ms, uri, album, artist in zip(
+        table.ts, table.ts_fmt, table.key, table.ms, table.uri, table.album, table.artist
+    ):
+        if timed and (fmt == TS_ISO or fmt == TS_MINUTE):
+            day_number, seconds = divmod(ts, 86400)
+            day = days.get(day_number)
+            if day is None:
+                date = _EPOCH + dt.timedelta(days=day_number)
+                day = days[day_number] = (f"{date.year:04d}", f"{date.year:04d}-{date.month:02d}", date.weekday())
+            if year is not None:
+                year.add(day[0], key, ms, uri, album)
+            if month is not None:
+                month.add(day[1], key, ms, uri, album)
+            if weekday is not None:
+                weekday.add(day[2], key, ms, uri, album)
+            if hour is not None:
+                hour.add(seconds // 3600, key, ms, uri, album)
+        if by_artist is not None:
+            by_artist.add(artist, key, ms, uri, album)
+        if by_album is not None and album:
+            by_album.add(album, key, ms, uri, album)
+
+    names = {"artist": table.artists.values, "album": table.albums.values}
+    cube: dict[str, dict[Hashable, list[RankedTrack]]] = {}
+    for dim, dim_cells in cells.items():
+        labels = names.get(dim)
+        ranked = {
+            labels[bucket] if labels is not None else bucket: [
+                _ranked_track(table, dim_cells, slot, i) for i, slot in enumerate(slots, start=1)
+            ]
+            for bucket, slots in dim_cells.top(top_n).items()
+        }
+        cube[dim] = dict(sorted(ranked.items()))
+    return cube
+
+
+def _ranked_track(table: PlayTable, cells: _Cells, slot: int, rank: int) -> RankedTrack:
+    key = cells.keys[slot]
+    count, total, uri, album = cells.acc[slot << 2 : (slot << 2) + 4]
+    return RankedTrack(
+        rank=rank,
+        track_name=table.tracks.values[table.keys.track[key]],
+        artist_name=table.artists.values[table.keys.artist[key]],
+        play_count=count,
+        total_ms=total,
+        spotify_uri=table.uris.values[uri],
+        album_name=table.albums.values[album],
+    )
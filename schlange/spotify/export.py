@@ -0,0 +1,257 @@
+"""Streaming exporters for rankings and play tables.
+
+Text formats -- CSV and JSON Lines -- are written from row generators in
+chunks of :data:`CHUNK_ROWS` through a 1 MiB file buffer, so a full
+catalogue (hundreds of thousands of tracks, or every play) never exists as
+one list of rows or one big string.
+
+Columnar formats -- Parquet and Arrow IPC -- need ``pyarrow`` (``pip install
+schlange[arrow]``).  A :class:`PlayTable` converts without touching its
+rows: numeric columns are handed to Arrow as the existing ``array`` buffers,
+and the dictionary-encoded string columns become Arrow dictionary arrays
+over the same ids, so only the distinct strings are converted.
+
+The format follows the file suffix unless given:
+
+    export_rankings(ranked, "out/tom2000.parquet")
+    export_plays(table, "out/plays.jsonl")
+"""
+
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+import os
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Sequence
+
+from schlange.spotify import optional
+from schlange.spotify.table import CATEGORY_FIELDS, TS_ISO, TS_MINUTE, PlayTable
+
+if TYPE_CHECKING:
+    from schlange.spotify.parser import RankedTrack, Scorer
+
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+
+# File suffix of each format (for paths that name none)
+SUFFIXES = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrow"}
+
+# Rows per write() of the text formats and per record batch of the columnar ones
+CHUNK_ROWS = 8192
+
+_BUFFER = 1 << 20
+
+RANKING_COLUMNS = (
+    "rank",
+    "track_name",
+    "artist_name",
+    "album_name",
+    "play_count",
+    "total_ms",
+    "total_hours",
+    "spotify_uri",
+)
+PLAY_COLUMNS = ("played_at", "track_name", "artist_name", "album_name", "ms_played", "spotify_uri", "skipped")
+
+
+def export_format(path: str, fmt: str | None = None) -> str:
+    """Return *fmt*, or the format named by *path*'s suffix."""
+    if fmt is None:
+        suffix = os.path.splitext(path)[1].lower()
+        fmt = {".feather": "arrow", ".ipc": "arrow"}.get(suffix, suffix.lstrip("."))
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
+
+def _chunks(rows: Iterable[Any], size: int = CHUNK_ROWS) -> Iterator[list[Any]]:
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+
+def _open(path: str) -> Any:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(path, "w", newline="", encoding="utf-8", buffering=_BUFFER)
+
+
+def write_csv(path: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    """Write *rows* under *header* as CSV, one ``writerows`` call per chunk."""
+    with _open(path) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        for chunk in _chunks(rows):
+            writer.writerows(chunk)
+
+
+def write_jsonl(path: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    """Write *rows* as JSON Lines, one object per row keyed by *header*."""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    with _open(path) as fh:
+        for chunk in _chunks(rows):
+            fh.write("".join(encode(dict(zip(header, row))) + "\n" for row in chunk))
+
+
+def write_json_array(path: str, items: Iterable[Any], indent: int = 2) -> None:
+    """Write *items* as a JSON array, as ``json.dump(list(items), indent=indent)`` would."""
+    encode = json.JSONEncoder(ensure_ascii=False, indent=indent).encode
+    pad = " " * indent
+    with _open(path) as fh:
+        separator = "[\n"
+        for chunk in _chunks(items):
+            fh.write(separator + ",\n".join(pad + encode(item).replace("\n", "\n" + pad) for item in chunk))
+            separator = ",\n"
+        fh.write("[]" if separator == "[\n" else "\n]")
+
+
+# -- rankings ----------------------------------------------------------------
+
+
+def _ranking_header(ranked: Sequence[RankedTrack], score: Scorer | None) -> tuple[list[str], list[str]]:
+    """Return the ranking columns and the constant ``score_weights`` value (if any)."""
+    header = list(RANKING_COLUMNS)
+    if any(t.score is not None for t in ranked):
+        header.append("score")
+    weights = [] if score is None else [score.describe() if hasattr(score, "describe") else repr(score)]
+    if weights:
+        header.append("score_weights")
+    return header, weights
+
+
+def _ranking_rows(ranked: Iterable[RankedTrack], scored: bool, weights: list[str]) -> Iterator[list[Any]]:
+    for t in ranked:
+        hours = round(t.total_ms / 3_600_000, 2)
+        row = [t.rank, t.track_name, t.artist_name, t.album_name, t.play_count, t.total_ms, hours, t.spotify_uri]
+        if scored:
+            row.append("" if t.score is None else round(t.score, 6))
+        yield row + weights
+
+
+def export_rankings(
+    ranked: Sequence[RankedTrack], path: str, fmt: str | None = None, score: Scorer | None = None
+) -> None:
+    """Write a ranking in any of :data:`FORMATS`.
+
+    Scored rankings get a ``score`` column, and a ``score_weights`` column
+    recording the model's weights when *score* is the model that ranked them.
+    """
+    fmt = export_format(path, fmt)
+    header, weights = _ranking_header(ranked, score)
+    if fmt in ("parquet", "arrow"):
+        write_arrow(rankings_to_arrow(ranked, header, weights), path, fmt)
+        return
+    rows = _ranking_rows(ranked, "score" in header, weights)
+    (write_csv if fmt == "csv" else write_jsonl)(path, header, rows)
+
+
+def rankings_to_arrow(
+    ranked: Sequence[RankedTrack], header: Sequence[str] = RANKING_COLUMNS, weights: Sequence[str] = ()
+) -> Any:
+    """Return a ranking as a ``pyarrow.Table`` with the CSV columns."""
+    pa = _require_pyarrow()
+    columns = {
+        "rank": pa.array([t.rank for t in ranked], pa.int32()),
+        "track_name": pa.array([t.track_name for t in ranked], pa.string()),
+        "artist_name": pa.array([t.artist_name for t in ranked], pa.string()),
+        "album_name": pa.array([t.album_name for t in ranked], pa.string()),
+        "play_count": pa.array([t.play_count for t in ranked], pa.int64()),
+        "total_ms": pa.array([t.total_ms for t in ranked], pa.int64()),
+        "total_hours": pa.array([round(t.total_ms / 3_600_000, 2) for t in ranked], pa.float64()),
+        "spotify_uri": pa.array([t.spotify_uri for t in ranked], pa.string()),
+    }
+    if "score" in header:
+        columns["score"] = pa.array([t.score for t in ranked], pa.float64())
+    if weights:
+        # One distinct value: a dictionary column stores it once
+        columns["score_weights"] = pa.DictionaryArray.from_arrays(
+            pa.array([0] * len(ranked), pa.int8()), pa.array(list(weights), pa.string())
+        )
+    return pa.table(columns)
+
+
+# -- play tables -------------------------------------------------------------
+
+
+def _play_header(table: PlayTable) -> list[str]:
+    return list(PLAY_COLUMNS) + (list(CATEGORY_FIELDS) if table.categories is not None else [])
+
+
+def _play_rows(table: PlayTable) -> Iterator[Sequence[Any]]:
+    tracks, artists, albums, uris = table.tracks.values, table.artists.values, table.albums.values, table.uris.values
+    columns = [
+        map(table.played_at, range(len(table))),
+        map(tracks.__getitem__, table.track),
+        map(artists.__getitem__, table.artist),
+        map(albums.__getitem__, table.album),
+        table.ms,
+        map(uris.__getitem__, table.uri),
+        map(bool, table.skipped),
+    ]
+    for column in (table.categories or {}).values():
+        columns.append(map(column.labels.values.__getitem__, column.codes))
+    return zip(*columns)
+
+
+def export_plays(plays: Sequence[Any], path: str, fmt: str | None = None) -> None:
+    """Write every play of a table (or any sequence of play records) in any of :data:`FORMATS`."""
+    table = plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
+    fmt = export_format(path, fmt)
+    if fmt in ("parquet", "arrow"):
+        write_arrow(plays_to_arrow(table), path, fmt)
+    else:
+        (write_csv if fmt == "csv" else write_jsonl)(path, _play_header(table), _play_rows(table))
+
+
+def plays_to_arrow(table: PlayTable) -> Any:
+    """Return the table as a ``pyarrow.Table`` without materialising any row.
+
+    ``played_at`` is a UTC timestamp, null where the export's text could not
+    be parsed; string columns are dictionary-encoded like the table itself.
+    """
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    n = len(table)
+
+    def column(values: Any, arrow_type: Any) -> Any:
+        # Shares the array's memory; Arrow and array both use native byte order
+        return pa.Array.from_buffers(arrow_type, n, [None, pa.py_buffer(values)])
+
+    def strings(ids: Any, values: list[str], index_type: Any = pa.int32()) -> Any:
+        return pa.DictionaryArray.from_arrays(column(ids, index_type), pa.array(values, pa.string()))
+
+    stamps = column(table.ts, pa.int64()).cast(pa.timestamp("s", tz="UTC"))
+    parsed = pc.is_in(column(table.ts_fmt, pa.int8()), value_set=pa.array([TS_ISO, TS_MINUTE], pa.int8()))
+    columns = {
+        "played_at": pc.if_else(parsed, stamps, pa.scalar(None, stamps.type)),
+        "track_name": strings(table.track, table.tracks.values),
+        "artist_name": strings(table.artist, table.artists.values),
+        "album_name": strings(table.album, table.albums.values),
+        "ms_played": column(table.ms, pa.int64()),
+        "spotify_uri": strings(table.uri, table.uris.values),
+        "skipped": pc.not_equal(column(table.skipped, pa.int8()), 0),
+    }
+    for name, category in (table.categories or {}).items():
+        index_type = pa.uint16() if category.codes.typecode == "H" else pa.uint32()
+        columns[name] = strings(category.codes, category.labels.values, index_type)
+    return pa.table(columns)
+
+
+def write_arrow(arrow_table: Any, path: str, fmt: str = "parquet") -> None:
+    """Write a ``pyarrow.Table`` as Parquet or as an Arrow IPC file."""
+    pa = _require_pyarrow()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(arrow_table, path)
+        return
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table, max_chunksize=CHUNK_ROWS)
+
+
+def _require_pyarrow() -> Any:
+    pa = optional.pyarrow()
+    if pa is None:
+        raise ImportError("Parquet and Arrow output need pyarrow: pip install schlange[arrow]")
+    return pa
@@ -0,0 +1,140 @@
+"""Play predicates pushed down into the export parser.
+
+A :class:`PlayFilter` is checked against each raw JSON record *before* a play
+is added to the :class:`~schlange.spotify.table.PlayTable`, so a selective
+query over a long history only pays for the plays it keeps.
+
+Usage:
+    load_export(path, where=PlayFilter(since="2023-01-01", exclude_artists={"White Noise"}))
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterable
+
+from schlange.spotify.table import _TimestampCodec, epoch_seconds
+
+# Extended-history plays shorter than this are skips (30 seconds)
+DEFAULT_MIN_MS = 30000
+
+# (raw record, played_at, artist) -> keep?
+Matcher = Callable[[dict[str, Any], str, str], bool]
+
+
+@dataclass(frozen=True)
+class PlayFilter:
+    """Which plays to keep.  ``None`` disables a predicate.
+
+    Attributes:
+        min_ms: Minimum ms_played (extended history only; basic exports are
+              already pre-filtered by Spotify).
+        since: Keep plays at or after this time: an ISO date/time prefix
+              such as ``"2023-01-01"`` or ``"2023-06-01T12:00"`` (anything
+              :func:`~schlange.spotify.table.epoch_seconds` accepts).  Plays
+              whose time can't be read are dropped while a bound is set.
+        until: Keep plays strictly before this time.
+        platforms: Keep plays whose ``platform`` contains one of these
+              (case-insensitive), e.g. ``{"android", "windows"}``.
+        skipped: ``False`` drops skipped plays, ``True`` keeps only those
+              (see :func:`is_skipped`).
+        shuffle: ``True``/``False`` keeps only plays with shuffle on/off.
+        artists: Keep only these artists.
+        exclude_artists: Drop these artists.
+    """
+
+    min_ms: int = DEFAULT_MIN_MS
+    since: str | None = None
+    until: str | None = None
+    platforms: frozenset[str] | None = None
+    skipped: bool | None = None
+    shuffle: bool | None = None
+    artists: frozenset[str] | None = None
+    exclude_artists: frozenset[str] = frozenset()
+
+    def __post_init__(self) -> None:
+        # Accept any iterable for the set-valued predicates
+        for name in ("platforms", "artists", "exclude_artists"):
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, frozenset):
+                object.__setattr__(self, name, frozenset(_as_iterable(value)))
+        if self.platforms is not None:
+            object.__setattr__(self, "platforms", frozenset(p.lower() for p in self.platforms))
+
+    def fingerprint(self) -> str:
+        """Stable text form, used to key caches and stores by filter."""
+        data = {k: sorted(v) if isinstance(v, frozenset) else v for k, v in asdict(self).items()}
+        return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+    def matcher(self) -> Matcher | None:
+        """Compile the predicates other than ``min_ms`` into one check.
+
+        Returns ``None`` when none are active, so the parser's hot loop pays
+        nothing for an unfiltered load.
+        """
+        checks: list[Matcher] = []
+        if self.since is not None or self.until is not None:
+            # Compare epoch seconds: basic ("2023-01-01 12:00") and extended
+            # ("2023-01-01T12:00:00Z") timestamps don't order as text
+            since = epoch_seconds(self.since) if self.since is not None else None
+            until = epoch_seconds(self.until) if self.until is not None else None
+            played_ts = _played_ts(_TimestampCodec())
+
+            def in_range(rec: dict[str, Any], played_at: str, artist: str) -> bool:
+                ts = played_ts(played_at)
+                return ts is not None and (since is None or ts >= since) and (until is None or ts < until)
+
+            checks.append(in_range)
+        if self.artists is not None:
+            allowed = self.artists
+            checks.append(lambda rec, played_at, artist: artist in allowed)
+        if self.exclude_artists:
+            denied = self.exclude_artists
+            checks.append(lambda rec, played_at, artist: artist not in denied)
+        if self.platforms is not None:
+            platforms = tuple(self.platforms)
+            checks.append(
+                lambda rec, played_at, artist: any(p in (rec.get("platform") or "").lower() for p in platforms)
+            )
+        if self.skipped is not None:
+            want_skipped = self.skipped
+            checks.append(lambda rec, played_at, artist: is_skipped(rec) is want_skipped)
+        if self.shuffle is not None:
+            want_shuffle = self.shuffle
+            checks.append(lambda rec, played_at, artist: bool(rec.get("shuffle")) is want_shuffle)
+
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        return lambda rec, played_at, artist: all(check(rec, played_at, artist) for check in checks)
+
+
+def is_skipped(rec: dict[str, Any]) -> bool:
+    """Whether a raw extended-history record counts as skipped.
+
+    Spotify's ``skipped`` flag is often missing, so a forward-button end
+    counts too.  This is also the table's ``skipped`` column.
+    """
+    return bool(rec.get("skipped")) or rec.get("reason_end") == "fwdbtn"
+
+
+def _played_ts(codec: _TimestampCodec) -> Callable[[str], int | None]:
+    """Return a ``played_at -> epoch seconds`` reader (``None``: unreadable)."""
+
+    def played_ts(played_at: str) -> int | None:
+        encoded = codec.encode(played_at)
+        if encoded is not None:
+            return encoded[0]
+        try:
+            return epoch_seconds(played_at) if played_at else None
+        except ValueError:
+            return None
+
+    return played_ts
+
+
+def _as_iterable(value: str | Iterable[str]) -> Iterable[str]:
+    # A lone string means one value, not its characters
+    return (value,) if isinstance(value, str) else value
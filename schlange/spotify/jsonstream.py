@@ -0,0 +1,116 @@
+"""Incremental JSON array reader for Spotify export files.
+
+Spotify exports are single top-level JSON arrays of flat objects.  ``json.load``
+materialises every record before anything can be filtered; this reader yields
+one record at a time from a bounded text buffer instead, so a consumer that
+keeps only a fraction of the records never holds the rest.
+
+Streaming costs about 50% more decode time than one ``json.load``, so
+:func:`iter_json_records` only streams files above :data:`STREAM_THRESHOLD`.
+Spotify's own export files stay well below it (roughly 10-15 MB each); the
+threshold only bites on merged or hand-built histories, where holding every
+raw record would dominate memory.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import IO, Any, Iterator
+
+CHUNK_SIZE = 1 << 16
+# Files up to this many bytes are decoded with one json.load
+STREAM_THRESHOLD = 32 << 20
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+def iter_json_records(fh: IO[str], size: int | None = None) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array, like :func:`iter_json_array`.
+
+    A file of known *size* up to :data:`STREAM_THRESHOLD` bytes is decoded
+    at once with ``json.load`` (faster; transient memory is bounded by the
+    threshold), anything larger or of unknown size is streamed.
+    """
+    if size is None or size > STREAM_THRESHOLD:
+        return iter_json_array(fh)
+    data = json.load(fh)
+    return iter(data) if isinstance(data, list) else iter(())
+
+
+def iter_json_array(fh: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array read from *fh*.
+
+    Only the current element and one read chunk are buffered.  A document
+    whose top level is not an array yields nothing, mirroring the loader's
+    "skip unknown formats" rule.
+
+    Raises:
+        json.JSONDecodeError: If the array is malformed or truncated.
+    """
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        """Read another chunk, dropping the consumed prefix. False at EOF."""
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_ws() -> bool:
+        """Advance past whitespace. False if the input ran out."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return True
+            if not fill():
+                return False
+
+    if not skip_ws() or buf[pos] != "[":
+        return
+    pos += 1
+
+    expect_value = True  # right after "[" or ","
+    first = True
+    while True:
+        if not skip_ws():
+            raise json.JSONDecodeError("Unterminated array", buf, pos)
+        ch = buf[pos]
+        if ch == "]" and (first or not expect_value):
+            return
+        if not expect_value:
+            if ch != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            pos += 1
+            expect_value = True
+            continue
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue  # element straddles the chunk boundary
+                raise
+            # Only trust the element once its delimiter is in view: a bare
+            # number such as "2" may really be "2.5" split across chunks.
+            after = end
+            while after < len(buf) and buf[after] in _WHITESPACE:
+                after += 1
+            if (after == len(buf) or buf[after] not in ",]") and fill():
+                continue
+            break
+        pos = end
+        first = False
+        expect_value = False
+        yield value
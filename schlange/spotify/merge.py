@@ -0,0 +1,212 @@
+"""Map-reduce merge of many listeners' exports into one shared ranking.
+
+Office-wide Tom-N playlists pool several colleagues' exports.  Loading them
+all into one :class:`PlayTable` would cost memory per play; instead each
+export is *mapped* (in a worker process) to a :class:`TrackTotals` partial
+aggregate -- one row per distinct track, streamed from
+:func:`~schlange.spotify.parser.iter_export` -- and the parent *reduces* the
+partials pairwise as they arrive, like a binary counter, so at most
+``log2(users)`` partials are held at once.
+
+Tracks are keyed by a canonical id built from the normalised artist and
+title (see :mod:`schlange.spotify.normalize`), so one listener's
+``"Song - Remastered"`` and another's ``"Song"`` count as one track.
+
+A heavy listener is kept from dominating by:
+
+- ``weight``: a per-user multiplier on their plays;
+- ``cap``: at most this many plays per track count, per user;
+- ``equalize``: every user's plays are scaled to sum to their weight, so
+  each colleague has the same say however much they listen.
+
+Usage:
+    totals = merge_exports(["exports/anna.zip", UserExport("exports/ben", weight=0.5)], workers=4, cap=50)
+    playlist = totals.rank(top_n=100)
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+
+from schlange.spotify.filters import PlayFilter
+from schlange.spotify.normalize import normalize_artist, normalize_title
+from schlange.spotify.parser import RankedTrack, iter_export
+
+
+class UserExport(NamedTuple):
+    """One listener's export and how much their plays count."""
+
+    path: str
+    weight: float = 1.0
+    # Plays counted per track; None: the merge-wide cap
+    cap: int | None = None
+
+
+def canonical_id(track_name: str, artist_name: str) -> str:
+    """Return the id under which plays of a track are merged across exports."""
+    # Names that normalise to nothing (all punctuation) stay as they are
+    artist = normalize_artist(artist_name) or artist_name
+    title = normalize_title(track_name) or track_name
+    return f"{artist}\x1f{title}"
+
+
+class TrackTotals:
+    """Per-track aggregate of one or more exports, in first-seen order.
+
+    Attributes:
+        score: Weighted, capped play count -- the ranking criterion.
+        plays: Plays counted after the cap, unweighted.
+        total_ms: Sum of ``ms_played`` over every play (uncapped).
+        listeners: Number of exports with at least one play of the track.
+        names: ``(track, artist, uri, album)`` as first seen.
+    """
+
+    __slots__ = ("ids", "score", "plays", "total_ms", "listeners", "names")
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.score = array("d")
+        self.plays = array("q")
+        self.total_ms = array("q")
+        self.listeners = array("i")
+        self.names: list[tuple[str, str, str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _row(self, track_id: str, names: tuple[str, str, str, str]) -> int:
+        row = self.ids.get(track_id)
+        if row is None:
+            row = self.ids[track_id] = len(self.names)
+            self.names.append(names)
+            self.score.append(0.0)
+            self.plays.append(0)
+            self.total_ms.append(0)
+            self.listeners.append(0)
+        return row
+
+    def update(self, other: TrackTotals) -> None:
+        """Merge *other* into these totals (its new tracks go last)."""
+        for track_id, other_row in other.ids.items():
+            row = self._row(track_id, other.names[other_row])
+            self.score[row] += other.score[other_row]
+            self.plays[row] += other.plays[other_row]
+            self.total_ms[row] += other.total_ms[other_row]
+            self.listeners[row] += other.listeners[other_row]
+
+    def rank(self, top_n: int = 2000) -> list[RankedTrack]:
+        """Return the top *top_n* tracks by score, then total time, then first seen."""
+        score, total_ms = self.score, self.total_ms
+        rows = heapq.nlargest(top_n, range(len(self)), key=lambda r: (score[r], total_ms[r], -r))
+        ranked = []
+        for rank, row in enumerate(rows, start=1):
+            track, artist, uri, album = self.names[row]
+            ranked.append(
+                RankedTrack(
+                    rank=rank,
+                    track_name=track,
+                    artist_name=artist,
+                    play_count=self.plays[row],
+                    total_ms=total_ms[row],
+                    spotify_uri=uri,
+                    album_name=album,
+                    score=score[row],
+                )
+            )
+        return ranked
+
+
+def reduce_export(
+    user: UserExport, where: PlayFilter | None = None, cap: int | None = None, equalize: bool = False
+) -> TrackTotals:
+    """Map one export to its :class:`TrackTotals` (the pool worker).
+
+    Plays are streamed, so memory follows the export's distinct tracks.
+    Names come from a track's first play; its URI and album from the first
+    play that has a URI, variants included.
+    """
+    totals = TrackTotals()
+    has_uri: set[int] = set()  # rows whose URI was seen
+    for play in iter_export(user.path, where):
+        row = totals._row(
+            canonical_id(play.track_name, play.artist_name),
+            (play.track_name, play.artist_name, play.spotify_uri, play.album_name),
+        )
+        totals.plays[row] += 1
+        totals.total_ms[row] += play.ms_played
+        if play.spotify_uri and row not in has_uri:
+            has_uri.add(row)
+            totals.names[row] = totals.names[row][:2] + (play.spotify_uri, play.album_name)
+
+    cap = user.cap if user.cap is not None else cap
+    if cap is not None:
+        totals.plays = array("q", (min(plays, cap) for plays in totals.plays))
+    counted = sum(totals.plays)
+    scale = user.weight / counted if equalize and counted else user.weight
+    totals.score = array("d", (plays * scale for plays in totals.plays))
+    totals.listeners = array("i", [1]) * len(totals)
+    return totals
+
+
+def _reduce_worker(args: tuple[UserExport, PlayFilter | None, int | None, bool]) -> TrackTotals:
+    return reduce_export(*args)
+
+
+def tree_merge(partials: Iterable[TrackTotals]) -> TrackTotals:
+    """Merge partials pairwise as they arrive, keeping their order.
+
+    Equal-sized neighbours are merged first (a binary counter), so merge
+    work stays balanced and at most ``log2(n) + 1`` partials are held.
+    """
+    stack: list[tuple[int, TrackTotals]] = []
+    for part in partials:
+        level = 0
+        while stack and stack[-1][0] == level:
+            _, left = stack.pop()
+            left.update(part)
+            part = left
+            level += 1
+        stack.append((level, part))
+    if not stack:
+        return TrackTotals()
+    merged = stack[0][1]
+    for _, part in stack[1:]:
+        merged.update(part)
+    return merged
+
+
+def merge_exports(
+    paths: Iterable[str | UserExport],
+    workers: int | None = 1,
+    where: PlayFilter | None = None,
+    cap: int | None = None,
+    equalize: bool = False,
+) -> TrackTotals:
+    """Reduce every export to per-track totals and merge them.
+
+    Args:
+        paths: Export paths (anything :func:`load_export` accepts), or
+              :class:`UserExport` entries carrying a weight and cap.
+        workers: Worker processes reducing exports (``None``: CPU count).
+              Partials are merged in *paths* order, so the result is the
+              same for any worker count.
+        where: A :class:`PlayFilter` applied to every export.
+        cap: Plays counted per track and user, unless a :class:`UserExport`
+              sets its own.
+        equalize: Scale each user's plays to sum to their weight.
+
+    Returns:
+        The merged :class:`TrackTotals`; call :meth:`TrackTotals.rank`.
+    """
+    users = [p if isinstance(p, UserExport) else UserExport(str(p)) for p in paths]
+    jobs = [(user, where, cap, equalize) for user in users]
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+    if workers == 1:
+        return tree_merge(_reduce_worker(job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials: Iterator[TrackTotals] = pool.map(_reduce_worker, jobs)
+        return tree_merge(partials)
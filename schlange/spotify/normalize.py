@@ -0,0 +1,182 @@
+"""Track identity normalisation: merge variant titles of the same song.
+
+Spotify lists one song under several titles -- ``"Song - Remastered 2011"``,
+``"Song (feat. X)"``, ``"Song - Radio Edit"`` -- which splits its plays over
+several ``(track, artist)`` keys.  :func:`merge_variants` folds them back
+together in three steps:
+
+1. every title and artist is canonicalised once by a memoised normaliser;
+2. keys are grouped when they share a Spotify URI or a canonical name;
+3. the remaining near-duplicates are found with pairwise similarity, but
+   only inside *blocks* of keys sharing the artist and a title prefix, so a
+   200k-track catalogue costs a few small comparisons instead of ``n**2``.
+
+Live versions, remixes and acoustic takes are kept apart: they are
+different recordings, not variant spellings.
+"""
+
+from __future__ import annotations
+
+import difflib
+import functools
+import re
+import unicodedata
+from array import array
+from typing import Sequence
+
+from schlange.spotify.parser import PlayRecord, accumulate_keys
+from schlange.spotify.table import PairPool, PlayTable, StringPool
+
+# Titles are compared fuzzily only within blocks sharing the artist, this
+# many leading characters and every number ("Part 1" never matches "Part 2")
+BLOCK_PREFIX = 4
+
+# Minimum difflib ratio for two canonical titles to count as one song
+DEFAULT_THRESHOLD = 0.9
+
+_VARIANT_WORDS = r"remaster(?:ed)?|radio edit|radio version|single version|album version|original version|mono|stereo"
+_FEATURING = r"feat\.?|ft\.?|featuring|with"
+
+_TITLE_NOISE = [
+    # "(feat. X)", "[with Y]"
+    re.compile(rf"[(\[]\s*(?:{_FEATURING})\s[^)\]]*[)\]]", re.IGNORECASE),
+    # "(Remastered 2011)", "[Mono]"
+    re.compile(rf"[(\[][^)\]]*\b(?:{_VARIANT_WORDS})\b[^)\]]*[)\]]", re.IGNORECASE),
+    # " - Remastered 2011", " - Radio Edit", " - feat. X"
+    re.compile(rf"\s-\s[^-]*\b(?:{_VARIANT_WORDS}|feat\.?|ft\.?|featuring)(?:\s|$).*$", re.IGNORECASE),
+    # trailing " feat. X"
+    re.compile(r"\s(?:feat\.?|ft\.?|featuring)\s.*$", re.IGNORECASE),
+]
+_NON_WORD = re.compile(r"[\W_]+")
+_NUMBER = re.compile(r"\d+")
+
+
+def _fold(text: str) -> str:
+    """Casefold, drop accents and reduce punctuation to single spaces."""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+@functools.lru_cache(maxsize=None)
+def normalize_title(title: str) -> str:
+    """Canonical form of a track title, without featuring and remaster tags."""
+    for pattern in _TITLE_NOISE:
+        title = pattern.sub("", title)
+    return _fold(title)
+
+
+@functools.lru_cache(maxsize=None)
+def normalize_artist(artist: str) -> str:
+    """Canonical form of an artist name (``"The Beatles"`` -> ``"beatles"``)."""
+    folded = _fold(artist)
+    return folded[4:] if folded.startswith("the ") else folded
+
+
+class _DisjointSet:
+    """Union-find over key ids; the root is the smallest id of a group."""
+
+    __slots__ = ("parent",)
+
+    def __init__(self, size: int) -> None:
+        self.parent = array("i", range(size))
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def variant_groups(table: PlayTable, threshold: float = DEFAULT_THRESHOLD) -> list[int]:
+    """Map every key id of *table* to the key id of its canonical variant.
+
+    The canonical variant of a group is its most played key (ties: the one
+    played first), so merged rankings show the title people actually hear.
+    """
+    keys = table.keys
+    groups = _DisjointSet(len(keys))
+
+    # Same Spotify URI: the same recording, whatever the title says
+    first_key_of_uri: dict[int, int] = {}
+    for key, uri in zip(table.key, table.uri):
+        if uri:
+            first = first_key_of_uri.setdefault(uri, key)
+            if first != key:
+                groups.union(first, key)
+
+    # Same canonical name
+    by_name: dict[tuple[str, str], int] = {}
+    for key, (track_id, artist_id) in enumerate(zip(keys.track, keys.artist)):
+        name = (normalize_artist(table.artists.values[artist_id]), normalize_title(table.tracks.values[track_id]))
+        first = by_name.setdefault(name, key)
+        if first != key:
+            groups.union(first, key)
+
+    # Near-duplicates: compare distinct canonical titles within a block only
+    blocks: dict[tuple[str, str, tuple[str, ...]], list[tuple[str, int]]] = {}
+    for (artist, title), key in by_name.items():
+        block = (artist, title[:BLOCK_PREFIX], tuple(_NUMBER.findall(title)))
+        blocks.setdefault(block, []).append((title, key))
+    for members in blocks.values():
+        for i, (title, key) in enumerate(members):
+            matcher = difflib.SequenceMatcher(None, title)
+            for other_title, other_key in members[i + 1 :]:
+                matcher.set_seq2(other_title)
+                if matcher.real_quick_ratio() >= threshold and matcher.ratio() >= threshold:
+                    groups.union(key, other_key)
+
+    acc = accumulate_keys(table)
+    canonical: dict[int, int] = {}
+    for key in range(len(keys)):
+        root = groups.find(key)
+        best = canonical.get(root)
+        # Keys are visited in first-appearance order, so ">" keeps the earlier one on ties
+        if best is None or (acc[key << 2], acc[(key << 2) + 1]) > (acc[best << 2], acc[(best << 2) + 1]):
+            canonical[root] = key
+    return [canonical[groups.find(key)] for key in range(len(keys))]
+
+
+def merge_variants(plays: Sequence[PlayRecord], threshold: float = DEFAULT_THRESHOLD) -> PlayTable:
+    """Return a copy of *plays* with variant titles renamed to their canonical variant.
+
+    Args:
+        plays: A :class:`PlayTable` (or any sequence of play records).
+        threshold: Minimum title similarity (0..1) for fuzzy matches within a
+              block; exact canonical-name and URI matches always merge.
+
+    Returns:
+        A new :class:`PlayTable` for ``rank_tracks`` and friends, with key ids
+        again in first-appearance order.
+    """
+    table = plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
+    canonical = variant_groups(table, threshold)
+
+    merged = table.copy()
+    # Fresh key and name pools, so only names still in use are counted
+    merged.keys, merged.tracks, merged.artists = PairPool(), StringPool(), StringPool()
+    tracks, artists = table.tracks.values, table.artists.values
+    old_track, old_artist = table.keys.track, table.keys.artist
+    new_key = {}
+    for key in dict.fromkeys(table.key):
+        target = canonical[key]
+        track_id = merged.tracks.intern(tracks[old_track[target]])
+        new_key[key] = merged.keys.intern(track_id, merged.artists.intern(artists[old_artist[target]]))
+    merged.key = array("i", map(new_key.__getitem__, table.key))
+    merged.track = array("i", map(merged.keys.track.__getitem__, merged.key))
+    merged.artist = array("i", map(merged.keys.artist.__getitem__, merged.key))
+    # Fewer keys now: exact distinct counts are retaken, sketches rebuilt on demand
+    if merged.stats is not None and merged.stats.distinct == "exact":
+        merged.stats.count_distinct(merged)
+    else:
+        merged.stats = None
+    return merged
@@ -0,0 +1,32 @@
+"""Optional dependencies, imported on first use.
+
+NumPy (``pip install schlange[fast]``) and pyarrow (``pip install
+schlange[arrow]``) each add tens to hundreds of milliseconds to start-up.
+Only the NumPy engines and the columnar exporters need them, so modules ask
+here when they are about to use one instead of importing at module level.
+"""
+
+from __future__ import annotations
+
+import functools
+from types import ModuleType
+
+
+@functools.cache
+def numpy() -> ModuleType | None:
+    """Return the ``numpy`` module, or ``None`` when it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@functools.cache
+def pyarrow() -> ModuleType | None:
+    """Return the ``pyarrow`` module, or ``None`` when it is not installed."""
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
@@ -5,30 +5,31 @@ Handles multiple Spotify export formats:
 - endsong_*.json          (extended: track, artist, ms_played, ts, album, etc.)
 - Spotify "Account data" messages format
 
-Normalizes all formats to a consistent DataFrame-like structure for ranking.
+Normalizes all formats into a columnar :class:`PlayTable` for ranking.
 """
 
 from __future__ import annotations
 
-import csv
-import json
+import dataclasses
+import functools
+import itertools
 import os
-from collections import Counter
-from dataclasses import dataclass, field
-from pathlib import Path
-from typing import Any
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Any, Callable, Iterable, Iterator, Sequence
 
+from schlange.spotify import optional
+from schlange.spotify.cache import load_cached, store_cached
+from schlange.spotify.export import export_rankings, write_json_array
+from schlange.spotify.filters import DEFAULT_MIN_MS, Matcher, PlayFilter, is_skipped
+from schlange.spotify.jsonstream import iter_json_records
+from schlange.spotify.sources import export_file_identity, export_files, open_export_file
+from schlange.spotify.stats import ListeningStats, listening_stats
+from schlange.spotify.table import CATEGORY_FIELDS, PlayRecord, PlayTable
 
-@dataclass
-class PlayRecord:
-    """A single normalized play record."""
-
-    played_at: str
-    track_name: str
-    artist_name: str
-    ms_played: int = 0
-    spotify_uri: str = ""
-    album_name: str = ""
+# PlayRecord fields in declaration order, as yielded by the row generators
+_Row = tuple[str, str, str, int, str, str, bool]
 
 
 @dataclass
@@ -42,6 +43,11 @@ class RankedTrack:
     total_ms: int
     spotify_uri: str = ""
     album_name: str = ""
+    # Approximate rankings only: the true play count lies in
+    # [play_count - count_error, play_count]
+    count_error: int = 0
+    # Composite score, when ranked with a scoring model
+    score: float | None = None
 
 
 def detect_format(data: list[dict[str, Any]]) -> str:
@@ -63,181 +69,404 @@ def detect_format(data: list[dict[str, Any]]) -> str:
     return "unknown"
 
 
-def parse_streaming_history(records: list[dict[str, Any]]) -> list[PlayRecord]:
-    """Parse basic StreamingHistory*.json format."""
-    plays = []
+def parse_streaming_history(records: Iterable[dict[str, Any]], where: PlayFilter | None = None) -> PlayTable:
+    """Parse basic StreamingHistory*.json format.
+
+    *where* predicates apply except ``min_ms`` (basic exports hold no skips).
+    """
+    plays = PlayTable()
+    plays.add_rows(_streaming_history_rows(records, where.matcher() if where else None))
+    return plays
+
+
+def _streaming_history_rows(records: Iterable[dict[str, Any]], keep: Matcher | None = None) -> Iterator[_Row]:
+    """Yield the kept plays of a basic history as ``PlayRecord`` field tuples."""
     for rec in records:
         track = rec.get("trackName") or rec.get("master_metadata_track_name") or ""
         artist = rec.get("artistName") or rec.get("master_metadata_album_artist_name") or ""
         ms = rec.get("msPlayed", 0) or rec.get("ms_played", 0)
         played_at = rec.get("endTime") or rec.get("ts") or ""
-        if track and artist:
-            plays.append(PlayRecord(played_at=played_at, track_name=track, artist_name=artist, ms_played=ms))
-    return plays
+        if track and artist and (keep is None or keep(rec, played_at, artist)):
+            yield played_at, track, artist, ms, "", "", False
 
 
 def parse_extended_history(
-    records: list[dict[str, Any]], min_ms: int = 30000
-) -> list[PlayRecord]:
+    records: Iterable[dict[str, Any]], min_ms: int = DEFAULT_MIN_MS, where: PlayFilter | None = None
+) -> PlayTable:
     """Parse extended endsong_*.json format.
 
     Args:
-        records: Raw JSON records from the export.
+        records: Raw JSON records from the export (any iterable, e.g. the
+              streaming reader, so records are never all held at once).
         min_ms: Minimum ms_played to count as a real play (default 30s).
               Filters out skips and accidental plays.
+        where: Further predicates, checked before a play is stored (its own
+              ``min_ms`` is ignored in favour of *min_ms*).
+    """
+    plays = PlayTable()
+    plays.add_rows(_extended_history_rows(records, min_ms, where.matcher() if where else None))
+    return plays
+
+
+def _extended_history_rows(
+    records: Iterable[dict[str, Any]],
+    min_ms: int = DEFAULT_MIN_MS,
+    keep: Matcher | None = None,
+    extras: bool = False,
+) -> Iterator[_Row]:
+    """Yield the kept plays of an extended history as ``PlayRecord`` field tuples.
+
+    With *extras*, each tuple gains the :data:`CATEGORY_FIELDS` labels as an
+    eighth element (``PlayTable.add``'s *categories*).
     """
-    plays = []
     for rec in records:
         track = rec.get("master_metadata_track_name") or ""
         artist = rec.get("master_metadata_album_artist_name") or ""
         ms = rec.get("ms_played", 0) or 0
         played_at = rec.get("ts") or ""
+        if not (track and artist and ms >= min_ms):
+            continue
+        if keep is not None and not keep(rec, played_at, artist):
+            continue
         uri = rec.get("spotify_track_uri") or ""
         album = rec.get("master_metadata_album_album_name") or ""
-        if track and artist and ms >= min_ms:
-            plays.append(PlayRecord(
-                played_at=played_at,
-                track_name=track,
-                artist_name=artist,
-                ms_played=ms,
-                spotify_uri=uri,
-                album_name=album,
-            ))
-    return plays
+        skipped = is_skipped(rec)
+        if extras:
+            yield played_at, track, artist, ms, uri, album, skipped, tuple(
+                _category_label(rec.get(name)) for name in CATEGORY_FIELDS
+            )
+        else:
+            yield played_at, track, artist, ms, uri, album, skipped
+
+
+def _category_label(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
 
 
-def load_export(path: str) -> list[PlayRecord]:
-    """Load a Spotify export file or directory of JSON files.
+def load_export(
+    path: str,
+    workers: int | None = 1,
+    min_ms: int | None = None,
+    cache_dir: str | None = None,
+    where: PlayFilter | None = None,
+    extras: bool = False,
+    distinct: str = "exact",
+) -> PlayTable:
+    """Load a Spotify export file, directory of JSON files or ZIP archive.
 
     Args:
-        path: Path to a single JSON file or a directory containing multiple.
+        path: Path to a single JSON file, a directory containing multiple, or
+              the export ``.zip`` itself.  Archive members are streamed
+              straight from the ZIP (in parallel with *workers*); nothing is
+              extracted to disk.
+        workers: Worker processes used to parse the files (``None``: CPU
+              count).  The default ``1`` parses inline.  Results are merged in
+              file order, so the output is identical for any worker count.
+        min_ms: Minimum ms_played for extended-history plays; overrides
+              ``where.min_ms`` (default 30s).
+        cache_dir: Binary parse cache directory (see
+              :mod:`schlange.spotify.cache`), or ``None`` to always decode JSON.
+        where: A :class:`PlayFilter` applied to raw records while parsing.
+        extras: Also keep the extended-history :data:`CATEGORY_FIELDS`
+              (``reason_end``, ``platform``, ...) in ``table.categories``, for
+              :mod:`schlange.spotify.analytics`.  Off by default: plays
+              parse exactly as fast without them.
+        distinct: How ``table.stats`` counts distinct tracks and artists:
+              ``"exact"`` or ``"hll"`` (see :mod:`schlange.spotify.stats`).
 
     Returns:
-        List of normalized PlayRecord objects.
+        A :class:`PlayTable` (a ``Sequence[PlayRecord]``).
     """
-    p = Path(path)
-    files: list[Path] = []
+    files = [str(f) for f in export_files(path)]
+    where = _effective_filter(where, min_ms)
+    parse = functools.partial(parse_file, where=where, cache_dir=cache_dir, extras=extras, distinct=distinct)
+
+    workers = min(workers or os.cpu_count() or 1, len(files)) or 1
+    if workers == 1 and cache_dir is None:
+        # Every file's rows go straight into one table: no per-file pools to merge
+        plays = PlayTable(categories=extras)
+        for f in files:
+            with open_export_file(f) as fh:
+                plays.add_rows(_record_rows(_file_records(fh, f), where, extras))
+        plays.stats = ListeningStats.from_table(plays, distinct)
+        return plays
+
+    all_plays = PlayTable()
+    if workers == 1:
+        for f in files:
+            all_plays.extend(parse(f))
+        return all_plays
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, keeping the merge deterministic
+        for table in pool.map(parse, files):
+            all_plays.extend(table)
 
-    if p.is_file():
-        files = [p]
-    elif p.is_dir():
-        files = sorted(p.glob("*.json"))
-    else:
-        raise FileNotFoundError(f"Path not found: {path}")
+    return all_plays
 
-    all_plays: list[PlayRecord] = []
 
-    for f in files:
-        with open(f, encoding="utf-8") as fh:
-            data = json.load(fh)
+def _effective_filter(where: PlayFilter | None, min_ms: int | None) -> PlayFilter:
+    where = where or PlayFilter()
+    return where if min_ms is None else dataclasses.replace(where, min_ms=min_ms)
 
-        if not isinstance(data, list):
-            continue
 
-        fmt = detect_format(data)
-        if fmt == "extended_history":
-            all_plays.extend(parse_extended_history(data))
-        elif fmt == "streaming_history":
-            all_plays.extend(parse_streaming_history(data))
-        # Skip unknown formats silently
+def iter_export(path: str, where: PlayFilter | None = None) -> Iterator[PlayRecord]:
+    """Yield the plays of an export one at a time, in :func:`load_export` order.
 
-    return all_plays
+    Only one file's raw records are held at a time, and files above
+    :data:`~schlange.spotify.jsonstream.STREAM_THRESHOLD` only one record,
+    so this feeds bounded-memory consumers such as
+    :func:`schlange.spotify.sketch.rank_tracks_streaming` over histories too
+    large to load.
+    """
+    where = where or PlayFilter()
+    for f in export_files(str(path)):
+        with open_export_file(f) as fh:
+            for row in _record_rows(_file_records(fh, f), where):
+                yield PlayRecord(*row)
+
+
+def parse_file(
+    path: str,
+    where: PlayFilter | None = None,
+    cache_dir: str | None = None,
+    extras: bool = False,
+    distinct: str = "exact",
+) -> PlayTable:
+    """Parse one export file (unknown formats yield no plays).
+
+    With *cache_dir*, a cached binary table is mapped instead of decoding the
+    JSON, and fresh parses are written back.  Also the pool worker: a
+    :class:`PlayTable` pickles as a handful of arrays and string lists, far
+    smaller than per-record dataclasses.
+    """
+    where = where or PlayFilter()
+    if cache_dir is not None:
+        cached = load_cached(cache_dir, path, where, extras)
+        if cached is not None:
+            if cached.stats is None or cached.stats.distinct != distinct:
+                cached.stats = ListeningStats.from_table(cached, distinct)
+            return cached
+    with open_export_file(path) as fh:
+        table = parse_records(_file_records(fh, path), where, extras, distinct)
+    if cache_dir is not None:
+        store_cached(cache_dir, path, where, table, extras)
+    return table
+
+
+def _file_records(fh: IO[str], path: str) -> Iterator[Any]:
+    """The records of an open export file; small files skip the streaming reader."""
+    return iter_json_records(fh, export_file_identity(path)[1])
+
+
+def parse_records(
+    records: Iterable[dict[str, Any]],
+    where: PlayFilter | None = None,
+    extras: bool = False,
+    distinct: str = "exact",
+) -> PlayTable:
+    """Detect the format from the first record and parse the whole stream.
+
+    Records are pulled one at a time and stored a batch at a time
+    (:meth:`PlayTable.add_rows`), so with a streaming source peak memory
+    follows the kept plays rather than the raw export.  Unknown formats
+    yield no plays.  With *extras* the table keeps category columns (see
+    :func:`load_export`).
+    ``table.stats`` is then taken from the finished columns.
+    """
+    plays = PlayTable(categories=extras)
+    plays.add_rows(_record_rows(records, where or PlayFilter(), extras))
+    plays.stats = ListeningStats.from_table(plays, distinct)
+    return plays
+
+
+def _record_rows(records: Iterable[dict[str, Any]], where: PlayFilter, extras: bool = False) -> Iterator[_Row]:
+    """Detect the format from the first record and yield every kept play."""
+    records = iter(records)
+    first = next(records, None)
+    if not isinstance(first, dict):
+        return iter(())
 
+    stream: Iterator[dict[str, Any]] = itertools.chain([first], records)
+    fmt = detect_format([first])
+    if fmt == "extended_history":
+        return _extended_history_rows(stream, where.min_ms, where.matcher(), extras)
+    if fmt == "streaming_history":
+        return _streaming_history_rows(stream, where.matcher())
+    # Skip unknown formats silently
+    return iter(())
 
-def rank_tracks(plays: list[PlayRecord], top_n: int = 2000) -> list[RankedTrack]:
+
+ENGINES = ("python", "numpy")
+
+# Aggregated ranking row: (key id, play count, total ms, URI id, album id)
+_RankRow = tuple[int, int, int, int, int]
+
+# (table, engine) -> one score per key id; see schlange.spotify.scoring
+Scorer = Callable[[PlayTable, str], Sequence[float]]
+
+
+def rank_tracks(
+    plays: Sequence[PlayRecord],
+    top_n: int = 2000,
+    engine: str = "python",
+    score: Scorer | None = None,
+) -> list[RankedTrack]:
     """Rank tracks by play count (tie-break by total ms_played).
 
     Args:
-        plays: List of play records.
+        plays: A :class:`PlayTable` (or any sequence of play records).
         top_n: Number of top tracks to return.
+        engine: ``"python"`` or ``"numpy"``.  The NumPy engine vectorises the
+              group-by and sort; it falls back to ``"python"`` when NumPy is
+              not installed.  Both give identical results.
+        score: A scoring model, e.g. :class:`~schlange.spotify.scoring.ScoreWeights`.
+              When given, tracks are ranked by score first (then play count
+              and total ms) and each result carries its ``score``.
 
     Returns:
         Sorted list of RankedTrack objects.
     """
-    # Count plays and total ms per (track, artist) pair
-    play_counts: Counter[tuple[str, str]] = Counter()
-    total_ms: dict[tuple[str, str], int] = {}
-    track_uris: dict[tuple[str, str], str] = {}
-    track_albums: dict[tuple[str, str], str] = {}
-
-    for p in plays:
-        key = (p.track_name, p.artist_name)
-        play_counts[key] += 1
-        total_ms[key] = total_ms.get(key, 0) + p.ms_played
-        # Keep the most recent non-empty URI and album
-        if p.spotify_uri:
-            track_uris[key] = p.spotify_uri
-        if p.album_name:
-            track_albums[key] = p.album_name
-
-    # Sort by play count desc, then total ms desc
-    sorted_tracks = sorted(
-        play_counts.keys(),
-        key=lambda k: (play_counts[k], total_ms.get(k, 0)),
-        reverse=True,
-    )
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ranking engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+    table = plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
 
-    ranked: list[RankedTrack] = []
-    for i, key in enumerate(sorted_tracks[:top_n], start=1):
-        track_name, artist_name = key
-        ranked.append(
-            RankedTrack(
-                rank=i,
-                track_name=track_name,
-                artist_name=artist_name,
-                play_count=play_counts[key],
-                total_ms=total_ms.get(key, 0),
-                spotify_uri=track_uris.get(key, ""),
-                album_name=track_albums.get(key, ""),
-            )
+    scores = score(table, engine) if score is not None else None
+    if engine == "numpy" and optional.numpy() is not None:
+        rows = _rank_rows_numpy(table, top_n, scores)
+    else:
+        rows = _rank_rows_python(table, top_n, scores)
+
+    return [
+        RankedTrack(
+            rank=i,
+            track_name=table.tracks.values[table.keys.track[key]],
+            artist_name=table.artists.values[table.keys.artist[key]],
+            play_count=count,
+            total_ms=total,
+            spotify_uri=table.uris.values[uri],
+            album_name=table.albums.values[album],
+            score=scores[key] if scores is not None else None,
         )
+        for i, (key, count, total, uri, album) in enumerate(rows, start=1)
+    ]
 
-    return ranked
 
+def accumulate_keys(table: PlayTable) -> array:
+    """Aggregate *table* per key id into one packed ``array('q')``.
 
-def export_csv(ranked: list[RankedTrack], output_path: str) -> None:
-    """Write ranked tracks to a CSV file."""
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with open(output_path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(["rank", "track_name", "artist_name", "album_name", "play_count", "total_ms", "total_hours", "spotify_uri"])
-        for t in ranked:
-            hours = round(t.total_ms / 3_600_000, 2)
-            writer.writerow([t.rank, t.track_name, t.artist_name, t.album_name, t.play_count, t.total_ms, hours, t.spotify_uri])
+    Row ``k`` (at offset ``4 * k``) holds ``[play count, total ms, last
+    non-empty URI id, last non-empty album id]`` for key id ``k``.
+    """
+    acc = array("q", bytes(8 * 4 * len(table.keys)))
+    for key, ms, uri, album in zip(table.key, table.ms, table.uri, table.album):
+        base = key << 2
+        acc[base] += 1
+        acc[base + 1] += ms
+        # Pool id 0 is "", so falsy ids never replace a real URI/album
+        if uri:
+            acc[base + 2] = uri
+        if album:
+            acc[base + 3] = album
+    return acc
+
+
+def _rank_rows_python(table: PlayTable, top_n: int, scores: Sequence[float] | None = None) -> list[_RankRow]:
+    """Aggregate and order the top *top_n* keys in pure Python."""
+    acc = accumulate_keys(table)
+
+    # Sort by (score desc,) play count desc, then total ms desc; the sort is
+    # stable, so ties keep first-appearance (key id) order
+    counts = acc[0::4]
+    totals = acc[1::4]
+    sorted_keys = sorted(
+        (k for k in range(len(counts)) if counts[k]),
+        key=(lambda k: (counts[k], totals[k])) if scores is None else (lambda k: (scores[k], counts[k], totals[k])),
+        reverse=True,
+    )
+    return [(key, *acc[key << 2 : (key << 2) + 4]) for key in sorted_keys[:top_n]]
+
+
+def _rank_rows_numpy(table: PlayTable, top_n: int, scores: Sequence[float] | None = None) -> list[_RankRow]:
+    """Vectorised equivalent of :func:`_rank_rows_python`."""
+    import numpy as np
+
+    if not len(table):
+        return []
+    n_keys = len(table.keys)
+    key = np.frombuffer(table.key, dtype=np.int32)
+    counts = np.bincount(key, minlength=n_keys)
+    # Float weights are exact while per-key sums stay below 2**53 ms (~285k years)
+    totals = np.bincount(key, weights=np.frombuffer(table.ms, dtype=np.int64), minlength=n_keys).astype(np.int64)
+
+    # lexsort's last key is primary: count desc, ms desc, then key id asc
+    # (first appearance), matching the stable pure-Python sort
+    sort_keys = [np.arange(n_keys), -totals, -counts]
+    if scores is not None:
+        sort_keys.append(-np.asarray(scores, dtype=np.float64))
+    order = np.lexsort(sort_keys)
+    order = order[counts[order] > 0][:top_n]
+
+    rows = np.arange(len(table))
+    last_ids = []
+    for column in (table.uri, table.album):
+        ids = np.frombuffer(column, dtype=np.int32)
+        mask = ids != 0
+        last_row = np.full(n_keys, -1, dtype=np.int64)
+        np.maximum.at(last_row, key[mask], rows[mask])
+        picked = last_row[order]
+        last_ids.append(np.where(picked >= 0, ids[np.maximum(picked, 0)], 0))
+
+    return list(zip(order.tolist(), counts[order].tolist(), totals[order].tolist(),
+                    last_ids[0].tolist(), last_ids[1].tolist()))
+
+
+def export_csv(ranked: list[RankedTrack], output_path: str, score: Scorer | None = None) -> None:
+    """Write ranked tracks to a CSV file.
+
+    Scored rankings get a ``score`` column, and a ``score_weights`` column
+    recording the model's weights when *score* is the model that ranked them.
+    Rows are streamed in chunks; see :mod:`schlange.spotify.export` for the
+    other formats.
+    """
+    export_rankings(ranked, output_path, "csv", score)
 
 
 def export_playlist_seed(ranked: list[RankedTrack], output_path: str) -> None:
     """Write a JSON file with track+artist pairs for playlist building."""
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    seed = [
-        {
-            "track_name": t.track_name,
-            "artist_name": t.artist_name,
-            "spotify_uri": t.spotify_uri,
-        }
-        for t in ranked
-    ]
-    with open(output_path, "w", encoding="utf-8") as fh:
-        json.dump(seed, fh, indent=2, ensure_ascii=False)
+    seed = ({"track_name": t.track_name, "artist_name": t.artist_name, "spotify_uri": t.spotify_uri} for t in ranked)
+    write_json_array(output_path, seed)
 
 
-def print_stats(plays: list[PlayRecord], ranked: list[RankedTrack]) -> None:
-    """Print summary statistics about the listening history."""
-    total_ms = sum(p.ms_played for p in plays)
-    total_hours = total_ms / 3_600_000
-    unique_tracks = len({(p.track_name, p.artist_name) for p in plays})
-    unique_artists = len({p.artist_name for p in plays})
-    date_range = sorted({p.played_at[:10] for p in plays if p.played_at})
+def print_stats(plays: Sequence[PlayRecord] | ListeningStats, ranked: list[RankedTrack]) -> None:
+    """Print summary statistics about the listening history.
+
+    *plays* may also be precomputed stats, such as ``PlayStore.stats()``.
+    """
+    if isinstance(plays, ListeningStats):
+        stats = plays
+    else:
+        table = plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
+        stats = listening_stats(table)
+    total_hours = stats.total_hours
+    date_range = stats.date_range()
+    active_days = stats.active_days
     with_uri = sum(1 for t in ranked if t.spotify_uri)
 
     print(f"\n{'=' * 50}")
     print(f"  SMUTZIGE HANSIE'S LISTENING STATS")
     print(f"{'=' * 50}")
-    print(f"  Total plays (>30s):    {len(plays):,}")
+    print(f"  Total plays (>30s):    {stats.plays:,}")
     print(f"  Total listening time:  {total_hours:,.1f} hours ({total_hours / 24:.0f} days)")
-    print(f"  Unique tracks:         {unique_tracks:,}")
-    print(f"  Unique artists:        {unique_artists:,}")
+    print(f"  Unique tracks:         {stats.unique_tracks:,}")
+    print(f"  Unique artists:        {stats.unique_artists:,}")
     if date_range:
         print(f"  Date range:            {date_range[0]} to {date_range[-1]}")
+    if active_days:
+        print(f"  Days with plays:       {active_days:,}")
     print(f"  Top {len(ranked)} with Spotify URI: {with_uri}/{len(ranked)} ({100 * with_uri / len(ranked):.1f}%)")
     print(f"{'=' * 50}")
@@ -0,0 +1,138 @@
+"""Composite track scores: play count, hours, recency, skip rate, completion.
+
+:class:`ScoreWeights` is the scoring model.  Each track's features are scaled
+to ``0..1`` and combined linearly::
+
+    score = plays * count / max_count
+          + hours * total_ms / max_total_ms
+          + recency * decayed_plays / max_decayed_plays
+          - skips * skipped / count
+          + completion * mean(ms_played) / longest_play
+
+``decayed_plays`` weighs every play by ``0.5 ** (age / half_life)``, with age
+measured from the newest play in the table (so scores do not drift with the
+wall clock).  Spotify exports carry no track durations, so a track's longest
+play stands in for its length.
+
+Features come from one pass over the :class:`PlayTable` columns, in pure
+Python or with NumPy (``engine="numpy"``); both give the same scores up to
+floating-point rounding.  Any callable taking ``(table, engine)`` and
+returning one score per key id can replace :class:`ScoreWeights` in
+``rank_tracks``.
+"""
+
+from __future__ import annotations
+
+import json
+from array import array
+from dataclasses import asdict, dataclass
+
+from schlange.spotify import optional
+from schlange.spotify.table import TS_ISO, TS_MINUTE, PlayTable
+
+_DAY = 86400
+
+
+@dataclass(frozen=True)
+class ScoreWeights:
+    """Weights of the composite score (see the module docstring)."""
+
+    plays: float = 1.0
+    hours: float = 0.5
+    recency: float = 0.5
+    skips: float = 0.5
+    completion: float = 0.25
+    half_life_days: float = 365.0
+
+    def describe(self) -> str:
+        """Stable text form, written next to the scores in CSV output."""
+        return json.dumps(asdict(self), sort_keys=True)
+
+    def __call__(self, table: PlayTable, engine: str = "python") -> list[float]:
+        return score_tracks(table, self, engine)
+
+
+def score_tracks(table: PlayTable, weights: ScoreWeights = ScoreWeights(), engine: str = "python") -> list[float]:
+    """Return the composite score of every key id of *table*."""
+    if not len(table):
+        return [0.0] * len(table.keys)
+    if engine == "numpy" and optional.numpy() is not None:
+        return _scores_numpy(table, weights)
+    return _scores_python(table, weights)
+
+
+def _newest_ts(table: PlayTable) -> int | None:
+    stamps = table._time_index().ts
+    return stamps[-1] if stamps else None
+
+
+def _scores_python(table: PlayTable, w: ScoreWeights) -> list[float]:
+    n_keys = len(table.keys)
+    counts = array("q", bytes(8 * n_keys))
+    totals = array("q", bytes(8 * n_keys))
+    skips = array("q", bytes(8 * n_keys))
+    longest = array("q", bytes(8 * n_keys))
+    decayed = array("d", bytes(8 * n_keys))
+    now = _newest_ts(table)
+    rate = 1.0 / (w.half_life_days * _DAY)
+
+    for key, ms, skipped, ts, fmt in zip(table.key, table.ms, table.skipped, table.ts, table.ts_fmt):
+        counts[key] += 1
+        totals[key] += ms
+        skips[key] += skipped
+        if ms > longest[key]:
+            longest[key] = ms
+        if fmt == TS_ISO or fmt == TS_MINUTE:
+            decayed[key] += 2.0 ** ((ts - now) * rate)
+
+    max_count = max(counts) or 1
+    max_total = max(totals) or 1
+    max_decayed = max(decayed) or 1.0
+    scores = []
+    for key in range(n_keys):
+        count = counts[key]
+        if not count:
+            scores.append(0.0)
+            continue
+        completion = totals[key] / count / longest[key] if longest[key] else 0.0
+        scores.append(
+            w.plays * count / max_count
+            + w.hours * totals[key] / max_total
+            + w.recency * decayed[key] / max_decayed
+            - w.skips * skips[key] / count
+            + w.completion * completion
+        )
+    return scores
+
+
+def _scores_numpy(table: PlayTable, w: ScoreWeights) -> list[float]:
+    import numpy as np
+
+    n_keys = len(table.keys)
+    key = np.frombuffer(table.key, dtype=np.int32)
+    ms = np.frombuffer(table.ms, dtype=np.int64)
+    counts = np.bincount(key, minlength=n_keys).astype(np.float64)
+    totals = np.bincount(key, weights=ms, minlength=n_keys)
+    skips = np.bincount(key, weights=np.frombuffer(table.skipped, dtype=np.int8), minlength=n_keys)
+    longest = np.zeros(n_keys, dtype=np.int64)
+    np.maximum.at(longest, key, ms)
+
+    fmt = np.frombuffer(table.ts_fmt, dtype=np.int8)
+    timed = (fmt == TS_ISO) | (fmt == TS_MINUTE)
+    decayed = np.zeros(n_keys)
+    if timed.any():
+        ts = np.frombuffer(table.ts, dtype=np.int64)[timed]
+        age = (ts - ts.max()) * (1.0 / (w.half_life_days * _DAY))
+        decayed = np.bincount(key[timed], weights=np.exp2(age), minlength=n_keys)
+
+    played = counts > 0
+    safe_counts = np.where(played, counts, 1.0)
+    completion = np.where(longest > 0, totals / safe_counts / np.maximum(longest, 1), 0.0)
+    scores = (
+        w.plays * counts / (counts.max() or 1)
+        + w.hours * totals / (totals.max() or 1)
+        + w.recency * decayed / (decayed.max() or 1.0)
+        - w.skips * skips / safe_counts
+        + w.completion * completion
+    )
+    return np.where(played, scores, 0.0).tolist()
@@ -0,0 +1,142 @@
+"""Listening sessions: plays grouped by inactivity gap.
+
+Extended history ``ts`` is when a play *ended*; it started ``ms_played``
+earlier.  A session ends when the next play starts more than ``gap`` seconds
+after the previous one ended.
+
+:class:`Sessionizer` does this in one linear pass over plays in time order,
+keeping only the open session's running totals.  Finished sessions land in
+:class:`Sessions`, a struct-of-arrays like :class:`PlayTable`, so a
+multi-year history costs a few dozen bytes per session and no per-session
+Python objects.
+
+Usage:
+    sessions = sessionize(load_export(path), gap=30 * 60)
+    longest = max(range(len(sessions)), key=sessions.duration)
+    print(sessions.session(longest))
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import NamedTuple, Sequence
+
+from schlange.spotify.parser import PlayRecord
+from schlange.spotify.table import TS_ISO, PlayTable, StringPool, format_ts
+
+# Default inactivity gap that ends a session (30 minutes)
+DEFAULT_GAP = 30 * 60
+
+
+class Session(NamedTuple):
+    """One session, materialised on demand by :meth:`Sessions.session`."""
+
+    start: str
+    end: str
+    duration_s: int
+    plays: int
+    listened_ms: int
+    top_artist: str
+
+
+class Sessions:
+    """Per-session aggregates in parallel arrays (index ``i`` is session ``i``).
+
+    Attributes:
+        start: Epoch seconds when the first play started.
+        end: Epoch seconds when the last play ended.
+        plays: Number of plays.
+        listened_ms: Sum of ``ms_played``.
+        top_artist: Id in :attr:`artists` of the most played artist (ties:
+              the one heard first in the session).
+    """
+
+    __slots__ = ("start", "end", "plays", "listened_ms", "top_artist", "artists")
+
+    def __init__(self) -> None:
+        self.start = array("q")
+        self.end = array("q")
+        self.plays = array("i")
+        self.listened_ms = array("q")
+        self.top_artist = array("i")
+        self.artists = StringPool()
+
+    def __len__(self) -> int:
+        return len(self.plays)
+
+    def duration(self, index: int) -> int:
+        """Wall-clock length of session *index* in seconds."""
+        return self.end[index] - self.start[index]
+
+    def session(self, index: int) -> Session:
+        return Session(
+            start=format_ts(self.start[index], TS_ISO),
+            end=format_ts(self.end[index], TS_ISO),
+            duration_s=self.duration(index),
+            plays=self.plays[index],
+            listened_ms=self.listened_ms[index],
+            top_artist=self.artists.values[self.top_artist[index]],
+        )
+
+
+class Sessionizer:
+    """Builds :class:`Sessions` from plays fed in time order."""
+
+    __slots__ = ("gap", "sessions", "_start", "_end", "_plays", "_ms", "_artist_plays")
+
+    def __init__(self, gap: int = DEFAULT_GAP) -> None:
+        self.gap = gap
+        self.sessions = Sessions()
+        self._start = self._end = 0
+        self._plays = self._ms = 0
+        # Artist id -> plays in the open session; dicts keep first-seen order
+        self._artist_plays: dict[int, int] = {}
+
+    def add(self, end_ts: int, ms_played: int, artist: str) -> None:
+        """Add a play that ended at *end_ts* (epoch seconds)."""
+        start_ts = end_ts - ms_played // 1000
+        if self._plays:
+            if end_ts < self._end:
+                raise ValueError("plays must be added in time order")
+            if start_ts - self._end > self.gap:
+                self._close()
+        if not self._plays:
+            self._start = start_ts
+        self._end = end_ts
+        self._plays += 1
+        self._ms += ms_played
+        artist_id = self.sessions.artists.intern(artist)
+        self._artist_plays[artist_id] = self._artist_plays.get(artist_id, 0) + 1
+
+    def _close(self) -> None:
+        out = self.sessions
+        out.start.append(self._start)
+        out.end.append(self._end)
+        out.plays.append(self._plays)
+        out.listened_ms.append(self._ms)
+        counts = self._artist_plays
+        out.top_artist.append(max(counts, key=counts.__getitem__))
+        self._plays = self._ms = 0
+        counts.clear()
+
+    def finish(self) -> Sessions:
+        """Close the open session and return every session."""
+        if self._plays:
+            self._close()
+        return self.sessions
+
+
+def sessionize(plays: Sequence[PlayRecord], gap: int = DEFAULT_GAP) -> Sessions:
+    """Group *plays* into sessions separated by more than *gap* idle seconds.
+
+    Walks the table's time index (see :meth:`PlayTable.between`), so plays
+    need not be stored in time order; plays without a parseable timestamp
+    are left out.
+    """
+    table = plays if isinstance(plays, PlayTable) else PlayTable.from_records(plays)
+    index = table._time_index()
+    sessionizer = Sessionizer(gap)
+    add, artists, ms, artist = sessionizer.add, table.artists.values, table.ms, table.artist
+    for end_ts, row in zip(index.ts, index.rows):
+        add(end_ts, ms[row], artists[artist[row]])
+    return sessionizer.finish()
@@ -0,0 +1,163 @@
+"""Bounded-memory top-N ranking with a Space-Saving heavy-hitters sketch.
+
+:func:`schlange.spotify.parser.rank_tracks` needs every distinct track in
+memory.  :func:`rank_tracks_streaming` instead consumes plays from any
+iterable (e.g. :func:`schlange.spotify.parser.iter_export`) while tracking at
+most ``capacity`` candidate tracks, so memory stays fixed however long the
+history is.
+
+Space-Saving guarantees (Metwally et al., 2005), for a stream of ``N`` plays:
+
+- every track played more than ``N / capacity`` times is among the counters;
+- a counter overestimates its track's plays by at most its ``count_error``
+  (itself at most ``N / capacity``).
+
+An optional exact second pass over the same plays recounts the candidates,
+making counts, totals and order exact for every track above that threshold.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import Iterable
+
+from schlange.spotify.parser import PlayRecord, RankedTrack
+
+# Counters kept per requested track when no capacity is given
+DEFAULT_CAPACITY_FACTOR = 10
+
+
+class _Counter:
+    """Monitored track: count (an upper bound), its error and observed extras."""
+
+    __slots__ = ("count", "error", "total_ms", "uri", "album", "seq")
+
+    def __init__(self, count: int, error: int, seq: int) -> None:
+        self.count = count
+        self.error = error
+        self.total_ms = 0
+        self.uri = ""
+        self.album = ""
+        self.seq = seq
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitters summary over ``(track, artist)`` keys.
+
+    Holds at most *capacity* counters.  A new key arriving when full replaces
+    the counter with the smallest count and inherits that count as its error.
+    The minimum is found through a lazily refreshed heap holding exactly one
+    entry per counter, so each play costs amortised ``O(log capacity)`` only
+    on evictions and ``O(1)`` otherwise.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counters: dict[tuple[str, str], _Counter] = {}
+        self._heap: list[tuple[int, int, tuple[str, str]]] = []
+        self._seq = 0
+
+    def add(self, play: PlayRecord) -> None:
+        """Count one play."""
+        key = (play.track_name, play.artist_name)
+        self.total += 1
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self._admit(key)
+        counter.count += 1
+        counter.total_ms += play.ms_played
+        if play.spotify_uri:
+            counter.uri = play.spotify_uri
+        if play.album_name:
+            counter.album = play.album_name
+
+    def _admit(self, key: tuple[str, str]) -> _Counter:
+        """Create a counter for *key*, evicting the minimum when full."""
+        self._seq += 1
+        if len(self.counters) < self.capacity:
+            counter = self.counters[key] = _Counter(0, 0, self._seq)
+            heapq.heappush(self._heap, (0, counter.seq, key))
+            return counter
+
+        # Heap entries may be stale (counts only grow); refresh until the
+        # top entry reflects its counter's current count
+        while True:
+            count, seq, victim = self._heap[0]
+            current = self.counters[victim].count
+            if count == current:
+                break
+            heapq.heapreplace(self._heap, (current, seq, victim))
+
+        del self.counters[victim]
+        counter = self.counters[key] = _Counter(current, current, self._seq)
+        heapq.heapreplace(self._heap, (current, counter.seq, key))
+        return counter
+
+    def top(self, n: int) -> list[tuple[tuple[str, str], _Counter]]:
+        """Return the *n* largest counters: count desc, ms desc, then admission order."""
+        return sorted(self.counters.items(), key=lambda kv: (-kv[1].count, -kv[1].total_ms, kv[1].seq))[:n]
+
+
+def rank_tracks_streaming(
+    plays: Iterable[PlayRecord],
+    top_n: int = 2000,
+    capacity: int | None = None,
+    second_pass: Iterable[PlayRecord] | None = None,
+) -> list[RankedTrack]:
+    """Approximately rank tracks from a stream of plays in bounded memory.
+
+    Args:
+        plays: Plays in history order (consumed once).
+        top_n: Number of top tracks to return.
+        capacity: Counters to keep -- the memory budget (default
+              ``10 * top_n``).  Larger budgets tighten the error bounds.
+        second_pass: The same plays again (e.g. a fresh
+              :func:`~schlange.spotify.parser.iter_export`).  When given,
+              candidates are recounted exactly and ``count_error`` is 0.
+
+    Returns:
+        RankedTrack objects whose ``count_error`` bounds the overestimate of
+        ``play_count``.  Without a second pass, ``total_ms`` only covers plays
+        seen while the track was monitored (a lower bound).
+    """
+    sketch = SpaceSaving(capacity or DEFAULT_CAPACITY_FACTOR * top_n)
+    for play in plays:
+        sketch.add(play)
+
+    if second_pass is None:
+        top = sketch.top(top_n)
+    else:
+        exact = {key: _Counter(0, 0, 0) for key in sketch.counters}
+        seen = 0
+        for play in second_pass:
+            counter = exact.get((play.track_name, play.artist_name))
+            if counter is None:
+                continue
+            if not counter.count:
+                # Order ties by first appearance, as rank_tracks does
+                seen += 1
+                counter.seq = seen
+            counter.count += 1
+            counter.total_ms += play.ms_played
+            if play.spotify_uri:
+                counter.uri = play.spotify_uri
+            if play.album_name:
+                counter.album = play.album_name
+        top = sorted(exact.items(), key=lambda kv: (-kv[1].count, -kv[1].total_ms, kv[1].seq))[:top_n]
+
+    return [
+        RankedTrack(
+            rank=i,
+            track_name=track_name,
+            artist_name=artist_name,
+            play_count=counter.count,
+            total_ms=counter.total_ms,
+            spotify_uri=counter.uri,
+            album_name=counter.album,
+            count_error=counter.error,
+        )
+        for i, ((track_name, artist_name), counter) in enumerate(top, start=1)
+    ]
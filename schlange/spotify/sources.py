@@ -0,0 +1,77 @@
+"""Locating and opening Spotify export files -- on disk or inside a ZIP.
+
+Spotify delivers exports as ``my_spotify_data.zip``.  Every function here
+accepts either a plain path or an *archive member* path of the form
+``archive.zip!/folder/member.json``, so the ZIP never has to be extracted:
+members are streamed through :mod:`zipfile` straight into the parser.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+# Separates the archive path from the member name in an export file path
+ZIP_MEMBER_SEP = "!/"
+
+
+def split_member(path: str) -> tuple[str, str | None]:
+    """Split ``archive.zip!/member`` into ``(archive, member)``; plain paths give ``(path, None)``."""
+    archive, sep, member = path.partition(ZIP_MEMBER_SEP)
+    return (archive, member) if sep else (path, None)
+
+
+def export_files(path: str) -> list[str]:
+    """Return the export JSON files at *path*, in load order.
+
+    *path* may be a single JSON file, a directory (its ``*.json`` files,
+    sorted) or a ``.zip`` archive (every ``*.json`` member, sorted by name).
+    """
+    p = Path(path)
+    if p.is_file() and zipfile.is_zipfile(p):
+        with zipfile.ZipFile(p) as zf:
+            members = sorted(
+                info.filename for info in zf.infolist() if not info.is_dir() and info.filename.endswith(".json")
+            )
+        return [f"{p}{ZIP_MEMBER_SEP}{member}" for member in members]
+    if p.is_file():
+        return [str(p)]
+    if p.is_dir():
+        return [str(f) for f in sorted(p.glob("*.json"))]
+    raise FileNotFoundError(f"Path not found: {path}")
+
+
+@contextmanager
+def open_export_file(path: str, binary: bool = False) -> Iterator[IO]:
+    """Open an export file or archive member for streaming reads (UTF-8 text by default)."""
+    archive, member = split_member(path)
+    if member is None:
+        with open(path, "rb" if binary else "r", **({} if binary else {"encoding": "utf-8"})) as fh:
+            yield fh
+        return
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as raw:
+        if binary:
+            yield raw
+        else:
+            with io.TextIOWrapper(raw, encoding="utf-8") as fh:
+                yield fh
+
+
+def export_file_identity(path: str) -> tuple[str, int, int]:
+    """Return ``(absolute path, size, mtime_ns)`` identifying the current file contents.
+
+    For archive members, size is the member's uncompressed size and mtime is
+    the archive's: a member cannot change without rewriting its archive.
+    """
+    archive, member = split_member(path)
+    st = os.stat(archive)
+    archive = os.path.abspath(archive)
+    if member is None:
+        return archive, st.st_size, st.st_mtime_ns
+    with zipfile.ZipFile(archive) as zf:
+        info = zf.getinfo(member)
+    return f"{archive}{ZIP_MEMBER_SEP}{member}", info.file_size, st.st_mtime_ns
@@ -0,0 +1,355 @@
+"""Incremental SQLite aggregate store for Spotify exports.
+
+New Spotify exports only ever add files, yet every Tom 2000 run used to
+re-parse the whole history.  :class:`PlayStore` remembers each ingested file
+(size, mtime, content hash) together with its per-track aggregates, and keeps
+running per-track totals.  :meth:`PlayStore.sync` re-parses only added or
+changed files and merges their deltas; :meth:`PlayStore.rank` is a single
+indexed query.  Each file also keeps its listening totals, time range and
+active days, so :meth:`PlayStore.stats` needs no parse either.
+
+Usage:
+    with PlayStore() as store:
+        store.sync("data/extracted/Spotify Extended Streaming History")
+        ranked = store.rank(top_n=2000)
+
+Rankings match :func:`schlange.spotify.parser.rank_tracks` on
+:func:`schlange.spotify.parser.load_export` exactly, tie-break included.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import sqlite3
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from schlange.spotify.filters import PlayFilter
+from schlange.spotify.parser import RankedTrack, accumulate_keys, parse_file
+from schlange.spotify.sources import export_file_identity, export_files, open_export_file
+from schlange.spotify.stats import ListeningStats
+from schlange.spotify.table import PlayTable
+
+DEFAULT_STORE_PATH = "out/spotify_store.sqlite"
+
+# Bump when the schema or the meaning of stored aggregates changes
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    plays INTEGER NOT NULL,
+    total_ms INTEGER NOT NULL,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    days BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    track TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    total_ms INTEGER NOT NULL DEFAULT 0,
+    uri TEXT NOT NULL DEFAULT '',
+    album TEXT NOT NULL DEFAULT '',
+    first_path TEXT NOT NULL DEFAULT '',
+    first_row INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (track, artist)
+);
+CREATE INDEX IF NOT EXISTS tracks_rank ON tracks (play_count DESC, total_ms DESC, first_path, first_row);
+CREATE TABLE IF NOT EXISTS file_tracks (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    track_id INTEGER NOT NULL,
+    play_count INTEGER NOT NULL,
+    total_ms INTEGER NOT NULL,
+    uri TEXT NOT NULL,
+    album TEXT NOT NULL,
+    first_row INTEGER NOT NULL,
+    PRIMARY KEY (file_id, track_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_tracks_track ON file_tracks (track_id);
+"""
+
+# Tables of a store written under another SCHEMA_VERSION, dropped before
+# _SCHEMA recreates them (indexes go with their tables)
+_DROP_SCHEMA = """
+DROP TABLE IF EXISTS file_tracks;
+DROP TABLE IF EXISTS files;
+DROP TABLE IF EXISTS tracks;
+DROP TABLE IF EXISTS meta;
+"""
+
+# Recompute the running totals of the tracks listed in temp.affected from
+# their per-file aggregates.  "Last" URI/album and "first" appearance follow
+# file path order, i.e. load_export order.
+_REFRESH_TRACKS = """
+UPDATE tracks SET
+    play_count = (SELECT COALESCE(SUM(play_count), 0) FROM file_tracks WHERE track_id = tracks.id),
+    total_ms = (SELECT COALESCE(SUM(total_ms), 0) FROM file_tracks WHERE track_id = tracks.id),
+    uri = COALESCE((SELECT ft.uri FROM file_tracks ft JOIN files f ON f.id = ft.file_id
+                    WHERE ft.track_id = tracks.id AND ft.uri != '' ORDER BY f.path DESC LIMIT 1), ''),
+    album = COALESCE((SELECT ft.album FROM file_tracks ft JOIN files f ON f.id = ft.file_id
+                      WHERE ft.track_id = tracks.id AND ft.album != '' ORDER BY f.path DESC LIMIT 1), ''),
+    first_path = COALESCE((SELECT f.path FROM file_tracks ft JOIN files f ON f.id = ft.file_id
+                           WHERE ft.track_id = tracks.id ORDER BY f.path LIMIT 1), ''),
+    first_row = COALESCE((SELECT ft.first_row FROM file_tracks ft JOIN files f ON f.id = ft.file_id
+                          WHERE ft.track_id = tracks.id ORDER BY f.path LIMIT 1), 0)
+WHERE id IN (SELECT track_id FROM temp.affected)
+"""
+
+_HASH_CHUNK = 1 << 20
+
+# (track, artist) pairs looked up per SELECT: two bound variables each, well
+# under SQLite's default limit of 999
+_LOOKUP_CHUNK = 400
+
+
+@dataclass
+class SyncReport:
+    """What :meth:`PlayStore.sync` did, by file path."""
+
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+
+    @property
+    def parsed(self) -> list[str]:
+        return self.added + self.changed
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 of an export file's (or archive member's) contents."""
+    digest = hashlib.sha256()
+    with open_export_file(path, binary=True) as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PlayStore:
+    """Persistent per-file and per-track play aggregates in SQLite."""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is not None and int(row[0]) != SCHEMA_VERSION:
+            # CREATE TABLE IF NOT EXISTS keeps old tables as they are, so
+            # rebuild them rather than only emptying them
+            self._db.executescript(_DROP_SCHEMA)
+        self._db.executescript(_SCHEMA)
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self._db.commit()
+
+    def __enter__(self) -> PlayStore:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def clear(self) -> None:
+        """Forget every ingested file and aggregate."""
+        with self._db:
+            self._db.execute("DELETE FROM file_tracks")
+            self._db.execute("DELETE FROM files")
+            self._db.execute("DELETE FROM tracks")
+
+    # -- ingestion ----------------------------------------------------------
+
+    def sync(self, export_path: str, workers: int | None = 1, where: PlayFilter | None = None) -> SyncReport:
+        """Bring the store in line with the export at *export_path*.
+
+        Files whose size and mtime are unchanged are skipped without reading.
+        Files with a new size or mtime are hashed and only re-parsed if the
+        content changed.  Files no longer present are removed.  Syncing
+        with a different filter than last time starts from an empty store.
+
+        Args:
+            export_path: Export file or directory, as for ``load_export``.
+            workers: Worker processes for parsing (``None``: CPU count).
+            where: A :class:`PlayFilter` applied while parsing.
+        """
+        where = where or PlayFilter()
+        fingerprint = where.fingerprint()
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'filter'").fetchone()
+        if row is not None and row[0] != fingerprint:
+            self.clear()
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('filter', ?)", (fingerprint,))
+
+        report = SyncReport()
+        known = {
+            path: (file_id, size, mtime_ns, sha)
+            for file_id, path, size, mtime_ns, sha in self._db.execute(
+                "SELECT id, path, size, mtime_ns, sha256 FROM files"
+            )
+        }
+
+        to_parse: list[tuple[str, int, int, str]] = []
+        for f in export_files(export_path):
+            path, size, mtime_ns = export_file_identity(f)
+            entry = known.pop(path, None)
+            if entry is not None and (entry[1], entry[2]) == (size, mtime_ns):
+                report.unchanged.append(path)
+                continue
+            sha = file_sha256(path)
+            if entry is not None and entry[3] == sha:
+                # Touched but identical: just remember the new stat
+                self._db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?", (size, mtime_ns, entry[0]))
+                report.unchanged.append(path)
+                continue
+            (report.changed if entry is not None else report.added).append(path)
+            to_parse.append((path, size, mtime_ns, sha))
+        report.removed = sorted(known)
+
+        tables = _parse_files([path for path, *_ in to_parse], workers, where)
+        with self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS affected (track_id INTEGER PRIMARY KEY)")
+            self._db.execute("DELETE FROM temp.affected")
+            for path in report.removed + report.changed:
+                self._drop_file(path)
+            for (path, size, mtime_ns, sha), table in zip(to_parse, tables):
+                self._ingest(path, size, mtime_ns, sha, table)
+            self._db.execute(_REFRESH_TRACKS)
+            self._db.execute("DELETE FROM tracks WHERE play_count = 0")
+        return report
+
+    def _drop_file(self, path: str) -> None:
+        file_id = self._db.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()[0]
+        self._db.execute(
+            "INSERT OR IGNORE INTO temp.affected SELECT track_id FROM file_tracks WHERE file_id = ?", (file_id,)
+        )
+        self._db.execute("DELETE FROM file_tracks WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _ingest(self, path: str, size: int, mtime_ns: int, sha: str, table: PlayTable) -> None:
+        """Record one parsed file and its per-track deltas."""
+        stats = table.stats or ListeningStats.from_table(table)
+        cur = self._db.execute(
+            "INSERT INTO files (path, size, mtime_ns, sha256, plays, total_ms, first_ts, last_ts, days) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                size,
+                mtime_ns,
+                sha,
+                len(table),
+                stats.total_ms,
+                stats.first_ts,
+                stats.last_ts,
+                array("q", sorted(stats.days)).tobytes(),
+            ),
+        )
+        file_id = cur.lastrowid
+
+        names = [
+            (table.tracks.values[t], table.artists.values[a]) for t, a in zip(table.keys.track, table.keys.artist)
+        ]
+        self._db.executemany("INSERT OR IGNORE INTO tracks (track, artist) VALUES (?, ?)", names)
+        ids: dict[tuple[str, str], int] = {}
+        for start in range(0, len(names), _LOOKUP_CHUNK):
+            chunk = names[start : start + _LOOKUP_CHUNK]
+            values = ", ".join(["(?, ?)"] * len(chunk))
+            rows = self._db.execute(
+                f"SELECT track, artist, id FROM tracks WHERE (track, artist) IN (VALUES {values})",
+                [name for pair in chunk for name in pair],
+            )
+            ids.update(((track, artist), track_id) for track, artist, track_id in rows)
+        track_ids = [ids[name] for name in names]
+
+        acc = accumulate_keys(table)
+        # Local key ids follow first appearance, so they double as first_row order
+        self._db.executemany(
+            "INSERT INTO file_tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    file_id,
+                    track_id,
+                    acc[key << 2],
+                    acc[(key << 2) + 1],
+                    table.uris.values[acc[(key << 2) + 2]],
+                    table.albums.values[acc[(key << 2) + 3]],
+                    key,
+                )
+                for key, track_id in enumerate(track_ids)
+            ),
+        )
+        self._db.executemany("INSERT OR IGNORE INTO temp.affected VALUES (?)", ((t,) for t in track_ids))
+
+    # -- querying -----------------------------------------------------------
+
+    def files(self) -> list[str]:
+        """Paths of the ingested files, in export order."""
+        return [path for (path,) in self._db.execute("SELECT path FROM files ORDER BY path")]
+
+    def play_count(self) -> int:
+        """Total number of stored plays."""
+        return self._db.execute("SELECT COALESCE(SUM(plays), 0) FROM files").fetchone()[0]
+
+    def stats(self) -> ListeningStats:
+        """Listening statistics of the stored plays, as ``load_export(...).stats`` (exact mode)."""
+        stats = ListeningStats()
+        for plays, total_ms, first_ts, last_ts, days in self._db.execute(
+            "SELECT plays, total_ms, first_ts, last_ts, days FROM files"
+        ):
+            part = ListeningStats()
+            part.plays, part.total_ms = plays, total_ms
+            part.first_ts, part.last_ts = first_ts, last_ts
+            part.days = set(array("q", days))
+            stats.update(part)
+        # Every stored track has plays (sync drops the others); like
+        # count_distinct, the empty artist name is not counted
+        stats.tracks = self._db.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+        stats.artists = self._db.execute("SELECT COUNT(DISTINCT artist) FROM tracks WHERE artist != ''").fetchone()[0]
+        return stats
+
+    def rank(self, top_n: int = 2000) -> list[RankedTrack]:
+        """Rank tracks like ``rank_tracks(load_export(...))``, from the aggregates."""
+        rows = self._db.execute(
+            "SELECT track, artist, play_count, total_ms, uri, album FROM tracks "
+            "ORDER BY play_count DESC, total_ms DESC, first_path, first_row LIMIT ?",
+            (top_n,),
+        )
+        return [
+            RankedTrack(
+                rank=i,
+                track_name=track,
+                artist_name=artist,
+                play_count=count,
+                total_ms=total,
+                spotify_uri=uri,
+                album_name=album,
+            )
+            for i, (track, artist, count, total, uri, album) in enumerate(rows, start=1)
+        ]
+
+
+def _parse_files(paths: Iterable[str], workers: int | None, where: PlayFilter) -> list[PlayTable]:
+    """Parse export files, in a process pool when more than one worker is asked for."""
+    paths = list(paths)
+    parse = functools.partial(parse_file, where=where)
+    workers = min(workers or os.cpu_count() or 1, len(paths)) or 1
+    if workers == 1:
+        return [parse(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse, paths))
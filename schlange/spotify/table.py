@@ -0,0 +1,783 @@
+"""Columnar play store -- struct-of-arrays replacement for ``list[PlayRecord]``.
+
+A :class:`PlayRecord` dataclass costs a few hundred bytes per play (instance
+``__dict__`` plus six field objects).  :class:`PlayTable` keeps one column per
+field instead:
+
+- ``ts``: epoch seconds in an ``array('q')``, with a one-byte ``ts_fmt`` code
+  remembering the textual format so ``played_at`` round-trips exactly;
+- ``ms``: ``ms_played`` in an ``array('q')``;
+- ``skipped``: the skip flag as one byte per play;
+- ``track``/``artist``/``album``/``uri``: ``array('i')`` indexes into
+  per-column :class:`StringPool` dictionaries;
+- ``key``: an ``array('i')`` id of the ``(track, artist)`` pair, interned in a
+  :class:`PairPool` at parse time so aggregations group by one small int.
+
+That is about 38 bytes per play.  The table is also a ``Sequence[PlayRecord]``
+-- indexing and iteration build records on the fly -- so code written against
+the old ``list[PlayRecord]`` API keeps working.
+
+Extended-history fields that only analytics need (``reason_start``,
+``reason_end``, ``platform``, ``shuffle``, ``offline``) are kept on request
+as :class:`CategoryColumn` codes in :attr:`PlayTable.categories`: two bytes
+per play and field (four once a field has more than 65,536 labels), decoded
+to text only when read.  Tables parsed without them pay nothing.
+
+Time queries (:meth:`PlayTable.between`, :meth:`PlayTable.by_day`,
+:meth:`PlayTable.date_range`) go through a time index built on first use: the
+rows with a parsed timestamp, ordered by ``ts``, searched with :mod:`bisect`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+import itertools
+import operator
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Iterable, Iterator, Sequence, overload
+
+if TYPE_CHECKING:
+    from schlange.spotify.stats import ListeningStats
+
+# ts_fmt codes
+TS_EMPTY = 0  # no timestamp
+TS_ISO = 1  # extended history: 2020-01-01T10:00:00Z
+TS_MINUTE = 2  # basic history: 2020-01-01 10:00
+TS_RAW = 3  # anything else: ts is an index into PlayTable.raw_ts
+
+_EPOCH = dt.date(1970, 1, 1)
+# Two-digit clock fields ("00".."59") -> value
+_CLOCK = {f"{n:02d}": n for n in range(60)}
+# Rows interned per PlayTable.add_rows batch
+_BATCH_ROWS = 8192
+# Getters for the fields of an add() argument tuple
+_FIELD = tuple(map(operator.itemgetter, range(8)))
+
+_MAGIC = b"SCHLPTB5"
+_HEADER = struct.Struct("<8sQ")
+_SECTION_LEN = struct.Struct("<Q")
+
+# Serialized column order; every section is padded to 8 bytes so a mapped
+# file keeps each array naturally aligned
+_ARRAY_COLUMNS = ("ts", "ts_fmt", "ms", "skipped", "track", "artist", "album", "uri", "key")
+_POOL_COLUMNS = ("tracks", "artists", "albums", "uris", "raw_ts")
+
+# Optional categorical columns, in PlayTable.categories order.  Values are
+# the export's text; booleans become "true"/"false", missing fields ""
+CATEGORY_FIELDS = ("reason_start", "reason_end", "platform", "shuffle", "offline")
+_NO_CATEGORIES = ("",) * len(CATEGORY_FIELDS)
+
+
+@dataclass
+class PlayRecord:
+    """A single normalized play record."""
+
+    played_at: str
+    track_name: str
+    artist_name: str
+    ms_played: int = 0
+    spotify_uri: str = ""
+    album_name: str = ""
+    # Extended history only: Spotify's "skipped" flag or a forward-button end
+    skipped: bool = False
+
+
+class StringPool:
+    """Dictionary encoding: each distinct string is stored once and gets an int id.
+
+    Id 0 is always the empty string.
+    """
+
+    __slots__ = ("values", "_index")
+
+    def __init__(self, values: Iterable[str] = ("",)) -> None:
+        self.values: list[str] = list(values)
+        self._index: dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def intern(self, value: str) -> int:
+        """Return the id of *value*, adding it if new."""
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def intern_many(self, values: Sequence[str]) -> list[int]:
+        """Return the ids of *values*, adding new ones in first-seen order."""
+        return _intern_many(self._index, values, self.intern)
+
+    def remap(self, other: StringPool) -> list[int]:
+        """Intern every value of *other*; returns ``other id -> self id``."""
+        return self.intern_many(other.values)
+
+    def copy(self) -> StringPool:
+        clone = StringPool.__new__(StringPool)
+        clone.values = self.values.copy()
+        clone._index = self._index.copy()
+        return clone
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Pickle only the values; the index is rebuilt on load
+        return (StringPool, (self.values,))
+
+
+def _intern_many(index: dict[Any, int], values: Sequence[Hashable], intern: Callable[[Any], int]) -> list[int]:
+    """Look every value up with C-level ``map``; only misses go through *intern*."""
+    ids = list(map(index.get, values))
+    if None in ids:
+        for value in dict.fromkeys(itertools.compress(values, map(operator.is_, ids, itertools.repeat(None)))):
+            intern(value)
+        ids = list(map(index.__getitem__, values))
+    return ids
+
+
+class PairPool:
+    """Interns ``(track_id, artist_id)`` pairs to dense ids, in first-seen order.
+
+    The pairs themselves live in two parallel ``array('i')`` columns.
+    """
+
+    __slots__ = ("track", "artist", "_index")
+
+    def __init__(self, track: Iterable[int] = (), artist: Iterable[int] = ()) -> None:
+        self.track = array("i", track)
+        self.artist = array("i", artist)
+        self._index: dict[tuple[int, int], int] = {pair: i for i, pair in enumerate(zip(self.track, self.artist))}
+
+    def __len__(self) -> int:
+        return len(self.track)
+
+    def intern(self, track_id: int, artist_id: int) -> int:
+        """Return the id of the pair, adding it if new."""
+        pair = (track_id, artist_id)
+        idx = self._index.get(pair)
+        if idx is None:
+            idx = self._index[pair] = len(self.track)
+            self.track.append(track_id)
+            self.artist.append(artist_id)
+        return idx
+
+    def intern_many(self, track_ids: Sequence[int], artist_ids: Sequence[int]) -> list[int]:
+        """Return the ids of the pairs zipped from both sequences, adding new ones."""
+        return _intern_many(self._index, list(zip(track_ids, artist_ids)), lambda pair: self.intern(*pair))
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (PairPool, (self.track, self.artist))
+
+
+class CategoryColumn:
+    """A categorical column: ``array('H')`` codes into a :class:`StringPool`.
+
+    Code 0 is the empty string (field missing).  Rows stay codes until read,
+    so grouping and counting never touch the labels.  Past 65,536 labels the
+    codes are widened to ``array('I')``.
+    """
+
+    __slots__ = ("codes", "labels")
+
+    def __init__(self, codes: Iterable[int] = (), labels: Iterable[str] = ("",)) -> None:
+        self.labels = StringPool(labels)
+        self.codes = array(_code_type(len(self.labels)), codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.labels.values[self.codes[row]]
+
+    def append(self, value: str) -> None:
+        code = self.labels.intern(value)
+        self._fit()
+        self.codes.append(code)
+
+    def append_many(self, values: Sequence[str]) -> None:
+        codes = self.labels.intern_many(values)
+        self._fit()
+        self.codes.extend(codes)
+
+    def extend(self, other: CategoryColumn) -> None:
+        mapping = self.labels.remap(other.labels)
+        self._fit()
+        self.codes.extend(map(mapping.__getitem__, other.codes))
+
+    def _fit(self) -> None:
+        """Widen the codes once the labels outgrow them."""
+        typecode = _code_type(len(self.labels))
+        if typecode != self.codes.typecode:
+            self.codes = array(typecode, self.codes)
+
+    def decode(self) -> list[str]:
+        """Return every row's label."""
+        labels = self.labels.values
+        return [labels[code] for code in self.codes]
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (CategoryColumn, (self.codes, self.labels.values))
+
+
+def _code_type(labels: int) -> str:
+    """Typecode of the category codes for a column with *labels* labels."""
+    return "H" if labels <= 1 << 16 else "I"
+
+
+class _TimestampCodec:
+    """Parses export timestamps to epoch seconds, caching the per-hour part."""
+
+    __slots__ = ("_hours",)
+
+    def __init__(self) -> None:
+        self._hours: dict[str, int] = {}
+
+    def _hour(self, text: str) -> int | None:
+        """Epoch seconds of a ``YYYY-MM-DD?HH`` prefix."""
+        base = self._hours.get(text)
+        if base is None:
+            hour = _CLOCK.get(text[11:13])
+            if hour is None or hour > 23 or text[4] != "-" or text[7] != "-":
+                return None
+            try:
+                base = (dt.date.fromisoformat(text[:10]) - _EPOCH).days * 86400 + hour * 3600
+            except ValueError:
+                return None
+            self._hours[text] = base
+        return base
+
+    def encode(self, text: str) -> tuple[int, int] | None:
+        """Return ``(epoch_seconds, ts_fmt)``, or ``None`` if not a known format."""
+        n = len(text)
+        if n == 20 and text[10] == "T" and text[19] == "Z" and text[13] == text[16] == ":":
+            fmt = TS_ISO
+            second = _CLOCK.get(text[17:19])
+        elif n == 16 and text[10] == " " and text[13] == ":":
+            fmt = TS_MINUTE
+            second = 0
+        else:
+            return None
+        minute = _CLOCK.get(text[14:16])
+        if minute is None or second is None:
+            return None
+        base = self._hour(text[:13])
+        if base is None:
+            return None
+        return base + minute * 60 + second, fmt
+
+
+def epoch_seconds(when: str | dt.date | int) -> int:
+    """Convert a time bound to epoch seconds (UTC, like the ``ts`` column).
+
+    Strings may be any prefix of an ISO timestamp -- ``"2023"``,
+    ``"2023-06"``, ``"2023-06-01 12:00"`` -- and are read as the start of
+    that period.  Dates mean midnight; ints pass through.
+    """
+    if isinstance(when, int):
+        return when
+    if isinstance(when, str):
+        text = when.rstrip("Z").replace(" ", "T")
+        when = dt.datetime.fromisoformat(text + "0000-01-01T00:00:00"[len(text) :])
+    if not isinstance(when, dt.datetime):
+        when = dt.datetime(when.year, when.month, when.day)
+    if when.tzinfo is not None:
+        when = when.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return (when.date() - _EPOCH).days * 86400 + when.hour * 3600 + when.minute * 60 + when.second
+
+
+class _TimeIndex:
+    """Rows with a parsed timestamp in time order (ties keep row order)."""
+
+    __slots__ = ("size", "ts", "rows", "raw_days")
+
+    def __init__(self, table: PlayTable) -> None:
+        self.size = len(table)
+        column = table.ts
+        rows = [row for row, fmt in enumerate(table.ts_fmt) if fmt == TS_ISO or fmt == TS_MINUTE]
+        # Exports are written in time order, so this is usually already sorted
+        if any(column[a] > column[b] for a, b in zip(rows, rows[1:])):
+            rows.sort(key=column.__getitem__)
+        self.rows = array("q", rows)
+        self.ts = array("q", (column[row] for row in rows))
+        self.raw_days = {table.raw_ts.values[ts][:10] for ts, fmt in zip(column, table.ts_fmt) if fmt == TS_RAW}
+        self.raw_days.discard("")
+
+
+def format_ts(ts: int, fmt: int) -> str:
+    """Inverse of the timestamp encoding for the ``TS_ISO``/``TS_MINUTE`` formats."""
+    stamp = dt.datetime(1970, 1, 1) + dt.timedelta(seconds=ts)
+    if fmt == TS_ISO:
+        return stamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return stamp.strftime("%Y-%m-%d %H:%M")
+
+
+class PlayTable(Sequence[PlayRecord]):
+    """Struct-of-arrays storage for play records.
+
+    Build with :meth:`add`, :meth:`add_rows` or :meth:`extend`; read columns
+    directly for aggregation, or treat the table as a sequence of
+    :class:`PlayRecord`.
+    """
+
+    __slots__ = ("ts", "ts_fmt", "ms", "skipped", "track", "artist", "album", "uri", "key",
+                 "tracks", "artists", "albums", "uris", "keys", "raw_ts", "categories", "stats", "_codec", "_index")
+
+    def __init__(self, categories: bool = False) -> None:
+        self.ts = array("q")
+        self.ts_fmt = array("b")
+        self.ms = array("q")
+        self.skipped = array("b")
+        self.track = array("i")
+        self.artist = array("i")
+        self.album = array("i")
+        self.uri = array("i")
+        self.key = array("i")
+        self.tracks = StringPool()
+        self.artists = StringPool()
+        self.albums = StringPool()
+        self.uris = StringPool()
+        self.keys = PairPool()
+        self.raw_ts = StringPool()
+        # CATEGORY_FIELDS -> column, or None when not kept
+        self.categories: dict[str, CategoryColumn] | None = (
+            {name: CategoryColumn() for name in CATEGORY_FIELDS} if categories else None
+        )
+        # Filled by the parser while ingesting; see schlange.spotify.stats
+        self.stats: ListeningStats | None = None
+        self._codec = _TimestampCodec()
+        self._index: _TimeIndex | None = None
+
+    def copy(self) -> PlayTable:
+        """Return an independent copy; columns and pools are copied whole."""
+        table = PlayTable()
+        for name in _ARRAY_COLUMNS:
+            setattr(table, name, getattr(self, name)[:])
+        for name in _POOL_COLUMNS:
+            setattr(table, name, getattr(self, name).copy())
+        table.keys = PairPool(self.keys.track, self.keys.artist)
+        if self.categories is not None:
+            table.categories = {
+                name: CategoryColumn(column.codes, column.labels.values) for name, column in self.categories.items()
+            }
+        table.stats = self.stats.copy() if self.stats is not None else None
+        return table
+
+    @classmethod
+    def from_records(cls, records: Iterable[PlayRecord]) -> PlayTable:
+        """Build a table from any iterable of :class:`PlayRecord`."""
+        table = cls()
+        table.extend(records)
+        return table
+
+    # -- building -----------------------------------------------------------
+
+    def add(
+        self,
+        played_at: str,
+        track_name: str,
+        artist_name: str,
+        ms_played: int = 0,
+        spotify_uri: str = "",
+        album_name: str = "",
+        skipped: bool = False,
+        categories: Sequence[str] | None = None,
+    ) -> None:
+        """Append one play (same argument order as :class:`PlayRecord`).
+
+        *categories* holds one label per :data:`CATEGORY_FIELDS` entry; it is
+        ignored unless the table keeps categories.
+        """
+        if not played_at:
+            ts, fmt = 0, TS_EMPTY
+        else:
+            encoded = self._codec.encode(played_at)
+            ts, fmt = encoded if encoded is not None else (self.raw_ts.intern(played_at), TS_RAW)
+        self.ts.append(ts)
+        self.ts_fmt.append(fmt)
+        self.ms.append(ms_played)
+        self.skipped.append(skipped)
+        track_id = self.tracks.intern(track_name)
+        artist_id = self.artists.intern(artist_name)
+        self.track.append(track_id)
+        self.artist.append(artist_id)
+        self.key.append(self.keys.intern(track_id, artist_id))
+        self.album.append(self.albums.intern(album_name))
+        self.uri.append(self.uris.intern(spotify_uri))
+        if self.categories is not None:
+            for column, value in zip(self.categories.values(), categories or _NO_CATEGORIES):
+                column.append(value)
+
+    def add_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Append many plays given as :meth:`add` argument tuples.
+
+        Rows are taken a batch at a time and each column is encoded and
+        interned as a whole, several times cheaper than one :meth:`add` per
+        row.  Every row must hold the seven record fields, plus *categories*
+        as an eighth element to fill the category columns.
+        """
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, _BATCH_ROWS)):
+            self._add_batch(batch)
+
+    def _add_batch(self, batch: list[Sequence[Any]]) -> None:
+        # Columns are pulled out with itemgetter maps, cheaper than zip(*batch)
+        played_at = list(map(_FIELD[0], batch))
+        encoded = list(map(self._codec.encode, played_at))
+        if None in encoded:
+            raw = self.raw_ts.intern
+            encoded = [
+                enc if enc is not None else (raw(text), TS_RAW) if text else (0, TS_EMPTY)
+                for text, enc in zip(played_at, encoded)
+            ]
+        self.ts.extend(map(_FIELD[0], encoded))
+        self.ts_fmt.extend(map(_FIELD[1], encoded))
+        self.ms.extend(map(_FIELD[3], batch))
+        self.skipped.extend(map(_FIELD[6], batch))
+        track_ids = self.tracks.intern_many(list(map(_FIELD[1], batch)))
+        artist_ids = self.artists.intern_many(list(map(_FIELD[2], batch)))
+        self.track.extend(track_ids)
+        self.artist.extend(artist_ids)
+        self.key.extend(self.keys.intern_many(track_ids, artist_ids))
+        self.uri.extend(self.uris.intern_many(list(map(_FIELD[4], batch))))
+        self.album.extend(self.albums.intern_many(list(map(_FIELD[5], batch))))
+        if self.categories is not None:
+            if len(batch[0]) > 7:
+                rows = list(map(_FIELD[7], batch))
+                labels = [list(map(_FIELD[i], rows)) for i in range(len(CATEGORY_FIELDS))]
+            else:
+                labels = [[""] * len(batch)] * len(CATEGORY_FIELDS)
+            for column, values in zip(self.categories.values(), labels):
+                column.append_many(values)
+
+    def append(self, record: PlayRecord) -> None:
+        """``list.append`` compatibility."""
+        self.add(record.played_at, record.track_name, record.artist_name,
+                 record.ms_played, record.spotify_uri, record.album_name, record.skipped)
+
+    def extend(self, records: Iterable[PlayRecord]) -> None:
+        """Append records; another :class:`PlayTable` is merged column-wise."""
+        if not isinstance(records, PlayTable):
+            for record in records:
+                self.append(record)
+            return
+
+        other = records
+        self._merge_stats(other)
+        self._merge_categories(other)
+        self.ts.extend(other.ts)
+        self.ts_fmt.extend(other.ts_fmt)
+        self.ms.extend(other.ms)
+        self.skipped.extend(other.skipped)
+        mappings = []
+        for column, pool, other_column, other_pool in (
+            (self.track, self.tracks, other.track, other.tracks),
+            (self.artist, self.artists, other.artist, other.artists),
+            (self.album, self.albums, other.album, other.albums),
+            (self.uri, self.uris, other.uri, other.uris),
+        ):
+            mapping = pool.remap(other_pool)
+            column.extend(map(mapping.__getitem__, other_column))
+            mappings.append(mapping)
+        track_map, artist_map = mappings[0], mappings[1]
+        key_map = self.keys.intern_many(
+            list(map(track_map.__getitem__, other.keys.track)), list(map(artist_map.__getitem__, other.keys.artist))
+        )
+        self.key.extend(map(key_map.__getitem__, other.key))
+        if len(other.raw_ts) > 1:
+            # Raw timestamps store a pool id in ts; rewrite those rows
+            mapping = self.raw_ts.remap(other.raw_ts)
+            start = len(self.ts) - len(other.ts)
+            for row, fmt in enumerate(other.ts_fmt, start):
+                if fmt == TS_RAW:
+                    self.ts[row] = mapping[self.ts[row]]
+        if self.stats is not None:
+            self.stats.count_distinct(self)
+
+    def _merge_stats(self, other: PlayTable) -> None:
+        """Carry ingest-time stats over a merge, or drop them if either side lacks current ones.
+
+        Call before the columns grow; exact distinct counts are retaken once
+        the dictionaries are merged.
+        """
+        mine, theirs = self.stats, other.stats
+        if theirs is None or theirs.plays != len(other):
+            self.stats = None
+        elif not len(self):
+            self.stats = theirs.copy()
+        elif mine is not None and mine.plays == len(self) and mine.distinct == theirs.distinct:
+            mine.update(theirs)
+        else:
+            self.stats = None
+
+    def _merge_categories(self, other: PlayTable) -> None:
+        """Extend the category columns by *other*'s rows (call before the other columns)."""
+        mine, theirs = self.categories, other.categories
+        if theirs is None:
+            if mine is not None:
+                for column in mine.values():
+                    column.codes.frombytes(bytes(column.codes.itemsize * len(other)))
+            return
+        if mine is None:
+            # Rows added before categories were kept read as missing
+            mine = self.categories = {name: CategoryColumn(bytes(2 * len(self))) for name in CATEGORY_FIELDS}
+        for name, column in mine.items():
+            column.extend(theirs[name])
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # The timestamp codec and time index are caches; don't ship them to workers
+        state = {name: getattr(self, name) for name in self.__slots__ if name not in ("_codec", "_index")}
+        return (_rebuild_table, (state,))
+
+    # -- persistence --------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a little-endian binary blob (arrays plus string tables)."""
+        parts = [_HEADER.pack(_MAGIC, len(self))]
+        arrays = [getattr(self, name) for name in _ARRAY_COLUMNS] + [self.keys.track, self.keys.artist]
+        for column in arrays:
+            _append_section(parts, column)
+        for name in _POOL_COLUMNS:
+            _append_strings(parts, getattr(self, name).values)
+        _append_section(parts, array("b", [self.categories is not None]))
+        for column in (self.categories or {}).values():
+            # Labels first: their count gives the codes' width
+            _append_strings(parts, column.labels.values)
+            _append_section(parts, column.codes)
+        # Stats only while they still cover every row
+        stats = self.stats if self.stats is not None and self.stats.plays == len(self) else None
+        _append_section(parts, array("b", [stats is not None]))
+        for section in stats.to_sections() if stats is not None else ():
+            _append_section(parts, section)
+        return b"".join(parts)
+
+    @classmethod
+    def from_buffer(cls, data: bytes | memoryview) -> PlayTable:
+        """Inverse of :meth:`to_bytes`; *data* may be a mapped file.
+
+        Columns are copied straight out of the buffer (one ``memcpy`` each),
+        so no per-row decoding happens.
+        """
+        # Release the view before returning (or raising) so a mapped file
+        # can be closed by the caller
+        with memoryview(data) as view:
+            return cls._from_view(view)
+
+    @classmethod
+    def _from_view(cls, view: memoryview) -> PlayTable:
+        magic, _rows = _HEADER.unpack_from(view, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a Schlange play table")
+        offset = _HEADER.size
+
+        def section() -> memoryview:
+            nonlocal offset
+            (size,) = _SECTION_LEN.unpack_from(view, offset)
+            start = offset + _SECTION_LEN.size
+            offset = start + size + (-size % 8)
+            return view[start : start + size]
+
+        def read_array(typecode: str) -> array:
+            column = array(typecode)
+            column.frombytes(section())
+            if sys.byteorder == "big":
+                column.byteswap()
+            return column
+
+        def read_strings() -> list[str]:
+            lengths = read_array("i")
+            blob = bytes(section())
+            values = []
+            pos = 0
+            for n in lengths:
+                values.append(blob[pos : pos + n].decode("utf-8"))
+                pos += n
+            return values
+
+        table = cls()
+        for name in _ARRAY_COLUMNS:
+            setattr(table, name, read_array(getattr(table, name).typecode))
+        table.keys = PairPool(read_array("i"), read_array("i"))
+        for name in _POOL_COLUMNS:
+            setattr(table, name, StringPool(read_strings()))
+        if read_array("b")[0]:
+            table.categories = {}
+            for name in CATEGORY_FIELDS:
+                labels = read_strings()
+                table.categories[name] = CategoryColumn(read_array(_code_type(len(labels))), labels)
+        if read_array("b")[0]:
+            from schlange.spotify.stats import ListeningStats
+
+            table.stats = ListeningStats.from_sections(read_array("q"), read_array("q"), bytes(section()))
+            table.stats.count_distinct(table)
+        return table
+
+    # -- reading ------------------------------------------------------------
+
+    def played_at(self, row: int) -> str:
+        """Return the original ``played_at`` text of *row*."""
+        fmt = self.ts_fmt[row]
+        if fmt == TS_EMPTY:
+            return ""
+        if fmt == TS_RAW:
+            return self.raw_ts.values[self.ts[row]]
+        return format_ts(self.ts[row], fmt)
+
+    def record(self, row: int) -> PlayRecord:
+        """Materialise *row* as a :class:`PlayRecord`."""
+        return PlayRecord(
+            played_at=self.played_at(row),
+            track_name=self.tracks.values[self.track[row]],
+            artist_name=self.artists.values[self.artist[row]],
+            ms_played=self.ms[row],
+            spotify_uri=self.uris.values[self.uri[row]],
+            album_name=self.albums.values[self.album[row]],
+            skipped=bool(self.skipped[row]),
+        )
+
+    def to_records(self) -> list[PlayRecord]:
+        """Materialise the whole table as ``list[PlayRecord]``."""
+        return [self.record(row) for row in range(len(self))]
+
+    def take(self, rows: Iterable[int]) -> PlayTable:
+        """Return a new table holding *rows*, in the given order."""
+        out = PlayTable()
+        # Category labels are copied whole; codes carry over unchanged
+        categories = []
+        if self.categories is not None:
+            out.categories = {
+                name: CategoryColumn(labels=column.labels.values) for name, column in self.categories.items()
+            }
+            categories = [(out.categories[name].codes, column.codes) for name, column in self.categories.items()]
+        remapped: list[tuple[array, StringPool, array, StringPool, dict[int, int]]] = [
+            (out.track, out.tracks, self.track, self.tracks, {}),
+            (out.artist, out.artists, self.artist, self.artists, {}),
+            (out.album, out.albums, self.album, self.albums, {}),
+            (out.uri, out.uris, self.uri, self.uris, {}),
+        ]
+        for row in rows:
+            ts, fmt = self.ts[row], self.ts_fmt[row]
+            if fmt == TS_RAW:
+                ts = out.raw_ts.intern(self.raw_ts.values[ts])
+            out.ts.append(ts)
+            out.ts_fmt.append(fmt)
+            out.ms.append(self.ms[row])
+            out.skipped.append(self.skipped[row])
+            for column, pool, own_column, own_pool, mapping in remapped:
+                old = own_column[row]
+                new = mapping.get(old)
+                if new is None:
+                    new = mapping[old] = pool.intern(own_pool.values[old])
+                column.append(new)
+            out.key.append(out.keys.intern(out.track[-1], out.artist[-1]))
+            for codes, own_codes in categories:
+                codes.append(own_codes[row])
+        return out
+
+    def _time_index(self) -> _TimeIndex:
+        # Tables only grow, so an index covering every row is current
+        index = self._index
+        if index is None or index.size != len(self):
+            index = self._index = _TimeIndex(self)
+        return index
+
+    def between(self, start: str | dt.date | int | None = None, end: str | dt.date | int | None = None) -> PlayTable:
+        """Return the plays with ``start <= played_at < end``, in time order.
+
+        Bounds accept anything :func:`epoch_seconds` does; ``None`` leaves
+        that side open.  Plays without a parseable timestamp are never
+        included.  Locating the range is ``O(log n)`` on the time index.
+        """
+        index = self._time_index()
+        lo = 0 if start is None else bisect.bisect_left(index.ts, epoch_seconds(start))
+        hi = len(index.ts) if end is None else bisect.bisect_left(index.ts, epoch_seconds(end))
+        return self.take(index.rows[lo:hi])
+
+    def by_day(self) -> dict[str, int]:
+        """Return ``{"YYYY-MM-DD": plays}`` for every day with plays, in date order.
+
+        Costs one binary search per active day, not a scan of the table.
+        Plays without a parseable timestamp are not counted.
+        """
+        stamps = self._time_index().ts
+        days: dict[str, int] = {}
+        lo, n = 0, len(stamps)
+        while lo < n:
+            day = stamps[lo] // 86400
+            hi = bisect.bisect_left(stamps, (day + 1) * 86400, lo)
+            days[(_EPOCH + dt.timedelta(days=day)).isoformat()] = hi - lo
+            lo = hi
+        return days
+
+    def date_range(self) -> tuple[str, str] | None:
+        """Return the first and last ``YYYY-MM-DD`` day with plays, if any."""
+        index = self._time_index()
+        days = set(index.raw_days)
+        if index.ts:
+            days.add(format_ts(index.ts[0], TS_ISO)[:10])
+            days.add(format_ts(index.ts[-1], TS_ISO)[:10])
+        if not days:
+            return None
+        return min(days), max(days)
+
+    def __len__(self) -> int:
+        return len(self.ms)
+
+    @overload
+    def __getitem__(self, index: int) -> PlayRecord: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[PlayRecord]: ...
+
+    def __getitem__(self, index: int | slice) -> PlayRecord | list[PlayRecord]:
+        if isinstance(index, slice):
+            return [self.record(row) for row in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PlayTable index out of range")
+        return self.record(index)
+
+    def __iter__(self) -> Iterator[PlayRecord]:
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (PlayTable, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<PlayTable: {len(self)} plays, {len(self.tracks) - 1} tracks>"
+
+
+def _append_section(parts: list[bytes], data: array | bytes) -> None:
+    """Append a length-prefixed, 8-byte padded section."""
+    if isinstance(data, array):
+        if sys.byteorder == "big":
+            data = array(data.typecode, data)
+            data.byteswap()
+        data = data.tobytes()
+    parts.append(_SECTION_LEN.pack(len(data)))
+    parts.append(data)
+    parts.append(bytes(-len(data) % 8))
+
+
+def _append_strings(parts: list[bytes], values: list[str]) -> None:
+    """Append a string table as a lengths section and a UTF-8 blob section."""
+    encoded = [v.encode("utf-8") for v in values]
+    _append_section(parts, array("i", map(len, encoded)))
+    _append_section(parts, b"".join(encoded))
+
+
+def _rebuild_table(state: dict[str, Any]) -> PlayTable:
+    table = PlayTable.__new__(PlayTable)
+    for name, value in state.items():
+        setattr(table, name, value)
+    table.categories = state.get("categories")
+    table.stats = state.get("stats")
+    table._codec = _TimestampCodec()
+    table._index = None
+    return table
@@ -12,14 +12,21 @@ string literals.
 from __future__ import annotations
 
 import io
+import mmap
+import os
 import re
 import tokenize
-from typing import Iterator
+from typing import Callable, Iterable, Iterator, Literal, overload
 
 from schlange.keywords import FULL_MAP, QUOTE_MAP, QUOTE_PREFIXES
+from schlange.sourcemap import ColumnShifts, SourceMap, shifted_col
 
 
-def _rewrite_tokens(source: str) -> str:
+def _rewrite_tokens(
+    source: str,
+    smap: SourceMap | None = None,
+    shifts: ColumnShifts | None = None,
+) -> str:
     """Rewrite German keyword tokens in *source* to their Python equivalents.
 
     The function operates on the token stream produced by ``tokenize.generate_tokens``.
@@ -27,10 +34,30 @@ def _rewrite_tokens(source: str) -> str:
     replaced.  Everything else (strings, comments, operators, whitespace) passes
     through unchanged.
 
+    When *smap* is given, source-map segments are appended to its pairs as
+    they are found (see :mod:`schlange.sourcemap`); *shifts* translates
+    pre-pass columns back to the original source.
+
     Returns the fully rewritten source code as a string.
     """
-    readline = io.StringIO(source).readline
-    tokens: list[tokenize.TokenInfo] = list(tokenize.generate_tokens(readline))
+    return "".join(_iter_rewritten(io.StringIO(source).readline, smap, shifts))
+
+
+# Output parts buffered before a chunk is handed to the consumer.
+_FLUSH_PARTS = 4096
+
+
+def _iter_rewritten(
+    readline: Callable[[], str],
+    smap: SourceMap | None = None,
+    shifts: ColumnShifts | None = None,
+) -> Iterator[str]:
+    """Streaming core of :func:`_rewrite_tokens`.
+
+    Pulls lines from *readline* as the tokenizer needs them and yields the
+    rewritten output in chunks that always end on a row boundary, so memory
+    stays bounded by the longest logical line plus one chunk.
+    """
     result_parts: list[str] = []
 
     # We rebuild the source by walking character positions.
@@ -38,12 +65,40 @@ def _rewrite_tokens(source: str) -> str:
     prev_row = 1
     prev_col = 0
 
-    for tok in tokens:
+    # Source-map state.  Every NEWLINE/NL token is emitted twice (its own
+    # "\n" plus the row gap that follows), so a generated line is always
+    # ``start_row + extra_lines``.  Columns only drift after a rewritten
+    # keyword or on rows the quote pre-pass touched, so segments are only
+    # recorded at row starts, after rewritten keywords and on shifted rows.
+    # Pairs are deltas: row starts against (map_line, map_src_line), other
+    # segments against (seg_col, seg_src_col).
+    add_segment = smap.pairs.extend if smap is not None else None
+    shift_lines = shifts.lines if shifts is not None else {}
+    extra_lines = 0
+    line_shift = 0
+    map_line = map_src_line = 1
+    seg_col = seg_src_col = 0
+    row_cols = None
+    if add_segment is not None:
+        add_segment((-1, 1))
+        row_cols = shift_lines.get(1)
+
+    for tok in tokenize.generate_tokens(readline):
         tok_type, tok_string, tok_start, tok_end, _ = tok
         start_row, start_col = tok_start
 
         # Preserve whitespace / newlines between tokens
         if start_row > prev_row:
+            if add_segment is not None:
+                if result_parts[-1] == "\n":
+                    extra_lines += 1
+                add_segment((map_line - start_row - extra_lines, start_row - map_src_line))
+                map_line, map_src_line = start_row + extra_lines, start_row
+                line_shift = seg_col = seg_src_col = 0
+                row_cols = shift_lines.get(start_row)
+            if len(result_parts) >= _FLUSH_PARTS:
+                yield "".join(result_parts)
+                result_parts.clear()
             # Add newlines
             result_parts.append("\n" * (start_row - prev_row))
             # Indent to start_col
@@ -52,17 +107,39 @@ def _rewrite_tokens(source: str) -> str:
             # Same row, fill gap with spaces
             result_parts.append(" " * (start_col - prev_col))
 
+        if row_cols is not None:
+            gen_col, src_col = start_col + line_shift, shifted_col(row_cols, start_col)
+            add_segment((gen_col - seg_col, src_col - seg_src_col))
+            seg_col, seg_src_col = gen_col, src_col
+
         # Rewrite NAME tokens that are in our map
         if tok_type == tokenize.NAME and tok_string in FULL_MAP:
-            result_parts.append(FULL_MAP[tok_string])
+            text = FULL_MAP[tok_string]
+            result_parts.append(text)
+            if add_segment is not None:
+                # Everything after the keyword shifts by the length change
+                end_col = start_col + len(tok_string)
+                line_shift += len(text) - len(tok_string)
+                gen_col = end_col + line_shift
+                src_col = end_col if row_cols is None else shifted_col(row_cols, end_col)
+                add_segment((gen_col - seg_col, src_col - seg_src_col))
+                seg_col, seg_src_col = gen_col, src_col
         elif tok_type == tokenize.ENDMARKER:
             pass  # skip end marker
         else:
             result_parts.append(tok_string)
+            if add_segment is not None and tok_end[0] != start_row:
+                # Multi-line strings: every inner line starts at column 0
+                rows = tok_end[0] - start_row
+                add_segment((-1, 1) * rows)
+                map_line += rows
+                map_src_line += rows
+                line_shift = seg_col = seg_src_col = 0
+                row_cols = shift_lines.get(tok_end[0])
 
         prev_row, prev_col = tok_end
 
-    return "".join(result_parts)
+    yield "".join(result_parts)
 
 
 # ---------------------------------------------------------------------------
@@ -93,7 +170,7 @@ _QUOTE_RE = _build_quote_pattern()
 _ALL_QUOTES = {**QUOTE_PREFIXES, **QUOTE_MAP}
 
 
-def _apply_quote_prepass(source: str) -> str:
+def _apply_quote_prepass(source: str, shifts: ColumnShifts | None = None) -> str:
     """Replace anfuehrungszeichen (and variants) with actual quote characters.
 
     Handles matched pairs: opening word becomes the opening quote, closing word
@@ -109,70 +186,277 @@ def _apply_quote_prepass(source: str) -> str:
     becomes ``x = "a" + 1`` (space before " and after " are kept).
 
     Lines starting with # (comments) are skipped entirely.
+
+    When *shifts* is given, the column breakpoints of every replacement are
+    recorded so positions can be mapped back to *source*.
     """
-    lines = source.split("\n")
-    result_lines: list[str] = []
+    return "\n".join(
+        _prepass_line(line, lineno, shifts) for lineno, line in enumerate(source.split("\n"), start=1)
+    )
 
-    for line in lines:
-        stripped = line.lstrip()
-        if stripped.startswith("#"):
-            result_lines.append(line)
-            continue
 
-        open_stack: list[str] = []
+def _prepass_line(line: str, lineno: int, shifts: ColumnShifts | None = None) -> str:
+    """Apply the quote pre-pass to a single line (without its newline).
+
+    Quote pairs never span lines, so the pre-pass is line-local and can run
+    over a stream.
+    """
+    stripped = line.lstrip()
+    if stripped.startswith("#"):
+        return line
+
+    open_stack: list[str] = []
+    delta = [0]  # output-minus-source column shift so far on this line
 
-        def replacer(match: re.Match[str]) -> str:
-            leading = match.group(1)  # space before the word
-            word = match.group(2)  # the quote word
-            trailing = match.group(3)  # space after the word
+    def replacer(match: re.Match[str]) -> str:
+        leading = match.group(1)  # space before the word
+        word = match.group(2)  # the quote word
+        trailing = match.group(3)  # space after the word
 
-            if open_stack:
-                # Closing quote: drop leading space (inside string), keep trailing
-                return open_stack.pop() + trailing
+        if open_stack:
+            # Closing quote: drop leading space (inside string), keep trailing
+            replacement = open_stack.pop() + trailing
+        else:
+            # Opening quote: keep leading space (syntactic), drop trailing
+            if word in QUOTE_PREFIXES:
+                prefix_quote = QUOTE_PREFIXES[word]
+                open_stack.append(prefix_quote[-1])
+                replacement = leading + prefix_quote
             else:
-                # Opening quote: keep leading space (syntactic), drop trailing
-                if word in QUOTE_PREFIXES:
-                    prefix_quote = QUOTE_PREFIXES[word]
-                    open_stack.append(prefix_quote[-1])
-                    return leading + prefix_quote
-                else:
-                    quote_char = QUOTE_MAP[word]
-                    open_stack.append(quote_char)
-                    return leading + quote_char
+                quote_char = QUOTE_MAP[word]
+                open_stack.append(quote_char)
+                replacement = leading + quote_char
 
-        line = _QUOTE_RE.sub(replacer, line)
-        result_lines.append(line)
+        if shifts is not None:
+            out_end = match.start() + delta[0] + len(replacement)
+            shifts.add(lineno, out_end, match.end())
+            delta[0] = out_end - match.end()
+        return replacement
 
-    return "\n".join(result_lines)
+    return _QUOTE_RE.sub(replacer, line)
 
 
-def transpile(source: str) -> str:
+@overload
+def transpile(source: str, *, source_map: Literal[False] = ...) -> str: ...
+
+
+@overload
+def transpile(source: str, *, source_map: Literal[True]) -> tuple[str, SourceMap]: ...
+
+
+def transpile(source: str, *, source_map: bool = False) -> str | tuple[str, SourceMap]:
     """Transpile a Schlange source string to valid Python.
 
     Runs the anfuehrungszeichen pre-pass first, then token-based rewriting.
 
     Args:
         source: The Schlange (.schl.py) source code.
+        source_map: Also build a :class:`~schlange.sourcemap.SourceMap` from
+            generated positions back to *source*.
 
     Returns:
-        Valid Python source code.
+        Valid Python source code, or ``(python_source, source_map)`` when
+        *source_map* is true.
 
     Raises:
         tokenize.TokenError: If the source has unterminated strings / brackets.
     """
-    source = _apply_quote_prepass(source)
-    return _rewrite_tokens(source)
+    if not source_map:
+        source = _apply_quote_prepass(source)
+        return _rewrite_tokens(source)
+
+    shifts = ColumnShifts()
+    smap = SourceMap()
+    source = _apply_quote_prepass(source, shifts)
+    python_source = _rewrite_tokens(source, smap, shifts)
+    smap.gen_lines = python_source.count("\n") + 1
+    smap.pack()
+    return python_source, smap
+
+
+@overload
+def transpile_file(path: str, *, source_map: Literal[False] = ...) -> str: ...
+
 
+@overload
+def transpile_file(path: str, *, source_map: Literal[True]) -> tuple[str, SourceMap]: ...
 
-def transpile_file(path: str) -> str:
+
+def transpile_file(path: str, *, source_map: bool = False) -> str | tuple[str, SourceMap]:
     """Read a file, transpile it, and return the Python source.
 
+    Without a source map the file is streamed through ``mmap`` (see
+    :func:`transpile_file_stream`), so only the output is held in full.
+
     Args:
         path: Path to a ``.schl.py`` file.
+        source_map: Also return the source map (see :func:`transpile`).
 
     Returns:
-        The transpiled Python source code string.
+        The transpiled Python source code string, or ``(python_source, source_map)``.
     """
+    if not source_map:
+        return "".join(transpile_file_stream(path))
     with open(path, encoding="utf-8") as fh:
         source = fh.read()
-    return transpile(source)
+    return transpile(source, source_map=True)
+
+
+# ---------------------------------------------------------------------------
+# Streaming API
+# ---------------------------------------------------------------------------
+
+
+def transpile_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Transpile Schlange source given line by line, yielding Python chunks.
+
+    Each line must keep its trailing ``"\n"`` (as ``readline`` returns it).
+    The concatenated chunks equal ``transpile("".join(lines))``, but only the
+    current logical line and one output chunk are held in memory.
+    """
+
+    def prepassed() -> Iterator[str]:
+        for lineno, line in enumerate(lines, start=1):
+            if line.endswith("\n"):
+                yield _prepass_line(line[:-1], lineno) + "\n"
+            else:
+                yield _prepass_line(line, lineno)
+
+    return _iter_rewritten(prepassed().__next__)
+
+
+# Consumed mmap pages are released in steps of this many bytes.
+_MMAP_RELEASE_BYTES = 8 * 1024 * 1024
+
+
+def _iter_mmap_lines(path: str) -> Iterator[str]:
+    """Yield the decoded lines of *path*, reading through ``mmap``.
+
+    Only one line is decoded at a time; ``\r\n`` and lone ``\r`` end lines
+    and become ``\n``, like text-mode ``open()``'s universal newlines.  Pages
+    already consumed are dropped from the mapping (where ``madvise`` is
+    available) so resident memory does not grow with the file.
+    """
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return  # mmap cannot map empty files
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            can_release = hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            released = 0
+            for raw in iter(mm.readline, b""):
+                if b"\r" in raw:
+                    # readline only splits on \n, so a \r\n is always whole here
+                    *lines, last = raw.replace(b"\r\n", b"\n").replace(b"\r", b"\n").split(b"\n")
+                    for line in lines:
+                        yield line.decode("utf-8") + "\n"
+                    if last:
+                        yield last.decode("utf-8")
+                else:
+                    yield raw.decode("utf-8")
+                if can_release and mm.tell() - released >= _MMAP_RELEASE_BYTES:
+                    end = mm.tell() - mm.tell() % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+                    released = end
+
+
+def transpile_file_stream(path: str) -> Iterator[str]:
+    """Transpile a file without ever holding its full text in memory.
+
+    The file is memory-mapped and fed line by line into the streaming
+    transpiler; peak memory is bounded by the longest logical line rather
+    than the file size.  Use this for huge generated sources.
+
+    Yields:
+        Chunks of Python source whose concatenation equals ``transpile_file(path)``.
+    """
+    return transpile_lines(_iter_mmap_lines(path))
+
+
+# ---------------------------------------------------------------------------
+# Batch API
+# ---------------------------------------------------------------------------
+
+# Files below this size are grouped into shared tasks; larger files get one each.
+_SMALL_FILE_BYTES = 64 * 1024
+# Target payload per grouped task -- amortises process start-up and pickling.
+_BATCH_BYTES = 512 * 1024
+# Below this total the pool costs more than it saves; transpile inline.
+_INLINE_BYTES = 256 * 1024
+
+
+def _plan_batches(paths: list[str]) -> list[list[str]]:
+    """Group *paths* into worker tasks, largest work first.
+
+    Large files get a task of their own; small files are packed together
+    until a batch holds roughly ``_BATCH_BYTES``.
+    """
+    sized = []
+    for path in paths:
+        try:
+            sized.append((os.path.getsize(path), path))
+        except OSError:
+            sized.append((0, path))  # let the worker report the error
+    sized.sort(reverse=True)
+
+    batches: list[tuple[int, list[str]]] = []
+    current: list[str] = []
+    current_bytes = 0
+    for size, path in sized:
+        if size >= _SMALL_FILE_BYTES:
+            batches.append((size, [path]))
+            continue
+        current.append(path)
+        current_bytes += size
+        if current_bytes >= _BATCH_BYTES:
+            batches.append((current_bytes, current))
+            current, current_bytes = [], 0
+    if current:
+        batches.append((current_bytes, current))
+    return [batch for _, batch in batches]
+
+
+def _transpile_batch(paths: list[str]) -> list[tuple[str, str | Exception]]:
+    """Worker: transpile each file, capturing per-file errors."""
+    results: list[tuple[str, str | Exception]] = []
+    for path in paths:
+        try:
+            results.append((path, transpile_file(path)))
+        except (OSError, UnicodeDecodeError, SyntaxError, tokenize.TokenError) as exc:
+            results.append((path, exc))
+    return results
+
+
+def transpile_many(paths: Iterable[str], *, workers: int | None = None) -> Iterator[tuple[str, str | Exception]]:
+    """Transpile many files in parallel, yielding results as they complete.
+
+    Small files are grouped into shared tasks to cut inter-process
+    communication; large files get a worker each.  Tiny workloads are
+    transpiled inline.
+
+    Args:
+        paths: ``.schl.py`` files to transpile.
+        workers: Worker processes (default: CPU count, capped by task count).
+
+    Yields:
+        ``(path, python_source)`` on success or ``(path, exception)`` on
+        failure, in completion order -- not input order.
+    """
+    paths = list(paths)
+    batches = _plan_batches(paths)
+    total_bytes = sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+    workers = min(workers or os.cpu_count() or 1, len(batches))
+
+    if workers <= 1 or total_bytes < _INLINE_BYTES:
+        for batch in batches:
+            yield from _transpile_batch(batch)
+        return
+
+    # Imported here: multiprocessing is costly to load on every CLI start.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_transpile_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -63,3 +63,38 @@ class TestCLI:
         with open(out) as fh:
             content = fh.read()
         assert "print" in content
+
+    def test_emit_source_map(self, tmp_path) -> None:
+        from schlange.sourcemap import SourceMap
+
+        runner = CliRunner()
+        out = str(tmp_path / "output.py")
+        result = runner.invoke(main, ["emit", _example_path("hello.schl.py"), "-o", out, "--source-map"])
+        assert result.exit_code == 0
+        smap = SourceMap.load(out + ".schlmap")
+        with open(out) as fh:
+            assert len(smap) == len(fh.read().split("\n"))
+
+    def test_emit_source_map_requires_output(self) -> None:
+        runner = CliRunner()
+        result = runner.invoke(main, ["emit", _example_path("hello.schl.py"), "--source-map"])
+        assert result.exit_code != 0
+
+    def test_check_reports_schlange_lines(self, tmp_path) -> None:
+        (tmp_path / "gut.schl.py").write_text("verkuendet(1)\n", encoding="utf-8")
+        (tmp_path / "kaputt.schl.py").write_text("defn g():\n    gibzurueck 1\n\nverkuendet(g() +)\n", encoding="utf-8")
+        cache = str(tmp_path / "cache.json")
+        runner = CliRunner()
+        result = runner.invoke(main, ["check", str(tmp_path), "-j", "2", "--cache", cache])
+        assert result.exit_code == 1
+        assert "kaputt.schl.py:4:16: SyntaxError" in result.output
+        assert "gut.schl.py" not in result.output
+
+    def test_check_skips_verified_files(self, tmp_path) -> None:
+        (tmp_path / "gut.schl.py").write_text("verkuendet(1)\n", encoding="utf-8")
+        cache = str(tmp_path / "cache.json")
+        runner = CliRunner()
+        assert runner.invoke(main, ["check", str(tmp_path), "--cache", cache]).exit_code == 0
+        result = runner.invoke(main, ["check", str(tmp_path), "--cache", cache])
+        assert result.exit_code == 0
+        assert "1 cached" in result.output
@@ -0,0 +1,39 @@
+"""Tests for the coverage.py plugin."""
+
+from __future__ import annotations
+
+import pytest
+
+coverage = pytest.importorskip("coverage")
+
+from schlange.transpile import transpile_file  # noqa: E402
+
+SCRIPT = """# kommentar
+defn f(x):
+    sofern x > 1:
+        gibzurueck anfuehrungszeichen gross anfuehrungszeichen
+    sonst:
+        gibzurueck anfuehrungszeichen klein anfuehrungszeichen
+
+ergebnis = f(5)
+"""
+
+
+class TestCoveragePlugin:
+    """Executed lines are reported against the .schl.py source."""
+
+    def test_reports_schlange_lines(self, tmp_path) -> None:
+        script = tmp_path / "probe.schl.py"
+        script.write_text(SCRIPT, encoding="utf-8")
+
+        cov = coverage.Coverage(data_file=None, config_file=False)
+        cov.set_option("run:plugins", ["schlange.coverage_plugin"])
+        cov.start()
+        try:
+            exec(compile(transpile_file(str(script)), str(script), "exec"), {})
+        finally:
+            cov.stop()
+
+        _, statements, _, missing, _ = cov.analysis2(str(script))
+        assert statements == [2, 3, 4, 6, 8]
+        assert missing == [6]
@@ -0,0 +1,1020 @@
+"""Tests for the Spotify export parser."""
+
+from __future__ import annotations
+
+import csv
+import dataclasses
+import datetime as dt
+import io
+import json
+import os
+import pickle
+import sqlite3
+import zipfile
+
+import pytest
+
+from schlange.spotify import cache, table as table_module
+from schlange.spotify.analytics import (
+    category_breakdown,
+    completion_histogram,
+    completion_ratios,
+    platform_breakdown,
+    skip_rates,
+)
+from schlange.spotify.cube import DIMENSIONS, rank_cube
+from schlange.spotify.export import export_plays, export_rankings, write_json_array
+from schlange.spotify.filters import PlayFilter
+from schlange.spotify.merge import TrackTotals, UserExport, merge_exports, reduce_export, tree_merge
+from schlange.spotify import jsonstream
+from schlange.spotify.jsonstream import iter_json_array, iter_json_records
+from schlange.spotify.normalize import merge_variants, normalize_artist, normalize_title, variant_groups
+from schlange.spotify.parser import PlayRecord, export_csv, iter_export, load_export, print_stats, rank_tracks
+from schlange.spotify.scoring import ScoreWeights, score_tracks
+from schlange.spotify.sessions import Sessionizer, sessionize
+from schlange.spotify.sketch import SpaceSaving, rank_tracks_streaming
+from schlange.spotify.stats import HyperLogLog, ListeningStats, listening_stats
+from schlange.spotify.store import PlayStore
+from schlange.spotify.table import PlayTable
+
+
+def _extended(ts: str, track: str, artist: str, ms: int = 200_000, **extra) -> dict:
+    rec = {
+        "ts": ts,
+        "master_metadata_track_name": track,
+        "master_metadata_album_artist_name": artist,
+        "master_metadata_album_album_name": f"{artist} Album",
+        "spotify_track_uri": f"spotify:track:{track.replace(' ', '')}",
+        "ms_played": ms,
+    }
+    rec.update(extra)
+    return rec
+
+
+EXTENDED_0 = [
+    _extended("2020-01-01T10:00:00Z", "Song A", "Band X"),
+    _extended("2020-01-01T10:04:00Z", "Song B", "Band Y"),
+    _extended("2020-01-02T08:00:00Z", "Song A", "Band X", ms=5_000),  # skip
+    _extended("2020-01-02T09:00:00Z", "Song C", "Band X"),
+    {"ts": "2020-01-02T09:30:00Z", "episode_name": "Podcast", "ms_played": 900_000},
+]
+EXTENDED_1 = [
+    _extended("2021-03-05T20:00:00Z", "Song B", "Band Y", ms=100_000),
+    _extended("2021-03-05T20:05:00Z", "Song A", "Band X", ms=150_000),
+    _extended("2021-03-06T21:00:00Z", "Song B", "Band Y", ms=90_000),
+]
+BASIC = [
+    {"endTime": "2022-07-01 12:00", "artistName": "Band Z", "trackName": "Song D", "msPlayed": 180_000},
+    {"endTime": "2022-07-01 12:03", "artistName": "Band X", "trackName": "Song A", "msPlayed": 60_000},
+]
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    """A directory with two extended files, one basic file and a non-export JSON."""
+    for name, data in [
+        ("endsong_0.json", EXTENDED_0),
+        ("endsong_1.json", EXTENDED_1),
+        ("StreamingHistory0.json", BASIC),
+    ]:
+        (tmp_path / name).write_text(json.dumps(data), encoding="utf-8")
+    (tmp_path / "Userdata.json").write_text(json.dumps({"username": "hansie"}), encoding="utf-8")
+    return tmp_path
+
+
+@pytest.fixture
+def export_zip(export_dir, tmp_path):
+    """The export_dir files packed like Spotify ships them, plus a non-JSON member."""
+    archive = tmp_path / "my_spotify_data.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for f in sorted(export_dir.iterdir()):
+            zf.write(f, f"Spotify Extended Streaming History/{f.name}")
+        zf.writestr("Spotify Extended Streaming History/ReadMeFirst.pdf", b"%PDF")
+    return archive
+
+
+class TestJsonStream:
+    """The incremental reader matches json.load."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+    def test_matches_json_load(self, chunk_size: int) -> None:
+        data = EXTENDED_0 + [1, 2.5, -30, "x", None, [1, [2]], {"a": {"b": "]"}}]
+        text = json.dumps(data, indent=2)
+        assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == data
+
+    def test_empty_array(self) -> None:
+        assert list(iter_json_array(io.StringIO(" [ ] "))) == []
+
+    def test_non_array_yields_nothing(self) -> None:
+        assert list(iter_json_array(io.StringIO('{"a": 1}'))) == []
+
+    @pytest.mark.parametrize("text", ["[1, 2", "[1 2]", "[1,]", '[{"a": 1}'])
+    def test_malformed_raises(self, text: str) -> None:
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO(text), chunk_size=3))
+
+    def test_small_files_are_loaded_whole(self) -> None:
+        text = json.dumps(EXTENDED_0)
+        for size in (len(text), jsonstream.STREAM_THRESHOLD + 1, None):
+            assert list(iter_json_records(io.StringIO(text), size)) == EXTENDED_0
+        assert list(iter_json_records(io.StringIO('{"a": 1}'), 8)) == []
+
+
+class TestLoadExport:
+    """load_export parses every supported file in a directory."""
+
+    def test_loads_directory(self, export_dir) -> None:
+        plays = load_export(str(export_dir))
+        # Files load in sorted order: StreamingHistory0 (2 basic plays), then
+        # endsong_0 (3 plays >= 30s, podcast skipped) and endsong_1 (3 plays)
+        assert len(plays) == 2 + 3 + 3
+        assert [p.track_name for p in plays][:5] == ["Song D", "Song A", "Song A", "Song B", "Song C"]
+        assert plays[0].played_at == "2022-07-01 12:00"
+        assert plays[-1].played_at == "2021-03-06T21:00:00Z"
+
+    TIE_PLAYS = [
+        PlayRecord("", "B", "X", 10),
+        PlayRecord("", "A", "X", 10),
+        PlayRecord("", "A", "Y", 10, "spotify:track:ay"),
+        PlayRecord("", "A", "Y", 10, "", "Album"),
+        PlayRecord("", "B", "X", 10, "spotify:track:bx"),
+    ]
+
+    def test_rank_ties_keep_first_appearance(self) -> None:
+        plays = self.TIE_PLAYS
+        ranked = rank_tracks(plays)
+        assert [(t.track_name, t.artist_name, t.play_count) for t in ranked] == [
+            ("B", "X", 2), ("A", "Y", 2), ("A", "X", 1)
+        ]
+        assert (ranked[1].spotify_uri, ranked[1].album_name) == ("spotify:track:ay", "Album")
+        assert [t.rank for t in rank_tracks(plays, top_n=2)] == [1, 2]
+
+    def test_rank(self, export_dir) -> None:
+        ranked = rank_tracks(load_export(str(export_dir)))
+        assert [(t.track_name, t.play_count) for t in ranked[:2]] == [("Song A", 3), ("Song B", 3)]
+        assert ranked[0].spotify_uri == "spotify:track:SongA"
+
+    @pytest.mark.parametrize("workers", [2, None])
+    def test_workers_match_serial(self, export_dir, workers) -> None:
+        assert load_export(str(export_dir), workers=workers) == load_export(str(export_dir))
+
+
+class TestPlayTable:
+    """The columnar store round-trips records and merges tables."""
+
+    RECORDS = [
+        PlayRecord("2020-01-01T10:00:00Z", "Song A", "Band X", 200_000, "spotify:track:a", "Album"),
+        PlayRecord("2022-07-01 12:03", "Song B", "Band Y", 60_000),
+        PlayRecord("", "Song A", "Band X", 1),
+        PlayRecord("2020-02-30T10:00:00Z", "Song C", "Band X", 5),  # invalid date kept verbatim
+        PlayRecord("yesterday", "Song C", "Band X", 5),
+    ]
+
+    def test_round_trip(self) -> None:
+        table = PlayTable.from_records(self.RECORDS)
+        assert len(table) == 5
+        assert list(table) == self.RECORDS
+        assert table[-1] == self.RECORDS[-1]
+        assert table[1:3] == self.RECORDS[1:3]
+        assert table == self.RECORDS
+        with pytest.raises(IndexError):
+            table[5]
+
+    def test_strings_are_pooled(self) -> None:
+        table = PlayTable.from_records(self.RECORDS)
+        assert table.tracks.values == ["", "Song A", "Song B", "Song C"]
+        assert list(table.track) == [1, 2, 1, 3, 3]
+        assert list(table.key) == [0, 1, 0, 2, 2]
+        assert len(table.keys) == 3
+
+    def test_extend_merges_pools(self) -> None:
+        left = PlayTable.from_records(self.RECORDS[:2])
+        right = PlayTable.from_records(self.RECORDS[2:][::-1])
+        left.extend(right)
+        assert list(left) == self.RECORDS[:2] + self.RECORDS[2:][::-1]
+        assert list(left.key) == [0, 1, 2, 2, 0]
+
+    @pytest.mark.parametrize("batch", [2, 8192])
+    def test_add_rows_matches_add(self, batch, monkeypatch) -> None:
+        monkeypatch.setattr(table_module, "_BATCH_ROWS", batch)
+        records = self.RECORDS * 3
+        table = PlayTable()
+        table.add_rows(dataclasses.astuple(record) for record in records)
+        expected = PlayTable.from_records(records)
+        assert table == expected
+        assert list(table.key) == list(expected.key)
+        assert table.raw_ts.values == expected.raw_ts.values
+
+    def test_pickle(self) -> None:
+        table = PlayTable.from_records(self.RECORDS)
+        clone = pickle.loads(pickle.dumps(table))
+        assert clone == table
+        clone.add("2020-01-01T11:00:00Z", "Song D", "Band Z")
+        assert clone[-1].track_name == "Song D"
+
+    def test_bytes_round_trip(self) -> None:
+        table = PlayTable.from_records(self.RECORDS)
+        clone = PlayTable.from_buffer(table.to_bytes())
+        assert clone == table
+        assert list(clone.key) == list(table.key)
+        with pytest.raises(ValueError, match="Not a Schlange play table"):
+            PlayTable.from_buffer(b"x" * 16)
+
+    def test_date_range(self) -> None:
+        assert PlayTable.from_records(self.RECORDS[:2]).date_range() == ("2020-01-01", "2022-07-01")
+        assert PlayTable().date_range() is None
+
+
+class TestTimeIndex:
+    """Range queries and day counts go through the sorted time index."""
+
+    PLAYS = [
+        PlayRecord("2021-03-05T20:00:00Z", "Song B", "Band Y", 100_000),
+        PlayRecord("2020-01-01T10:00:00Z", "Song A", "Band X", 200_000, "spotify:track:a", "Album"),
+        PlayRecord("2020-01-01 23:59", "Song C", "Band X", 60_000),
+        PlayRecord("yesterday", "Song C", "Band X", 5),
+        PlayRecord("2020-01-02T00:00:00Z", "Song A", "Band X", 150_000),
+        PlayRecord("", "Song D", "Band Z", 1),
+    ]
+
+    def test_between(self) -> None:
+        table = PlayTable.from_records(self.PLAYS)
+        assert table.between("2020-01-01", "2020-01-02") == [self.PLAYS[1], self.PLAYS[2]]
+        assert table.between("2020-01-02") == [self.PLAYS[4], self.PLAYS[0]]
+        assert table.between(end="2020-01-01T10:00:00Z") == []
+        assert table.between(dt.date(2020, 1, 1), "2021") == [self.PLAYS[1], self.PLAYS[2], self.PLAYS[4]]
+        assert len(table.between()) == 4
+        assert rank_tracks(table.between("2020", "2021")) == rank_tracks(self.PLAYS[1:3] + self.PLAYS[4:5])
+
+    def test_by_day_and_date_range(self) -> None:
+        table = PlayTable.from_records(self.PLAYS)
+        assert table.by_day() == {"2020-01-01": 2, "2020-01-02": 1, "2021-03-05": 1}
+        assert table.date_range() == ("2020-01-01", "yesterday")
+        table.add("2019-12-31T08:00:00Z", "Song E", "Band Z", 1)
+        assert next(iter(table.by_day())) == "2019-12-31"
+        assert PlayTable().by_day() == {} and PlayTable().date_range() is None
+
+
+class TestRankEngines:
+    """The NumPy engine matches the pure-Python ranking exactly."""
+
+    def test_numpy_matches_python(self, export_dir) -> None:
+        pytest.importorskip("numpy")
+        plays = load_export(str(export_dir))
+        assert rank_tracks(plays, engine="numpy") == rank_tracks(plays)
+        assert rank_tracks(plays, top_n=2, engine="numpy") == rank_tracks(plays, top_n=2)
+
+    def test_numpy_ties_and_last_uri(self) -> None:
+        pytest.importorskip("numpy")
+        plays = TestLoadExport.TIE_PLAYS + [PlayRecord("", "C", "Z", 0)]
+        assert rank_tracks(plays, engine="numpy") == rank_tracks(plays)
+        assert rank_tracks([], engine="numpy") == []
+
+    def test_fallback_without_numpy(self, export_dir, monkeypatch) -> None:
+        monkeypatch.setattr("schlange.spotify.optional.numpy", lambda: None)
+        plays = load_export(str(export_dir))
+        assert rank_tracks(plays, engine="numpy") == rank_tracks(plays)
+
+    def test_unknown_engine(self) -> None:
+        with pytest.raises(ValueError, match="Unknown ranking engine"):
+            rank_tracks([], engine="polars")
+
+
+class TestStreamingRank:
+    """Space-Saving ranking is exact with enough counters and bounded otherwise."""
+
+    @staticmethod
+    def skewed_plays() -> list[PlayRecord]:
+        # Track i is played 200 // i times, interleaved round-robin
+        remaining = {i: 200 // i for i in range(1, 201)}
+        plays = []
+        while remaining:
+            for i in list(remaining):
+                plays.append(PlayRecord("", f"Song {i}", "Band", 1000 + i, f"spotify:track:{i}"))
+                remaining[i] -= 1
+                if not remaining[i]:
+                    del remaining[i]
+        return plays
+
+    def test_iter_export_matches_load(self, export_dir) -> None:
+        assert list(iter_export(str(export_dir))) == list(load_export(str(export_dir)))
+
+    def test_exact_with_enough_capacity(self, export_dir) -> None:
+        ranked = rank_tracks_streaming(iter_export(str(export_dir)), top_n=10)
+        assert ranked == rank_tracks(load_export(str(export_dir)), top_n=10)
+
+    def test_error_bounds(self) -> None:
+        plays = self.skewed_plays()
+        truth = {t.track_name: t.play_count for t in rank_tracks(plays, top_n=1000)}
+        ranked = rank_tracks_streaming(iter(plays), top_n=10, capacity=40)
+        for t in ranked:
+            assert t.play_count - t.count_error <= truth[t.track_name] <= t.play_count
+        # Every track above N / capacity plays must be reported
+        threshold = len(plays) / 40
+        heavy = {name for name, count in truth.items() if count > threshold}
+        assert heavy <= {t.track_name for t in rank_tracks_streaming(iter(plays), top_n=40, capacity=40)}
+
+    def test_second_pass_is_exact(self) -> None:
+        plays = self.skewed_plays()
+        ranked = rank_tracks_streaming(iter(plays), top_n=5, capacity=40, second_pass=iter(plays))
+        assert ranked == rank_tracks(plays, top_n=5)
+        assert all(t.count_error == 0 for t in ranked)
+
+    def test_capacity_is_bounded(self) -> None:
+        sketch = SpaceSaving(8)
+        for play in self.skewed_plays():
+            sketch.add(play)
+        assert len(sketch.counters) == 8
+        assert len(sketch._heap) == 8
+        with pytest.raises(ValueError):
+            SpaceSaving(0)
+
+
+class TestPlayStore:
+    """The SQLite store only re-parses changed files and ranks like rank_tracks."""
+
+    def test_sync_and_rank(self, export_dir, tmp_path) -> None:
+        with PlayStore(str(tmp_path / "out" / "store.sqlite")) as store:
+            report = store.sync(str(export_dir))
+            assert len(report.added) == 4 and not report.unchanged
+            assert store.rank() == rank_tracks(load_export(str(export_dir)))
+            assert store.play_count() == 8
+
+            again = store.sync(str(export_dir))
+            assert again.parsed == [] and len(again.unchanged) == 4
+
+    def test_added_changed_removed(self, export_dir, tmp_path) -> None:
+        with PlayStore(str(tmp_path / "store.sqlite")) as store:
+            store.sync(str(export_dir))
+
+            (export_dir / "endsong_2.json").write_text(json.dumps(EXTENDED_1[:1]), encoding="utf-8")
+            changed = export_dir / "endsong_0.json"
+            changed.write_text(json.dumps(EXTENDED_0[:2]), encoding="utf-8")
+            (export_dir / "StreamingHistory0.json").unlink()
+            report = store.sync(str(export_dir))
+
+            assert [os.path.basename(p) for p in report.added] == ["endsong_2.json"]
+            assert [os.path.basename(p) for p in report.changed] == ["endsong_0.json"]
+            assert [os.path.basename(p) for p in report.removed] == ["StreamingHistory0.json"]
+            assert store.rank() == rank_tracks(load_export(str(export_dir)))
+
+    def test_stats_match_load_export(self, export_dir, tmp_path) -> None:
+        with PlayStore(str(tmp_path / "store.sqlite")) as store:
+            store.sync(str(export_dir))
+            (export_dir / "StreamingHistory0.json").unlink()
+            store.sync(str(export_dir))
+            stats, expected = store.stats(), load_export(str(export_dir)).stats
+            for name in ("plays", "total_ms", "first_ts", "last_ts", "days", "unique_tracks", "unique_artists"):
+                assert getattr(stats, name) == getattr(expected, name), name
+
+    def test_many_new_tracks_are_interned(self, tmp_path) -> None:
+        # More pairs than one batched lookup holds
+        plays = [_extended("2024-01-01T00:00:00Z", f"Song {i}", f"Band {i % 7}") for i in range(1000)]
+        (tmp_path / "endsong_0.json").write_text(json.dumps(plays), encoding="utf-8")
+        with PlayStore(str(tmp_path / "store.sqlite")) as store:
+            store.sync(str(tmp_path))
+            ranked = store.rank(top_n=2000)
+            assert len(ranked) == 1000
+            assert ranked == rank_tracks(load_export(str(tmp_path)), top_n=2000)
+
+    def test_touched_file_is_not_reparsed(self, export_dir, tmp_path) -> None:
+        with PlayStore(str(tmp_path / "store.sqlite")) as store:
+            store.sync(str(export_dir))
+            target = export_dir / "endsong_1.json"
+            os.utime(target, ns=(1, 1))
+            report = store.sync(str(export_dir))
+            assert report.parsed == [] and len(report.unchanged) == 4
+
+    def test_old_schema_is_rebuilt(self, export_dir, tmp_path) -> None:
+        path = str(tmp_path / "store.sqlite")
+        db = sqlite3.connect(path)
+        db.executescript(
+            "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "INSERT INTO meta VALUES ('schema_version', '0');"
+            "CREATE TABLE tracks (id INTEGER PRIMARY KEY, track TEXT, artist TEXT, play_count INTEGER);"
+        )
+        db.close()
+        with PlayStore(path) as store:
+            assert len(store.sync(str(export_dir)).added) == 4
+            assert store.rank() == rank_tracks(load_export(str(export_dir)))
+
+
+class TestParseCache:
+    """Cached files are mapped instead of decoded, keyed by stat and filter."""
+
+    def test_second_load_skips_json(self, export_dir, tmp_path, monkeypatch) -> None:
+        cache_dir = str(tmp_path / "cache")
+        first = load_export(str(export_dir), cache_dir=cache_dir)
+        assert len(list((tmp_path / "cache").glob("*" + cache.CACHE_SUFFIX))) == 4
+
+        def no_json(*args, **kwargs):
+            raise AssertionError("JSON decoded despite cache")
+
+        monkeypatch.setattr("schlange.spotify.parser.iter_json_records", no_json)
+        assert load_export(str(export_dir), cache_dir=cache_dir) == first
+        assert load_export(str(export_dir), cache_dir=cache_dir, workers=2) == first
+
+    def test_key_covers_filter_and_mtime(self, export_dir) -> None:
+        path = str(export_dir / "endsong_0.json")
+        key = cache.cache_key(path, PlayFilter())
+        assert cache.cache_key(path, PlayFilter(min_ms=60000)) != key
+        assert cache.cache_key(path, PlayFilter(exclude_artists={"Band Y"})) != key
+        os.utime(path, ns=(1, 1))
+        assert cache.cache_key(path, PlayFilter()) != key
+
+    def test_min_ms_respected(self, export_dir, tmp_path) -> None:
+        cache_dir = str(tmp_path / "cache")
+        load_export(str(export_dir), cache_dir=cache_dir)
+        strict = load_export(str(export_dir), cache_dir=cache_dir, min_ms=120_000)
+        assert strict == load_export(str(export_dir), min_ms=120_000)
+        assert len(strict) < 8
+
+    def test_corrupt_entry_is_a_miss(self, export_dir, tmp_path) -> None:
+        cache_dir = str(tmp_path / "cache")
+        path = str(export_dir / "endsong_1.json")
+        os.makedirs(cache_dir)
+        with open(cache.cache_file(cache_dir, path, PlayFilter()), "wb") as fh:
+            fh.write(b"garbage")
+        assert cache.load_cached(cache_dir, path, PlayFilter()) is None
+        assert load_export(path, cache_dir=cache_dir) == load_export(path)
+        assert cache.load_cached(cache_dir, path, PlayFilter()) == load_export(path)
+
+    def test_changed_file_replaces_its_entries(self, export_dir, tmp_path) -> None:
+        cache_dir = tmp_path / "cache"
+        path = str(export_dir / "endsong_0.json")
+        load_export(str(export_dir), cache_dir=str(cache_dir))
+        load_export(path, cache_dir=str(cache_dir), min_ms=120_000)
+        assert len(list(cache_dir.glob("*" + cache.CACHE_SUFFIX))) == 5
+
+        os.utime(path, ns=(1, 1))
+        load_export(path, cache_dir=str(cache_dir))
+        assert len(list(cache_dir.glob("*" + cache.CACHE_SUFFIX))) == 4
+        assert cache.load_cached(str(cache_dir), path, PlayFilter()) == load_export(path)
+
+
+class TestZipExport:
+    """Export archives are read member by member without extracting."""
+
+    def test_zip_matches_directory(self, export_dir, export_zip) -> None:
+        before = sorted(export_zip.parent.rglob("*"))
+        assert load_export(str(export_zip)) == load_export(str(export_dir))
+        assert load_export(str(export_zip), workers=2) == load_export(str(export_dir))
+        assert list(iter_export(str(export_zip))) == list(load_export(str(export_dir)))
+        assert sorted(export_zip.parent.rglob("*")) == before
+
+    def test_zip_with_cache_and_store(self, export_dir, export_zip, tmp_path) -> None:
+        cache_dir = str(tmp_path / "cache")
+        first = load_export(str(export_zip), cache_dir=cache_dir)
+        assert load_export(str(export_zip), cache_dir=cache_dir) == first
+        with PlayStore(str(tmp_path / "store.sqlite")) as store:
+            assert len(store.sync(str(export_zip)).added) == 4
+            assert store.sync(str(export_zip)).parsed == []
+            assert store.rank() == rank_tracks(first)
+
+
+class TestPlayFilter:
+    """Filters pushed into the parser match filtering the loaded plays."""
+
+    RECORDS = [
+        _extended("2020-05-01T10:00:00Z", "Song A", "Band X", platform="Android OS 10", skipped=False, shuffle=True),
+        _extended("2020-05-02T10:00:00Z", "Song B", "Band Y", platform="Windows 10", skipped=True, shuffle=False),
+        _extended("2021-01-01T00:00:00Z", "Song C", "Band X", platform="iOS 14", skipped=None, shuffle=False),
+        _extended("2021-06-01T12:00:00Z", "Song A", "Band X", ms=40_000, platform="android", shuffle=True),
+    ]
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        f = tmp_path / "endsong_0.json"
+        f.write_text(json.dumps(self.RECORDS), encoding="utf-8")
+        return str(f)
+
+    def _tracks(self, path: str, where: PlayFilter) -> list[tuple[str, str]]:
+        return [(p.played_at, p.track_name) for p in load_export(path, where=where)]
+
+    def test_default_keeps_everything_above_min_ms(self, path) -> None:
+        assert PlayFilter().matcher() is None
+        assert len(load_export(path, where=PlayFilter())) == 4
+        assert len(load_export(path, where=PlayFilter(min_ms=60_000))) == 3
+        assert len(load_export(path, min_ms=60_000, where=PlayFilter(min_ms=0))) == 3
+
+    def test_time_range(self, path) -> None:
+        assert self._tracks(path, PlayFilter(since="2021")) == [
+            ("2021-01-01T00:00:00Z", "Song C"),
+            ("2021-06-01T12:00:00Z", "Song A"),
+        ]
+        assert self._tracks(path, PlayFilter(since="2020-05-02", until="2021-01-01")) == [
+            ("2020-05-02T10:00:00Z", "Song B")
+        ]
+
+    def test_time_range_basic_history(self, tmp_path) -> None:
+        basic = [
+            {"endTime": "2023-01-01 09:59", "artistName": "Band X", "trackName": "Early", "msPlayed": 60_000},
+            {"endTime": "2023-01-01 12:00", "artistName": "Band X", "trackName": "Noon", "msPlayed": 60_000},
+        ]
+        f = tmp_path / "StreamingHistory0.json"
+        f.write_text(json.dumps(basic), encoding="utf-8")
+        kept = load_export(str(f), where=PlayFilter(since="2023-01-01T10:00", until="2023-01-01T12:00:01Z"))
+        assert [p.track_name for p in kept] == ["Noon"]
+
+    def test_skipped_matches_column(self, tmp_path) -> None:
+        records = self.RECORDS + [_extended("2021-07-01T00:00:00Z", "Song D", "Band Y", reason_end="fwdbtn")]
+        f = tmp_path / "endsong_0.json"
+        f.write_text(json.dumps(records), encoding="utf-8")
+        skipped = load_export(str(f), where=PlayFilter(skipped=True))
+        assert [p.track_name for p in skipped] == ["Song B", "Song D"]
+        assert all(p.skipped for p in skipped)
+        assert not any(p.skipped for p in load_export(str(f), where=PlayFilter(skipped=False)))
+
+    def test_artists(self, path) -> None:
+        assert {p.artist_name for p in load_export(path, where=PlayFilter(artists="Band Y"))} == {"Band Y"}
+        kept = load_export(path, where=PlayFilter(exclude_artists=["Band Y"]))
+        assert len(kept) == 3 and "Band Y" not in {p.artist_name for p in kept}
+
+    def test_platform_skipped_shuffle(self, path) -> None:
+        assert len(load_export(path, where=PlayFilter(platforms={"ANDROID", "ios"}))) == 3
+        unskipped = load_export(path, where=PlayFilter(skipped=False))
+        assert [p.track_name for p in unskipped] == ["Song A", "Song C", "Song A"]
+        assert [p.track_name for p in load_export(path, where=PlayFilter(skipped=True))] == ["Song B"]
+        assert len(load_export(path, where=PlayFilter(shuffle=True, platforms={"android"}))) == 2
+
+    def test_basic_history_and_streaming(self, export_dir) -> None:
+        where = PlayFilter(since="2021", exclude_artists={"Band Y"})
+        plays = load_export(str(export_dir), where=where)
+        assert [(p.track_name, p.artist_name) for p in plays] == [
+            ("Song D", "Band Z"),
+            ("Song A", "Band X"),
+            ("Song A", "Band X"),
+        ]
+        assert list(iter_export(str(export_dir), where=where)) == list(plays)
+
+    def test_store_restarts_on_new_filter(self, export_dir, tmp_path) -> None:
+        with PlayStore(str(tmp_path / "store.sqlite")) as store:
+            store.sync(str(export_dir))
+            where = PlayFilter(exclude_artists={"Band X"})
+            assert len(store.sync(str(export_dir), where=where).added) == 4
+            assert store.rank() == rank_tracks(load_export(str(export_dir), where=where))
+            assert store.sync(str(export_dir), where=where).parsed == []
+
+
+class TestRankCube:
+    """One pass over the table ranks each bucket like rank_tracks on its plays."""
+
+    BUCKETS = {
+        "year": lambda p: p.played_at[:4],
+        "month": lambda p: p.played_at[:7],
+        "weekday": lambda p: dt.date.fromisoformat(p.played_at[:10]).weekday(),
+        "hour": lambda p: int(p.played_at[11:13]),
+        "artist": lambda p: p.artist_name,
+        "album": lambda p: p.album_name or None,
+    }
+
+    def test_matches_rank_tracks_per_bucket(self, export_dir) -> None:
+        plays = load_export(str(export_dir))
+        cube = rank_cube(plays, top_n=2)
+        assert list(cube) == list(DIMENSIONS)
+        for dim, bucket_of in self.BUCKETS.items():
+            expected: dict = {}
+            for play in plays:
+                if bucket_of(play) is not None:
+                    expected.setdefault(bucket_of(play), []).append(play)
+            assert list(cube[dim]) == sorted(expected)
+            for bucket, bucket_plays in expected.items():
+                assert cube[dim][bucket] == rank_tracks(bucket_plays, top_n=2), (dim, bucket)
+
+    def test_selected_dimensions(self, export_dir) -> None:
+        cube = rank_cube(load_export(str(export_dir)), dimensions=["year"])
+        assert list(cube) == ["year"]
+        assert list(cube["year"]) == ["2020", "2021", "2022"]
+        assert [t.track_name for t in cube["year"]["2021"]] == ["Song B", "Song A"]
+        with pytest.raises(ValueError, match="decade"):
+            rank_cube([], dimensions=["decade"])
+
+
+class TestListeningStats:
+    """Stats gathered while parsing match a scan of the loaded table."""
+
+    @staticmethod
+    def _summary(stats: ListeningStats) -> tuple:
+        return stats.plays, stats.total_ms, stats.unique_tracks, stats.unique_artists, stats.date_range()
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_filled_while_parsing(self, export_dir, workers) -> None:
+        plays = load_export(str(export_dir), workers=workers)
+        assert plays.stats is not None and plays.stats.plays == len(plays)
+        assert self._summary(listening_stats(plays)) == self._summary(ListeningStats.from_table(plays))
+        assert self._summary(plays.stats) == (8, 1_180_000, 4, 3, ("2020-01-01", "2022-07-01"))
+
+    def test_cached_and_grown_tables_recompute(self, export_dir, tmp_path) -> None:
+        cache_dir = str(tmp_path / "cache")
+        load_export(str(export_dir), cache_dir=cache_dir)
+        cached = load_export(str(export_dir), cache_dir=cache_dir)
+        assert self._summary(listening_stats(cached)) == self._summary(listening_stats(load_export(str(export_dir))))
+        cached.add("2023-01-01T00:00:00Z", "Song E", "Band Q", 1000)
+        assert self._summary(listening_stats(cached))[2:] == (5, 4, ("2020-01-01", "2023-01-01"))
+
+    def test_stored_in_cache(self, export_dir, tmp_path) -> None:
+        cache_dir = str(tmp_path / "cache")
+        fresh = load_export(str(export_dir), cache_dir=cache_dir)
+        cached = load_export(str(export_dir), cache_dir=cache_dir)
+        assert cached.stats is not None and self._summary(cached.stats) == self._summary(fresh.stats)
+        assert cached.stats.active_days == len(cached.by_day())
+
+    def test_hll_through_load_export(self, export_dir) -> None:
+        plays = load_export(str(export_dir), distinct="hll")
+        assert plays.stats.distinct == "hll"
+        assert self._summary(plays.stats) == (8, 1_180_000, 4, 3, ("2020-01-01", "2022-07-01"))
+
+    def test_hyperloglog(self) -> None:
+        stats = ListeningStats(distinct="hll")
+        for i in range(20_000):
+            stats.add("2020-01-01T00:00:00Z", f"Song {i}", f"Band {i % 500}", 1)
+        assert abs(stats.unique_tracks - 20_000) < 20_000 * 0.03
+        assert abs(stats.unique_artists - 500) < 500 * 0.03
+        other = HyperLogLog()
+        other.add("Band 0")
+        other.add("Band X")
+        stats.artists.update(other)
+        assert abs(stats.unique_artists - 501) < 501 * 0.03
+        with pytest.raises(ValueError):
+            stats.update(ListeningStats())
+
+    def test_print_stats_formats(self, export_dir, capsys) -> None:
+        plays = load_export(str(export_dir))
+        print_stats(plays, rank_tracks(plays))
+        out = capsys.readouterr().out
+        assert "Unique tracks:         4" in out and "2020-01-01 to 2022-07-01" in out
+
+
+class TestMergeVariants:
+    """Variant titles of one song are ranked as one track."""
+
+    PLAYS = [
+        PlayRecord("2020-01-01T10:00:00Z", "Here Comes the Sun - Remastered 2009", "The Beatles", 100),
+        PlayRecord("2020-01-01T10:05:00Z", "Here Comes The Sun", "Beatles", 100),
+        PlayRecord("2020-01-01T10:10:00Z", "Here Comes the Sun - Remastered 2009", "The Beatles", 100),
+        PlayRecord("2020-01-01T10:15:00Z", "Déjà Vu (feat. Someone)", "Band X", 100),
+        PlayRecord("2020-01-01T10:20:00Z", "Deja Vu - Radio Edit", "Band X", 100),
+        PlayRecord("2020-01-01T10:25:00Z", "Deja Vu - Live", "Band X", 100),
+        PlayRecord("2020-01-01T10:30:00Z", "Symphony No. 5", "Orchestra", 100),
+        PlayRecord("2020-01-01T10:35:00Z", "Symphony No. 6", "Orchestra", 100),
+        PlayRecord("2020-01-01T10:40:00Z", "Yesterdayy", "The Beatles", 100),
+        PlayRecord("2020-01-01T10:45:00Z", "Yesterday", "The Beatles", 100, "spotify:track:y"),
+        PlayRecord("2020-01-01T10:50:00Z", "Yesterday (2009 Mix)", "The Beatles", 100, "spotify:track:y"),
+    ]
+
+    def test_normalisers(self) -> None:
+        assert normalize_title("Here Comes the Sun - Remastered 2009") == "here comes the sun"
+        assert normalize_title("Déjà Vu (feat. Someone)") == normalize_title("Deja Vu - Radio Edit") == "deja vu"
+        assert normalize_title("Deja Vu - Live") == "deja vu live"
+        assert normalize_artist("The Beatles") == normalize_artist("beatles")
+
+    def test_merges_variants_only(self) -> None:
+        merged = merge_variants(self.PLAYS)
+        ranked = rank_tracks(merged)
+        assert [(t.track_name, t.play_count) for t in ranked] == [
+            ("Here Comes the Sun - Remastered 2009", 2 + 1),
+            ("Yesterdayy", 3),
+            ("Déjà Vu (feat. Someone)", 2),
+            ("Deja Vu - Live", 1),
+            ("Symphony No. 5", 1),
+            ("Symphony No. 6", 1),
+        ]
+        assert len(merged) == len(self.PLAYS)
+        assert [p.played_at for p in merged] == [p.played_at for p in self.PLAYS]
+
+    def test_canonical_is_most_played(self) -> None:
+        table = PlayTable.from_records(self.PLAYS)
+        canonical = variant_groups(table)
+        assert canonical[table.key[1]] == table.key[0]
+        assert len(set(canonical)) == 6
+        assert merge_variants(table, threshold=1.0) != merge_variants(table)
+
+    def test_stats_count_merged_tracks(self) -> None:
+        table = PlayTable.from_records(self.PLAYS)
+        assert listening_stats(table).unique_tracks == len(table.keys)
+        merged = merge_variants(table)
+        assert merged.stats is not None and merged.stats.plays == len(merged)
+        assert listening_stats(merged).unique_tracks == len(merged.keys) == 6
+        assert listening_stats(merged).unique_artists == 3
+        assert list(merged) == list(merge_variants(self.PLAYS))
+
+
+class TestScoring:
+    """Composite scores rank tracks and are recorded in the CSV."""
+
+    PLAYS = [
+        PlayRecord("2020-01-01T10:00:00Z", "Old Hit", "Band X", 200_000),
+        PlayRecord("2020-01-02T10:00:00Z", "Old Hit", "Band X", 200_000),
+        PlayRecord("2020-01-03T10:00:00Z", "Old Hit", "Band X", 200_000),
+        PlayRecord("2023-01-01T10:00:00Z", "New Hit", "Band Y", 200_000),
+        PlayRecord("2023-01-02T10:00:00Z", "New Hit", "Band Y", 200_000),
+        PlayRecord("2023-01-03T10:00:00Z", "Skipped", "Band Z", 40_000, skipped=True),
+        PlayRecord("2023-01-04T10:00:00Z", "Skipped", "Band Z", 200_000),
+    ]
+
+    def test_components(self) -> None:
+        table = PlayTable.from_records(self.PLAYS)
+        only = {
+            "plays": ScoreWeights(1, 0, 0, 0, 0),
+            "skips": ScoreWeights(0, 0, 0, 1, 0),
+            "completion": ScoreWeights(0, 0, 0, 0, 1),
+        }
+        assert score_tracks(table, only["plays"]) == pytest.approx([1.0, 2 / 3, 2 / 3])
+        assert score_tracks(table, only["skips"]) == pytest.approx([0.0, 0.0, -0.5])
+        assert score_tracks(table, only["completion"]) == pytest.approx([1.0, 1.0, 0.6])
+        recency = score_tracks(table, ScoreWeights(0, 0, 1, 0, 0, half_life_days=30))
+        assert recency[1] > recency[2] * 0.9 and recency[0] < 0.01
+
+    def test_recency_can_outrank_play_count(self) -> None:
+        assert rank_tracks(self.PLAYS)[0].track_name == "Old Hit"
+        ranked = rank_tracks(self.PLAYS, score=ScoreWeights(recency=2.0, half_life_days=90))
+        assert [t.track_name for t in ranked] == ["New Hit", "Skipped", "Old Hit"]
+        assert ranked[0].score is not None and ranked[0].score > ranked[1].score > ranked[2].score
+
+    def test_numpy_engine_matches(self, export_dir) -> None:
+        pytest.importorskip("numpy")
+        plays = load_export(str(export_dir))
+        weights = ScoreWeights()
+        assert score_tracks(plays, weights, "numpy") == pytest.approx(score_tracks(plays, weights))
+        by_engine = [rank_tracks(plays, score=weights, engine=engine) for engine in ("python", "numpy")]
+        assert [t.track_name for t in by_engine[0]] == [t.track_name for t in by_engine[1]]
+
+    def test_csv_records_weights(self, tmp_path) -> None:
+        weights = ScoreWeights(hours=1.5)
+        path = tmp_path / "ranked.csv"
+        export_csv(rank_tracks(self.PLAYS, score=weights), str(path), score=weights)
+        with open(path, newline="", encoding="utf-8") as fh:
+            rows = list(csv.DictReader(fh))
+        assert json.loads(rows[0]["score_weights"])["hours"] == 1.5
+        assert float(rows[0]["score"]) >= float(rows[-1]["score"])
+        export_csv(rank_tracks(self.PLAYS), str(path))
+        with open(path, newline="", encoding="utf-8") as fh:
+            assert "score" not in next(csv.reader(fh))
+
+    def test_skip_flag_parsed(self, tmp_path) -> None:
+        records = [
+            _extended("2020-05-01T10:00:00Z", "Song A", "Band X", skipped=True),
+            _extended("2020-05-01T10:05:00Z", "Song A", "Band X", reason_end="fwdbtn"),
+            _extended("2020-05-01T10:10:00Z", "Song A", "Band X", skipped=None, reason_end="trackdone"),
+        ]
+        (tmp_path / "endsong_0.json").write_text(json.dumps(records), encoding="utf-8")
+        plays = load_export(str(tmp_path))
+        assert [p.skipped for p in plays] == [True, True, False]
+        assert PlayTable.from_buffer(plays.to_bytes()) == plays
+
+
+class TestSessions:
+    """Plays split into sessions at inactivity gaps, aggregated per session."""
+
+    PLAYS = [
+        # ts is when a play ended
+        PlayRecord("2020-01-01T10:03:00Z", "Song A", "Band X", 180_000),
+        PlayRecord("2020-01-01T10:06:00Z", "Song B", "Band Y", 180_000),
+        PlayRecord("2020-01-01T10:40:00Z", "Song C", "Band Y", 60_000),  # started 10:39, 33 min idle
+        PlayRecord("2020-01-01T10:45:00Z", "Song D", "Band X", 300_000),
+        PlayRecord("2020-01-01T10:50:00Z", "Song E", "Band X", 300_000),
+        PlayRecord("2020-01-01T09:00:00Z", "Song F", "Band Z", 120_000),  # stored out of order
+        PlayRecord("", "Song G", "Band Z", 1),
+    ]
+
+    def test_sessions(self) -> None:
+        sessions = sessionize(self.PLAYS, gap=30 * 60)
+        assert len(sessions) == 3
+        assert list(sessions.plays) == [1, 2, 3]
+        assert list(sessions.listened_ms) == [120_000, 360_000, 660_000]
+        assert sessions.session(1).start == "2020-01-01T10:00:00Z"
+        assert sessions.session(1).end == "2020-01-01T10:06:00Z"
+        assert [sessions.duration(i) for i in range(3)] == [120, 360, 660]
+        assert [sessions.session(i).top_artist for i in range(3)] == ["Band Z", "Band X", "Band X"]
+
+    def test_gap_and_ties(self) -> None:
+        assert len(sessionize(self.PLAYS, gap=60 * 60)) == 1  # exactly 60 min idle is no gap
+        assert list(sessionize(self.PLAYS, gap=45 * 60).plays) == [1, 5]
+        assert sessionize(self.PLAYS, gap=45 * 60).session(1).top_artist == "Band X"
+        one = sessionize(self.PLAYS[:2], gap=30 * 60)
+        assert one.session(0).top_artist == "Band X"  # 1:1 tie, heard first
+        assert len(sessionize([])) == 0
+
+    def test_streaming_input_must_be_ordered(self) -> None:
+        sessionizer = Sessionizer()
+        sessionizer.add(1000, 10_000, "Band X")
+        with pytest.raises(ValueError):
+            sessionizer.add(999, 10_000, "Band X")
+
+
+class TestAnalytics:
+    """Extended-history category columns and the analytics built on them."""
+
+    RECORDS = [
+        _extended("2020-01-01T10:00:00Z", "Song A", "Band X", platform="android", shuffle=True,
+                  reason_start="clickrow", reason_end="trackdone", offline=False),
+        _extended("2020-01-01T10:04:00Z", "Song B", "Band Y", ms=50_000, platform="ios", shuffle=False,
+                  reason_end="fwdbtn", skipped=True),
+        _extended("2020-01-01T10:08:00Z", "Song A", "Band X", ms=100_000, platform="android", reason_end="fwdbtn"),
+        _extended("2020-01-01T10:12:00Z", "Song B", "Band Y", ms=100_000, platform="android"),
+    ]
+
+    @pytest.fixture
+    def export(self, tmp_path):
+        (tmp_path / "endsong_0.json").write_text(json.dumps(self.RECORDS), encoding="utf-8")
+        return tmp_path
+
+    def test_categories_are_opt_in(self, export) -> None:
+        assert load_export(str(export)).categories is None
+        table = load_export(str(export), extras=True)
+        assert table == load_export(str(export))
+        columns = table.categories
+        assert columns["platform"].decode() == ["android", "ios", "android", "android"]
+        assert columns["shuffle"].decode() == ["true", "false", "", ""]
+        assert columns["reason_end"][1] == "fwdbtn"
+        assert columns["offline"][0] == "false"
+        assert columns["platform"].codes.itemsize == 2
+
+    def test_categories_survive_storage(self, export, tmp_path) -> None:
+        table = load_export(str(export), extras=True)
+        platform = table.categories["platform"].decode()
+        for copy in (PlayTable.from_buffer(table.to_bytes()), pickle.loads(pickle.dumps(table))):
+            assert copy.categories["platform"].decode() == platform
+        assert PlayTable.from_buffer(PlayTable().to_bytes()).categories is None
+        assert table.between("2020-01-01T10:04", "2020-01-01T10:10").categories["platform"].decode() == [
+            "ios",
+            "android",
+        ]
+
+        cache_dir = str(tmp_path / "cache")
+        load_export(str(export), cache_dir=cache_dir)
+        cached = load_export(str(export), cache_dir=cache_dir, extras=True)
+        assert cached.categories["platform"].decode() == platform
+
+    def test_extend_pads_missing_categories(self, export) -> None:
+        (export / "StreamingHistory0.json").write_text(json.dumps(BASIC), encoding="utf-8")
+        plain = load_export(str(export / "StreamingHistory0.json"), extras=True)
+        assert plain.categories["platform"].decode() == ["", ""]
+        table = PlayTable()
+        table.extend(load_export(str(export / "StreamingHistory0.json")))
+        table.extend(load_export(str(export / "endsong_0.json"), extras=True))
+        table.extend(load_export(str(export / "StreamingHistory0.json")))
+        assert table.categories["platform"].decode() == ["", "", "android", "ios", "android", "android", "", ""]
+
+    def test_codes_widen_past_65536_labels(self, export) -> None:
+        table = load_export(str(export), extras=True)
+        rows = [("", "Song A", "Band X", 1, "", "", False, ("", "", f"device {i}", "", "")) for i in range(1 << 16)]
+        table.add_rows(rows)
+        platform = table.categories["platform"]
+        assert platform.codes.itemsize == 4 and len(platform.labels) == (1 << 16) + 3
+        assert platform[-1] == "device 65535" and platform[0] == "android"
+        table.extend(load_export(str(export)))
+        assert table.categories["platform"][-1] == ""
+        for copy in (PlayTable.from_buffer(table.to_bytes()), pickle.loads(pickle.dumps(table))):
+            assert copy.categories["platform"].decode() == table.categories["platform"].decode()
+        assert table.take([len(table) - 5, 1]).categories["platform"].decode() == ["device 65535", "ios"]
+        assert ("android", 3, 400_000, 1) in platform_breakdown(table)
+
+    @pytest.mark.parametrize("engine", ["python", "numpy"])
+    def test_analytics(self, export, engine) -> None:
+        if engine == "numpy":
+            pytest.importorskip("numpy")
+        table = load_export(str(export), extras=True)
+        rates = skip_rates(table, engine=engine)
+        assert [(r.track_name, r.plays, r.skips) for r in rates] == [("Song A", 2, 1), ("Song B", 2, 1)]
+        assert rates[0].rate == 0.5
+        assert [(r.artist_name, r.skips) for r in skip_rates(table, by="artist", min_plays=2, engine=engine)] == [
+            ("Band X", 1),
+            ("Band Y", 1),
+        ]
+        assert completion_ratios(table, engine) == [1.0, 0.5, 0.5, 1.0]
+        assert completion_histogram(table, bins=4, engine=engine) == [0, 0, 2, 2]
+        assert platform_breakdown(table, engine) == [("android", 3, 400_000, 1), ("ios", 1, 50_000, 1)]
+        assert category_breakdown(table, "reason_end", engine)[0] == ("fwdbtn", 2, 150_000, 2)
+
+    def test_breakdown_needs_extras(self, export) -> None:
+        with pytest.raises(ValueError, match="extras=True"):
+            platform_breakdown(load_export(str(export)))
+        with pytest.raises(ValueError):
+            category_breakdown(load_export(str(export), extras=True), "country")
+        with pytest.raises(ValueError):
+            skip_rates([], by="album")
+
+
+class TestMergeExports:
+    """Per-user partial aggregates merged into one weighted, capped ranking."""
+
+    @pytest.fixture
+    def users(self, tmp_path):
+        heavy = [_extended(f"2020-01-01T{h:02d}:00:00Z", "Song A", "Band X") for h in range(10)]
+        heavy.append(_extended("2020-01-02T10:00:00Z", "Song B - Remastered 2011", "The Band Y"))
+        light = [
+            _extended("2021-01-01T10:00:00Z", "Song B", "Band Y", ms=100_000),
+            _extended("2021-01-01T11:00:00Z", "Song B", "Band Y", ms=100_000),
+            _extended("2021-01-01T12:00:00Z", "Song C", "Band Z"),
+        ]
+        paths = []
+        for name, data in [("heavy", heavy), ("light", light), ("basic", BASIC)]:
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "endsong_0.json").write_text(json.dumps(data), encoding="utf-8")
+            paths.append(str(tmp_path / name))
+        return paths
+
+    def test_plain_merge(self, users) -> None:
+        ranked = merge_exports(users).rank()
+        assert [(r.track_name, r.play_count, r.score) for r in ranked] == [
+            ("Song A", 11, 11.0),
+            ("Song B - Remastered 2011", 3, 3.0),
+            ("Song C", 1, 1.0),
+            ("Song D", 1, 1.0),
+        ]
+        totals = merge_exports(users)
+        assert list(totals.listeners) == [2, 2, 1, 1]
+        assert totals.total_ms[1] == 400_000
+        assert merge_exports(users, workers=3).rank() == ranked
+
+    def test_weights_and_caps(self, users) -> None:
+        heavy, light, basic = users
+        capped = merge_exports(users, cap=2).rank()
+        # Tied at 3 counted plays; total time (uncapped) breaks the tie
+        assert [(r.track_name, r.play_count) for r in capped[:2]] == [("Song A", 3), ("Song B - Remastered 2011", 3)]
+        weighted = merge_exports([UserExport(heavy, weight=0.1), light, basic]).rank()
+        assert [r.track_name for r in weighted[:2]] == ["Song B - Remastered 2011", "Song A"]
+        assert weighted[1].score == pytest.approx(2.0)
+        fair = merge_exports(users, equalize=True)
+        assert sum(fair.score) == pytest.approx(3.0)
+        assert merge_exports([UserExport(heavy, cap=1), light], cap=100).plays[0] == 1
+
+    def test_tree_merge_keeps_order(self, users) -> None:
+        parts = [reduce_export(UserExport(path)) for path in users * 3]
+        sequential = TrackTotals()
+        for part in [reduce_export(UserExport(path)) for path in users * 3]:
+            sequential.update(part)
+        merged = tree_merge(parts)
+        assert merged.names == sequential.names
+        assert list(merged.plays) == list(sequential.plays)
+        assert len(tree_merge([])) == 0
+
+    def test_first_uri_across_files_and_variants(self, tmp_path) -> None:
+        (tmp_path / "StreamingHistory0.json").write_text(json.dumps(BASIC[1:]), encoding="utf-8")
+        extended = [
+            _extended("2022-08-01T10:00:00Z", "Song A - Remastered", "Band X"),
+            _extended("2022-08-01T11:00:00Z", "Song A", "Band X"),
+        ]
+        (tmp_path / "endsong_0.json").write_text(json.dumps(extended), encoding="utf-8")
+        totals = reduce_export(UserExport(str(tmp_path)))
+        assert totals.names == [("Song A", "Band X", "spotify:track:SongA-Remastered", "Band X Album")]
+        assert list(totals.plays) == [3]
+
+
+class TestExporters:
+    """Chunked CSV/JSONL writers and the pyarrow-backed columnar formats."""
+
+    def test_text_formats_match(self, export_dir, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr("schlange.spotify.export.CHUNK_ROWS", 2)
+        ranked = rank_tracks(load_export(str(export_dir)))
+        export_rankings(ranked, str(tmp_path / "r.csv"))
+        export_rankings(ranked, str(tmp_path / "r.jsonl"))
+        with open(tmp_path / "r.csv", newline="", encoding="utf-8") as fh:
+            rows = list(csv.DictReader(fh))
+        with open(tmp_path / "r.jsonl", encoding="utf-8") as fh:
+            lines = [json.loads(line) for line in fh]
+        assert len(rows) == len(lines) == len(ranked)
+        assert [r["track_name"] for r in rows] == [line["track_name"] for line in lines]
+        assert lines[0]["play_count"] == ranked[0].play_count
+        with pytest.raises(ValueError):
+            export_rankings(ranked, str(tmp_path / "r.xml"))
+
+    def test_json_array_matches_json_dump(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr("schlange.spotify.export.CHUNK_ROWS", 2)
+        for items in ([], [{"a": 1}], [{"a": "ü", "b": [1, 2]}, {"c": None}, {"d": {"e": 1}}]):
+            write_json_array(str(tmp_path / "a.json"), iter(items))
+            assert (tmp_path / "a.json").read_text(encoding="utf-8") == json.dumps(items, indent=2, ensure_ascii=False)
+
+    def test_play_rows(self, export_dir, tmp_path) -> None:
+        table = load_export(str(export_dir), extras=True)
+        export_plays(table, str(tmp_path / "plays.jsonl"))
+        with open(tmp_path / "plays.jsonl", encoding="utf-8") as fh:
+            lines = [json.loads(line) for line in fh]
+        assert [line["played_at"] for line in lines] == [p.played_at for p in table]
+        assert lines[0]["platform"] == ""
+
+    def test_columnar(self, export_dir, tmp_path) -> None:
+        pq = pytest.importorskip("pyarrow.parquet")
+        import pyarrow as pa
+
+        table = load_export(str(export_dir), extras=True)
+        table.add("not a date", "Song Q", "Band Q", 40_000)
+        export_plays(table, str(tmp_path / "plays.parquet"))
+        export_plays(table, str(tmp_path / "plays.arrow"))
+        back = pq.read_table(tmp_path / "plays.parquet")
+        with pa.memory_map(str(tmp_path / "plays.arrow")) as source:
+            # Parquet stores second timestamps as milliseconds; the values agree
+            assert pa.ipc.open_file(source).read_all().to_pylist() == back.to_pylist()
+        assert back.column("track_name").to_pylist() == [p.track_name for p in table]
+        assert back.column("ms_played").to_pylist() == list(table.ms)
+        assert back.column("skipped").to_pylist() == [p.skipped for p in table]
+        stamps = back.column("played_at").to_pylist()
+        assert [int(stamp.timestamp()) for stamp in stamps[:-1]] == list(table.ts[:-1])
+        assert stamps[-1] is None
+
+        ranked = rank_tracks(table, score=ScoreWeights())
+        export_rankings(ranked, str(tmp_path / "r.parquet"), score=ScoreWeights())
+        ranks = pq.read_table(tmp_path / "r.parquet")
+        assert ranks.column("track_name").to_pylist() == [t.track_name for t in ranked]
+        assert ranks.column("score_weights").to_pylist()[0] == ScoreWeights().describe()
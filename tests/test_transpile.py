@@ -6,8 +6,11 @@ inside strings and comments remain untouched.
 
 from __future__ import annotations
 
+import tokenize
+
 import pytest
 
+from schlange.sourcemap import SourceMap
 from schlange.transpile import transpile
 
 
@@ -357,3 +360,151 @@ class TestAnfuehrungszeichen:
         ns: dict = {}
         exec(python_code, ns)
         assert ns["ergebnis"] == "Hallo Welt!"
+
+
+class TestSourceMap:
+    """Generated positions map back to the Schlange source."""
+
+    SOURCE = (
+        "defn f(x):\n"
+        "    verkuendet(anfuehrungszeichen Hallo anfuehrungszeichen, x)\n"
+        "    gibzurueck x\n"
+        "\n"
+        "y = f(1)\n"
+    )
+
+    def _position(self, python: str, needle: str, occurrence: int = 0) -> tuple[int, int]:
+        lines = python.split("\n")
+        hits = [(i, line.index(needle)) for i, line in enumerate(lines, start=1) if needle in line]
+        return hits[occurrence]
+
+    def test_output_unchanged(self) -> None:
+        python, _ = transpile(self.SOURCE, source_map=True)
+        assert python == transpile(self.SOURCE)
+
+    def test_covers_every_generated_line(self) -> None:
+        python, smap = transpile(self.SOURCE, source_map=True)
+        assert len(smap) == len(python.split("\n"))
+
+    def test_rewritten_keyword_shifts_columns(self) -> None:
+        python, smap = transpile(self.SOURCE, source_map=True)
+        line, col = self._position(python, "return x")
+        assert smap.lookup(line, col + len("return ")) == (3, len("    gibzurueck "))
+
+    def test_quote_prepass_columns(self) -> None:
+        python, smap = transpile(self.SOURCE, source_map=True)
+        line, col = self._position(python, ", x)")
+        src_line, src_col = smap.lookup(line, col)
+        assert src_line == 2
+        assert self.SOURCE.split("\n")[1][src_col:] == ", x)"
+
+    def test_line_table(self) -> None:
+        python, smap = transpile(self.SOURCE, source_map=True)
+        table = smap.line_table()
+        line, _ = self._position(python, "y = f(1)")
+        assert table[line] == 5
+
+    def test_multiline_string_lines(self) -> None:
+        source = 'x = """\nerste\nzweite"""\nverkuendet(x)\n'
+        python, smap = transpile(source, source_map=True)
+        line, _ = self._position(python, "zweite")
+        assert smap.lookup(line, 0) == (3, 0)
+        line, _ = self._position(python, "print(x)")
+        assert smap.lookup(line, 0) == (4, 0)
+
+    def test_bytes_roundtrip(self, tmp_path) -> None:
+        _, smap = transpile(self.SOURCE, source_map=True)
+        path = str(tmp_path / "m.schlmap")
+        smap.save(path)
+        assert SourceMap.load(path) == smap
+
+    def test_packed_map_answers_like_unpacked(self) -> None:
+        python, smap = transpile(self.SOURCE * 50, source_map=True)
+        unpacked = SourceMap(smap.pairs, smap.gen_lines)
+        assert len(smap.to_bytes()) < len(unpacked.pairs) * unpacked.pairs.itemsize
+        assert smap.line_table() == unpacked.line_table()
+        assert [smap.lookup(n, 3) for n in range(1, 40)] == [unpacked.lookup(n, 3) for n in range(1, 40)]
+        assert SourceMap.from_bytes(unpacked.to_bytes()) == smap
+
+    def test_rejects_foreign_bytes(self) -> None:
+        with pytest.raises(ValueError):
+            SourceMap.from_bytes(b"NOTAMAP!\x00\x00\x00\x00")
+
+
+class TestTranspileMany:
+    """Batch transpilation yields one result per input file."""
+
+    def test_results_and_errors(self, tmp_path) -> None:
+        from schlange.transpile import transpile_many
+
+        paths = []
+        for i in range(5):
+            path = tmp_path / f"s{i}.schl.py"
+            path.write_text(f"verkuendet({i})\n", encoding="utf-8")
+            paths.append(str(path))
+        broken = tmp_path / "kaputt.schl.py"
+        broken.write_text("x = (1,\n", encoding="utf-8")
+        paths.append(str(broken))
+
+        results = dict(transpile_many(paths, workers=2))
+        assert set(results) == set(paths)
+        assert results[paths[3]].startswith("print(3)")
+        assert isinstance(results[str(broken)], tokenize.TokenError)
+
+    def test_large_files_use_the_pool(self, tmp_path, monkeypatch) -> None:
+        from schlange import transpile as transpile_module
+
+        monkeypatch.setattr(transpile_module, "_INLINE_BYTES", 0)
+        monkeypatch.setattr(transpile_module, "_SMALL_FILE_BYTES", 10)
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"gross{i}.schl.py"
+            path.write_text("verkuendet(anfuehrungszeichen Hallo anfuehrungszeichen)\n" * 50, encoding="utf-8")
+            paths.append(str(path))
+        assert transpile_module._plan_batches(paths) == [[p] for p in sorted(paths, reverse=True)]
+        results = dict(transpile_module.transpile_many(paths, workers=2))
+        assert all(src.startswith('print("Hallo")') for src in results.values())
+
+
+class TestStreaming:
+    """Streaming transpilation matches the whole-string transpiler."""
+
+    SOURCE = (
+        "defn f(x):\n"
+        "    verkuendet(anfuehrungszeichen Hallo anfuehrungszeichen, x)\n"
+        '    doku = """\n'
+        "    defn bleibt\n"
+        '    """\n'
+        "    gibzurueck (x,\n"
+        "                x)\n"
+    )
+
+    def test_transpile_lines(self) -> None:
+        from schlange.transpile import transpile_lines
+
+        lines = self.SOURCE.splitlines(keepends=True)
+        assert "".join(transpile_lines(lines)) == transpile(self.SOURCE)
+
+    def test_file_stream_normalises_crlf(self, tmp_path) -> None:
+        from schlange.transpile import transpile_file_stream
+
+        path = tmp_path / "crlf.schl.py"
+        path.write_bytes(self.SOURCE.replace("\n", "\r\n").encode("utf-8"))
+        assert "".join(transpile_file_stream(str(path))) == transpile(self.SOURCE)
+
+    @pytest.mark.parametrize("newline", ["\r", "\r\n", "\n"])
+    def test_file_stream_universal_newlines(self, tmp_path, newline) -> None:
+        from schlange.transpile import transpile_file
+
+        path = tmp_path / "cr.schl.py"
+        path.write_bytes(self.SOURCE.replace("\n", newline).encode("utf-8"))
+        streamed = transpile_file(str(path))
+        assert streamed == transpile(self.SOURCE)
+        assert streamed == transpile_file(str(path), source_map=True)[0]
+
+    def test_empty_file(self, tmp_path) -> None:
+        from schlange.transpile import transpile_file
+
+        path = tmp_path / "leer.schl.py"
+        path.write_text("", encoding="utf-8")
+        assert transpile_file(str(path)) == ""
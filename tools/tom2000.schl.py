@@ -9,6 +9,13 @@
 #    schlange run tools/tom2000.schl.py
 #    schlange run tools/tom2000.schl.py --top 3000
 #    schlange run tools/tom2000.schl.py --min-ms 60000
+#    schlange run tools/tom2000.schl.py --input data/my_spotify_data.zip
+#    schlange run tools/tom2000.schl.py --workers 8
+#    schlange run tools/tom2000.schl.py --store   (nur neue Export-Dateien parsen)
+#    schlange run tools/tom2000.schl.py --since 2023-01-01 --exclude-artist "White Noise"
+#    schlange run tools/tom2000.schl.py --dedupe  (Remaster/feat./Radio-Edit-Varianten zusammenfassen)
+#    schlange run tools/tom2000.schl.py --score  (Composite Score statt Play Count)
+#    schlange run tools/tom2000.schl.py --format parquet  (csv, jsonl, parquet oder arrow)
 #
 # =============================================================================
 
@@ -16,10 +23,18 @@ importiert sys
 importiert os
 importiert json
 
-von schlange.spotify.parser importiert load_export, rank_tracks, export_csv, export_playlist_seed, print_stats
+von schlange.spotify importiert optional
+von schlange.spotify.cache importiert DEFAULT_CACHE_DIR
+von schlange.spotify.export importiert FORMATS, SUFFIXES, export_plays, export_rankings
+von schlange.spotify.filters importiert PlayFilter
+von schlange.spotify.normalize importiert merge_variants
+von schlange.spotify.parser importiert load_export, rank_tracks, export_playlist_seed, print_stats
+von schlange.spotify.scoring importiert ScoreWeights
+von schlange.spotify.store importiert PlayStore
 
 # --- Konfiguration ---
 DATEN_PFAD = "data/extracted/Spotify Extended Streaming History"
+DATEN_ZIP = "data/my_spotify_data.zip"  # wird direkt gelesen, ohne Entpacken
 AUSGABE_ORDNER = "out"
 TOP_N = 2000
 MIN_MS = 30000  # 30 Sekunden Minimum
@@ -45,6 +60,14 @@ defn parse_argumente():
     min_ms = MIN_MS
     daten_pfad = DATEN_PFAD
     ausgabe = AUSGABE_ORDNER
+    arbeiter = 1
+    mit_store = Falschlich
+    seit = Nichts
+    bis = Nichts
+    ohne_artisten = []
+    zusammenfassen = Falschlich
+    bewertung = Nichts  # Play Count; --score fuer den Composite Score
+    ausgabe_format = "csv"
 
     args = sys.argv[1:]
     i = 0
@@ -61,24 +84,67 @@ defn parse_argumente():
         sofernschier args[i] == "--out":
             ausgabe = args[i + 1]
             i = i + 2
+        sofernschier args[i] == "--workers":
+            arbeiter = ganzzahl(args[i + 1])
+            i = i + 2
+        sofernschier args[i] == "--store":
+            mit_store = Wahrlich
+            i = i + 1
+        sofernschier args[i] == "--since":
+            seit = args[i + 1]
+            i = i + 2
+        sofernschier args[i] == "--until":
+            bis = args[i + 1]
+            i = i + 2
+        sofernschier args[i] == "--exclude-artist":
+            ohne_artisten.append(args[i + 1])
+            i = i + 2
+        sofernschier args[i] == "--dedupe":
+            zusammenfassen = Wahrlich
+            i = i + 1
+        sofernschier args[i] == "--score":
+            bewertung = ScoreWeights()
+            i = i + 1
+        sofernschier args[i] == "--by-plays":
+            bewertung = Nichts
+            i = i + 1
+        sofernschier args[i] == "--format":
+            ausgabe_format = args[i + 1]
+            i = i + 2
         sonst:
             i = i + 1
 
-    gibzurueck top_n, min_ms, daten_pfad, ausgabe
+    auswahl = PlayFilter(min_ms=min_ms, since=seit, until=bis, exclude_artists=ohne_artisten)
+    gibzurueck top_n, auswahl, daten_pfad, ausgabe, arbeiter, mit_store, zusammenfassen, bewertung, ausgabe_format
 
 
-defn lade_und_filtere(daten_pfad, min_ms):
-    """Lade alle Wiedergaben und filtere nach Mindest-Spielzeit."""
+defn lade_und_filtere(daten_pfad, auswahl, arbeiter=1, cache_ordner=Nichts):
+    """Lade alle Wiedergaben und filtere schon beim Parsen."""
     verkuendet(f"Lade Spotify Extended Streaming History...")
     verkuendet(f"  Pfad: {daten_pfad}")
-    verkuendet(f"  Mindest-Spielzeit: {min_ms / 1000:.0f} Sekunden")
+    verkuendet(f"  Mindest-Spielzeit: {auswahl.min_ms / 1000:.0f} Sekunden")
+    sofern auswahl.since oder auswahl.until:
+        verkuendet(f"  Zeitraum: {auswahl.since} bis {auswahl.until}")
 
-    alle_wiedergaben = load_export(daten_pfad)
+    # Binaerer Parse-Cache: unveraenderte Dateien werden nicht erneut dekodiert
+    alle_wiedergaben = load_export(daten_pfad, workers=arbeiter, cache_dir=cache_ordner, where=auswahl)
     verkuendet(f"  {laenge(alle_wiedergaben):,} Wiedergaben geladen (nach Filter)")
 
     gibzurueck alle_wiedergaben
 
 
+defn rangliste_aus_store(daten_pfad, ausgabe, top_n, auswahl, arbeiter=1):
+    """Synchronisiere den SQLite-Store; liefert Rangliste und Statistiken aus den Aggregaten."""
+    store_pfad = os.path.join(ausgabe, "spotify_store.sqlite")
+    verkuendet(f"Synchronisiere Store: {store_pfad}")
+    mittels PlayStore(store_pfad) als store:
+        bericht = store.sync(daten_pfad, workers=arbeiter, where=auswahl)
+        verkuendet(f"  {laenge(bericht.added)} neu, {laenge(bericht.changed)} geaendert, "
+                   f"{laenge(bericht.removed)} entfernt, {laenge(bericht.unchanged)} unveraendert")
+        verkuendet(f"  {store.play_count():,} Wiedergaben im Store")
+        gibzurueck store.rank(top_n=top_n), store.stats()
+
+
 defn zeige_top_liste(rangliste, anzahl=25):
     """Zeige die Top N Tracks mit Formatierung."""
     verkuendet(f"\n{'=' * 70}")
@@ -117,17 +183,24 @@ defn zeige_genre_mix(rangliste):
         verkuendet(f"  {i:>2}. {artist:<30s} {plays:>4} {balken}")
 
 
-defn exportiere_alles(rangliste, ausgabe, top_n):
-    """Exportiere CSV, Playlist-Seed und Zusammenfassung."""
+defn exportiere_alles(rangliste, ausgabe, top_n, bewertung=Nichts, ausgabe_format="csv", wiedergaben=Nichts):
+    """Exportiere Rangliste (CSV/JSONL/Parquet/Arrow), Playlist-Seed und Zusammenfassung."""
     os.makedirs(ausgabe, exist_ok=Wahrlich)
 
-    csv_pfad = os.path.join(ausgabe, f"tom{top_n}_rangliste.csv")
+    endung = SUFFIXES[ausgabe_format]
+    ranglisten_pfad = os.path.join(ausgabe, f"tom{top_n}_rangliste{endung}")
     seed_pfad = os.path.join(ausgabe, f"tom{top_n}_playlist_seed.json")
     stats_pfad = os.path.join(ausgabe, f"tom{top_n}_zusammenfassung.txt")
 
-    # CSV
-    export_csv(rangliste, csv_pfad)
-    verkuendet(f"\n  CSV:           {csv_pfad}")
+    # Rangliste, gestreamt bzw. spaltenweise geschrieben
+    export_rankings(rangliste, ranglisten_pfad, ausgabe_format, score=bewertung)
+    verkuendet(f"\n  Rangliste:     {ranglisten_pfad}")
+
+    # Spaltenformate: alle Wiedergaben direkt aus der PlayTable dazu
+    sofern ausgabe_format inwendig ("parquet", "arrow") und wiedergaben ist nichten Nichts:
+        wiedergaben_pfad = os.path.join(ausgabe, f"tom{top_n}_wiedergaben{endung}")
+        export_plays(wiedergaben, wiedergaben_pfad, ausgabe_format)
+        verkuendet(f"  Wiedergaben:   {wiedergaben_pfad}")
 
     # Playlist Seed (mit Spotify URIs!)
     export_playlist_seed(rangliste, seed_pfad)
@@ -165,28 +238,63 @@ defn hauptprogramm():
     """Das Hauptprogramm -- Tom 2000 Pipeline."""
     banner()
 
-    top_n, min_ms, daten_pfad, ausgabe = parse_argumente()
+    top_n, auswahl, daten_pfad, ausgabe, arbeiter, mit_store, zusammenfassen, bewertung, ausgabe_format = (
+        parse_argumente()
+    )
 
-    # Pruefe ob Daten vorhanden
-    sofern nichten os.path.exists(daten_pfad):
-        verkuendet(f"FEHLER: Datenordner nicht gefunden: {daten_pfad}")
-        verkuendet("  Entpacke zuerst: unzip data/my_spotify_data.zip -d data/extracted/")
+    sofern ausgabe_format nichten inwendig FORMATS:
+        verkuendet(f"FEHLER: Unbekanntes Format: {ausgabe_format} (erlaubt: {', '.join(FORMATS)})")
         gibzurueck
-
-    # Lade und parse
-    wiedergaben = lade_und_filtere(daten_pfad, min_ms)
-
-    sofern laenge(wiedergaben) == 0:
-        verkuendet("Keine Wiedergaben gefunden!")
+    sofern ausgabe_format inwendig ("parquet", "arrow") und optional.pyarrow() ist Nichts:
+        verkuendet(f"FEHLER: --format {ausgabe_format} braucht pyarrow: pip install schlange[arrow]")
         gibzurueck
 
-    # Ranking
-    verkuendet(f"\nErstelle Tom {top_n} Rangliste...")
-    rangliste = rank_tracks(wiedergaben, top_n=top_n)
-    verkuendet(f"  {laenge(rangliste)} Tracks im finalen Ranking")
+    # Pruefe ob Daten vorhanden -- sonst das ZIP direkt lesen
+    sofern nichten os.path.exists(daten_pfad) und daten_pfad == DATEN_PFAD und os.path.exists(DATEN_ZIP):
+        daten_pfad = DATEN_ZIP
+    sofern nichten os.path.exists(daten_pfad):
+        verkuendet(f"FEHLER: Daten nicht gefunden: {daten_pfad}")
+        verkuendet(f"  Lege den Spotify-Export unter {DATEN_ZIP} ab (Entpacken ist nicht noetig)")
+        gibzurueck
 
-    # Statistiken
-    print_stats(wiedergaben, rangliste)
+    sofern mit_store:
+        # Inkrementell: nur neue oder geaenderte Dateien werden geparst
+        sofern zusammenfassen:
+            verkuendet("  Hinweis: --dedupe wirkt nicht zusammen mit --store")
+        # Der Store rankt nach Play Count
+        sofern bewertung ist nichten Nichts:
+            verkuendet("  Hinweis: --score wirkt nicht zusammen mit --store (Ranking nach Play Count)")
+        bewertung = Nichts
+        wiedergaben = Nichts
+        rangliste, statistik = rangliste_aus_store(daten_pfad, ausgabe, top_n, auswahl, arbeiter)
+        sofern laenge(rangliste) == 0:
+            verkuendet("Keine Wiedergaben gefunden!")
+            gibzurueck
+        verkuendet(f"  {laenge(rangliste)} Tracks im finalen Ranking")
+
+        # Statistiken, aus den pro Datei gespeicherten Summen
+        print_stats(statistik, rangliste)
+    sonst:
+        # Lade und parse (der Cache ist nach absolutem Pfad geschluesselt, also fuer alle --out gemeinsam)
+        wiedergaben = lade_und_filtere(daten_pfad, auswahl, arbeiter, DEFAULT_CACHE_DIR)
+
+        sofern laenge(wiedergaben) == 0:
+            verkuendet("Keine Wiedergaben gefunden!")
+            gibzurueck
+
+        # Varianten desselben Songs (Remaster, feat., Radio Edit) zusammenfassen
+        sofern zusammenfassen:
+            vorher = laenge(wiedergaben.keys)
+            wiedergaben = merge_variants(wiedergaben)
+            verkuendet(f"  {vorher - laenge(wiedergaben.keys):,} Titel-Varianten zusammengefasst")
+
+        # Ranking
+        verkuendet(f"\nErstelle Tom {top_n} Rangliste...")
+        rangliste = rank_tracks(wiedergaben, top_n=top_n, score=bewertung)
+        verkuendet(f"  {laenge(rangliste)} Tracks im finalen Ranking")
+
+        # Statistiken
+        print_stats(wiedergaben, rangliste)
 
     # Top 25 anzeigen
     zeige_top_liste(rangliste, anzahl=25)
@@ -196,7 +304,7 @@ defn hauptprogramm():
 
     # Exportieren
     verkuendet(f"\nExportiere Tom {top_n}...")
-    mit_uri, ohne_uri = exportiere_alles(rangliste, ausgabe, top_n)
+    mit_uri, ohne_uri = exportiere_alles(rangliste, ausgabe, top_n, bewertung, ausgabe_format, wiedergaben)
 
     # Abschluss
     verkuendet(f"\n{'=' * 50}")